@@ -1,19 +1,31 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from datetime import date
+from typing import Optional
 from app.db.database import get_db
-from app.models.db_models import ChatLog
 from app.models.schemas import AnalysisSummary
+from app.services.category_counter import get_category_counts, get_daily_counts
 
 
 router = APIRouter(prefix="/analysis", tags=["analysis"])
 
 
 @router.get("", response_model=AnalysisSummary)
-async def analysis(db: AsyncSession = Depends(get_db)):
-
-    stmt = select(ChatLog.category, func.count(ChatLog.id)).group_by(ChatLog.category)
-    rows = (await db.execute(stmt)).all()
-    counts = {cat or "other": int(cnt) for cat, cnt in rows}
+async def analysis(
+    since: Optional[date] = Query(None, description="First day to include (UTC)"),
+    until: Optional[date] = Query(None, description="Last day to include (UTC)"),
+    db: AsyncSession = Depends(get_db),
+):
+    # Reads the maintained per-day counters instead of scanning chat_logs
+    counts = await get_category_counts(db, since=since, until=until)
     most_used = max(counts, key=counts.get) if counts else None
-    return AnalysisSummary(counts=counts, most_used=most_used)
\ No newline at end of file
+    return AnalysisSummary(counts=counts, most_used=most_used)
+
+
+@router.get("/daily")
+async def analysis_daily(
+    since: Optional[date] = Query(None),
+    until: Optional[date] = Query(None),
+    db: AsyncSession = Depends(get_db),
+):
+    return await get_daily_counts(db, since=since, until=until)
\ No newline at end of file
@@ -1,15 +1,26 @@
 # api/chat.py (Enhanced Version)
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc
 from app.db.database import get_db
 from app.models.schemas import ChatRequest, ChatResponse
 from app.models.db_models import ChatLog
-from app.services.openai_client import generate_reply
-from app.services.classifier import classify_message
-from app.services.vector_store import add_to_index
+from app.services.openai_client import generate_reply, stream_reply
+from app.services.classifier import classify_message_with_source
+from app.services.vector_store import index_queue
+from app.services.response_cache import response_cache
+from app.services.embedding_cache import embedding_cache
+from app.services.write_behind import write_buffer
 from app.services.conversation_service import ConversationService
+from app.services.context_assembler import format_report, token_counter
+from app.services.text_screen import BLOCKED_REPLY, screen_message
 from app.core.config import settings
+from app.core.timing import StageTimer
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import orjson
 import uuid
 
 
@@ -17,32 +28,65 @@ router = APIRouter(prefix="/chat", tags=["chat"])
 conversation_service = ConversationService()
 
 
-@router.post("", response_model=ChatResponse)
-async def chat(payload: ChatRequest, db: AsyncSession = Depends(get_db)):
-    if not payload.message.strip():
-        raise HTTPException(400, detail="message cannot be empty")
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant for a developer. Keep answers concise and actionable."
 
-    user_message = payload.message.strip()
-    
-    # Check if this is a new conversation and if we should offer continuation
+
+@dataclass
+class ReplyPlan:
+    """What to answer with: either a ready-made reply or a prompt for the LLM."""
+    conversation_id: str
+    category: str
+    system_prompt: str = DEFAULT_SYSTEM_PROMPT
+    # Classifier tier behind `category`; None for the fixed replies
+    category_source: Optional[str] = None
+    fixed_reply: Optional[str] = None
+    # Per-section token usage of the prompt, filled while planning
+    token_report: Dict = field(default_factory=dict)
+
+
+async def _plan_reply(payload: ChatRequest, user_message: str, db: AsyncSession, timer: StageTimer) -> ReplyPlan:
     is_new_conversation = payload.conversation_id is None
-    should_offer_continuation = False
-    context_data = None
+    # Generate conversation ID if not provided
+    conversation_id = payload.conversation_id or str(uuid.uuid4())[:8]
+
+    # Continuation intent and banned terms in one pass, before any DB or LLM work
+    screen = screen_message(user_message)
+    if screen.blocked and settings.SCREEN_REJECT_BANNED:
+        print(f"[SCREEN] Rejected message with banned terms: {screen.banned}")
+        return ReplyPlan(conversation_id, "blocked", fixed_reply=BLOCKED_REPLY)
     
-    if is_new_conversation and payload.user_id:
+    async def load_history() -> List[ChatLog]:
+        # One history read per request; every branch below slices this list.
+        # A freshly generated conversation_id has no rows, so excluding the
+        # caller's id is equivalent to excluding the final one.
+        if not payload.user_id:
+            return []
+        return await timer.track("history", conversation_service.get_user_conversation_history(
+            db=db,
+            user_id=payload.user_id,
+            exclude_conversation_id=payload.conversation_id
+        ))
+    
+    async def check_continuation_offer() -> Tuple[List[ChatLog], bool, Optional[Dict]]:
+        history = await load_history()
+        if not (is_new_conversation and payload.user_id):
+            return history, False, None
         # Check if we should offer conversation continuation
-        should_offer_continuation, context_data = await conversation_service.should_offer_continuation(
+        should_offer, context = await timer.track("continuation", conversation_service.should_offer_continuation(
             db=db,
             user_id=payload.user_id,
             current_message=user_message,
-            current_conversation_id=payload.conversation_id
-        )
+            current_conversation_id=payload.conversation_id,
+            history=history
+        ))
+        return history, should_offer, context
     
-    # Classify the current message
-    category = classify_message(user_message)
-    
-    # Generate conversation ID if not provided
-    conversation_id = payload.conversation_id or str(uuid.uuid4())[:8]
+    # The DB/summary chain and classification are independent; only the
+    # first one touches the session, so they can run side by side.
+    (history, should_offer_continuation, context_data), (category, category_source) = await asyncio.gather(
+        check_continuation_offer(),
+        timer.track("classify", classify_message_with_source(user_message)),
+    )
     
     # Generate response based on whether we're offering continuation
     if should_offer_continuation and context_data:
@@ -53,89 +97,73 @@ async def chat(payload: ChatRequest, db: AsyncSession = Depends(get_db)):
         )
         
         # Mark this as a special continuation offer
-        category = "continuation_offer"
-        
-    else:
-        # Check if user is responding to a continuation offer
-        is_continuation_response = await _is_continuation_response(user_message)
-        
-        if is_continuation_response and payload.user_id:
-            # User wants to continue previous conversation
-            if "continue" in user_message.lower() or "previous" in user_message.lower() or "1" in user_message:
-                # Get the context and build enhanced prompt
-                history = await conversation_service.get_user_conversation_history(
-                    db=db, 
-                    user_id=payload.user_id,
-                    exclude_conversation_id=conversation_id
-                )
+        return ReplyPlan(conversation_id, "continuation_offer", fixed_reply=reply)
+
+    if screen.is_continuation_response and payload.user_id:
+        # User wants to continue previous conversation
+        if screen.wants_continuation:
+            if history:
+                # Reuse the analysis from the continuation check when it covered the same history
+                if not context_data:
+                    with timer.stage("context"):
+                        context_data = await conversation_service.analyze_conversation_context(history, db=db)
                 
-                if history:
-                    context_data = await conversation_service.analyze_conversation_context(history)
-                    
-                    enhanced_system_prompt = await conversation_service.build_context_enhanced_prompt(
-                        current_message=user_message,
-                        context=context_data,
-                        system_prompt="You are a helpful assistant for a developer. Keep answers concise and actionable. Continue from where the previous conversation left off.",
-                        include_full_context=True
-                    )
-                    
-                    reply = await generate_reply(user_message, system_prompt=enhanced_system_prompt)
-                else:
-                    reply = await generate_reply(
-                        user_message,
-                        system_prompt="You are a helpful assistant for a developer. Keep answers concise and actionable."
-                    )
-            else:
-                # User wants fresh start or current question
-                reply = await generate_reply(
-                    user_message,
-                    system_prompt="You are a helpful assistant for a developer. Keep answers concise and actionable."
+                token_report = {}
+                enhanced_system_prompt = await conversation_service.build_context_enhanced_prompt(
+                    current_message=user_message,
+                    context=context_data,
+                    system_prompt=DEFAULT_SYSTEM_PROMPT + " Continue from where the previous conversation left off.",
+                    include_full_context=True,
+                    token_report=token_report
                 )
-        else:
-            # Regular conversation - but check if we have context to enhance the response
-            system_prompt = "You are a helpful assistant for a developer. Keep answers concise and actionable."
-            
-            if payload.user_id and not is_new_conversation:
-                # For ongoing conversations, get some context
-                history = await conversation_service.get_user_conversation_history(
-                    db=db,
-                    user_id=payload.user_id,
-                    exclude_conversation_id=conversation_id,
-                    limit=5
-                )
-                
-                if history:
-                    context_data = await conversation_service.analyze_conversation_context(history)
-                    system_prompt = await conversation_service.build_context_enhanced_prompt(
-                        current_message=user_message,
-                        context=context_data,
-                        system_prompt=system_prompt,
-                        include_full_context=False
-                    )
-            
-            reply = await generate_reply(user_message, system_prompt=system_prompt)
-
-    # Create and save the chat log
-    log = ChatLog(
-        conversation_id=conversation_id,
-        user_id=payload.user_id,
-        user_message=user_message,
-        bot_response=reply,
-        category=category,
-    )
+                return ReplyPlan(conversation_id, category, system_prompt=enhanced_system_prompt,
+                                 category_source=category_source, token_report=token_report)
+
+        # User wants fresh start or current question
+        return ReplyPlan(conversation_id, category, category_source=category_source)
+
+    # Regular conversation - but check if we have context to enhance the response
+    system_prompt = DEFAULT_SYSTEM_PROMPT
+    token_report = {}
+    
+    if payload.user_id and not is_new_conversation:
+        # For ongoing conversations, only the 5 most recent logs are used as context
+        recent_history = history[:5]
+        
+        if recent_history:
+            with timer.stage("context"):
+                context_data = await conversation_service.analyze_conversation_context(recent_history, db=db)
+            system_prompt = await conversation_service.build_context_enhanced_prompt(
+                current_message=user_message,
+                context=context_data,
+                system_prompt=system_prompt,
+                include_full_context=False,
+                token_report=token_report
+            )
+
+    return ReplyPlan(conversation_id, category, system_prompt=system_prompt,
+                     category_source=category_source, token_report=token_report)
+
 
-    db.add(log)
-    await db.commit()
-    await db.refresh(log)
+def _token_usage(plan: ReplyPlan, user_message: str) -> str:
+    """Log how many prompt tokens each section used; returns the X-Token-Usage value."""
+    report = dict(plan.token_report)
+    if plan.fixed_reply is None:
+        report["prompt"] = {"tokens": token_counter.count(plan.system_prompt) + token_counter.count(user_message)}
+    usage = format_report(report)
+    print(f"[TOKENS] {plan.conversation_id}: {usage or 'no prompt'}")
+    return usage
 
-    # Index user message in Chroma (async embedding)
+
+async def _index_log(log: ChatLog, plan: ReplyPlan) -> None:
+    # Index user message in Chroma; embedding happens in batches on the background worker
     try:
-        await add_to_index(
+        await index_queue.enqueue(
             doc_id=str(log.id), 
-            text=user_message, 
+            text=log.user_message, 
             metadata={
-                "category": category,
-                "conversation_id": conversation_id,
+                "category": plan.category,
+                "conversation_id": plan.conversation_id,
                 "user_id": log.user_id or "",
             }
         )
@@ -143,31 +171,119 @@ async def chat(payload: ChatRequest, db: AsyncSession = Depends(get_db)):
         # Non-blocking: failures here should not break chat
         pass
 
-    return ChatResponse(reply=reply, category=category, log_id=log.id)
 
+async def _save_and_index(payload: ChatRequest, user_message: str, reply: str, plan: ReplyPlan) -> ChatLog:
+    """
+    Persist the turn through the write-behind buffer. With the default
+    "commit" durability log.id is set on return; with "buffered" it is None
+    and indexing happens once the batch containing the row commits.
+    """
+    log = ChatLog(
+        conversation_id=plan.conversation_id,
+        user_id=payload.user_id,
+        user_message=user_message,
+        bot_response=reply,
+        category=plan.category,
+        category_source=plan.category_source,
+    )
 
-async def _is_continuation_response(message: str) -> bool:
-    """Check if the message is a response to a continuation offer"""
-    
-    message_lower = message.lower().strip()
-    
-    continuation_keywords = [
-        "continue", "previous", "yes", "1", "first",
-        "keep going", "where we left", "last time"
-    ]
-    
-    fresh_start_keywords = [
-        "fresh", "new", "current", "2", "second", "start over"
-    ]
-    
-    # Simple heuristic: if message is short and contains continuation keywords
-    if len(message_lower.split()) <= 10:
-        return (
-            any(keyword in message_lower for keyword in continuation_keywords) or
-            any(keyword in message_lower for keyword in fresh_start_keywords)
-        )
-    
-    return False
+    await write_buffer.write(log, after_commit=lambda: _index_log(log, plan))
+    conversation_service.summary_cache.invalidate(plan.conversation_id)
+    return log
+
+
+@router.post("", response_model=ChatResponse)
+async def chat(payload: ChatRequest, response: Response, db: AsyncSession = Depends(get_db)):
+    if not payload.message.strip():
+        raise HTTPException(400, detail="message cannot be empty")
+
+    user_message = payload.message.strip()
+    timer = StageTimer()
+    with timer.stage("plan"):
+        plan = await _plan_reply(payload, user_message, db, timer)
+
+    if plan.fixed_reply is not None:
+        reply = plan.fixed_reply
+    else:
+        with timer.stage("response_cache"):
+            reply = await response_cache.lookup(user_message, plan.category, plan.system_prompt)
+        if reply is None:
+            with timer.stage("llm"):
+                reply = await generate_reply(user_message, system_prompt=plan.system_prompt)
+            response_cache.store_later(user_message, plan.category, plan.system_prompt, reply)
+
+    with timer.stage("persist"):
+        log = await _save_and_index(payload, user_message, reply, plan)
+
+    response.headers["Server-Timing"] = timer.server_timing()
+    response.headers["X-Token-Usage"] = _token_usage(plan, user_message)
+    timer.log("chat")
+    return ChatResponse(reply=reply, category=plan.category, log_id=log.id, conversation_id=plan.conversation_id)
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: ".encode() + orjson.dumps(data) + b"\n\n"
+
+
+@router.post("/stream")
+async def chat_stream(payload: ChatRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Server-Sent Events variant of POST /chat.
+    Emits `token` events as the completion arrives and a final `done` event
+    carrying the same fields as ChatResponse once the log row is persisted.
+    """
+    if not payload.message.strip():
+        raise HTTPException(400, detail="message cannot be empty")
+
+    user_message = payload.message.strip()
+    timer = StageTimer()
+    with timer.stage("plan"):
+        plan = await _plan_reply(payload, user_message, db, timer)
+    cached_reply = None
+    if plan.fixed_reply is None:
+        with timer.stage("response_cache"):
+            cached_reply = await response_cache.lookup(user_message, plan.category, plan.system_prompt)
+
+    async def events():
+        parts = []
+        try:
+            ready_reply = plan.fixed_reply if plan.fixed_reply is not None else cached_reply
+            if ready_reply is not None:
+                parts.append(ready_reply)
+                yield _sse("token", {"text": ready_reply})
+            else:
+                async for delta in stream_reply(user_message, system_prompt=plan.system_prompt):
+                    parts.append(delta)
+                    yield _sse("token", {"text": delta})
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+            return
+
+        reply = "".join(parts).strip()
+        if plan.fixed_reply is None and cached_reply is None:
+            response_cache.store_later(user_message, plan.category, plan.system_prompt, reply)
+        # The write-behind buffer uses its own sessions, so this is safe after
+        # the request-scoped session has been closed.
+        log = await _save_and_index(payload, user_message, reply, plan)
+        timer.log("chat_stream")
+
+        yield _sse("done", {
+            "reply": reply,
+            "category": plan.category,
+            "log_id": log.id,
+            "conversation_id": plan.conversation_id,
+        })
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Server-Timing": timer.server_timing(),
+            "X-Token-Usage": _token_usage(plan, user_message),
+        },
+    )
 
 
 # Additional endpoint to get conversation context (useful for debugging)
@@ -184,4 +300,17 @@ async def get_user_context(user_id: str, db: AsyncSession = Depends(get_db)):
     return {
         "should_offer_continuation": should_offer,
         "context": context_data
+    }
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Hit rates and queue depth of the caches in front of the LLM and embedding calls"""
+    
+    return {
+        "response_cache": response_cache.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "summary_cache": conversation_service.summary_cache.stats(),
+        "index_queue": index_queue.stats(),
+        "write_buffer": write_buffer.stats(),
     }
\ No newline at end of file
@@ -0,0 +1,84 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.services.chroma_service import ChromaDBService, DOCUMENT_FIELDS
+from app.services.lexical_index import lexical_indexes
+from app.services.retention import retention_engine
+from typing import Optional
+import orjson
+
+
+router = APIRouter(prefix="/documents", tags=["documents"])
+chroma_service = ChromaDBService()
+
+SELECTABLE_FIELDS = ("documents", "metadatas", "embeddings")
+
+
+@router.post("/retention/run")
+async def run_retention():
+    """Apply the RETENTION_RULES now instead of waiting for the next scheduled run"""
+    if not retention_engine.rules:
+        raise HTTPException(400, detail="no retention rules configured (RETENTION_RULES)")
+    run = await retention_engine.run_once()
+    return run.as_dict()
+
+
+@router.get("/retention/stats")
+async def get_retention_stats():
+    return retention_engine.stats()
+
+
+@router.get("/lexical/stats")
+async def get_lexical_stats():
+    """Size of each collection's BM25 index used by hybrid search"""
+    return lexical_indexes.stats()
+
+
+def parse_include(fields: Optional[str]) -> list[str]:
+    if not fields:
+        return list(DOCUMENT_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in SELECTABLE_FIELDS]
+    if unknown:
+        raise HTTPException(400, detail=f"unknown fields: {', '.join(unknown)}")
+    return requested
+
+
+def parse_where(where: Optional[str]) -> Optional[dict]:
+    if not where:
+        return None
+    try:
+        parsed = orjson.loads(where)
+    except orjson.JSONDecodeError:
+        raise HTTPException(400, detail="where must be a JSON object")
+    if not isinstance(parsed, dict):
+        raise HTTPException(400, detail="where must be a JSON object")
+    return parsed
+
+
+@router.get("/{collection_name}")
+async def stream_documents(
+    collection_name: str,
+    where: Optional[str] = Query(None, description='Chroma metadata filter as JSON, e.g. {"source": "file"}'),
+    fields: Optional[str] = Query(None, description="Comma separated: documents,metadatas,embeddings"),
+    page_size: int = Query(settings.DOCUMENT_PAGE_SIZE, ge=1, le=5000),
+):
+    """
+    Stream a collection as NDJSON (one document per line), fetched from Chroma
+    page by page, so neither the server nor the client holds it all in memory.
+    """
+    pages = chroma_service.aiter_document_pages(
+        collection_name, where=parse_where(where), include=parse_include(fields), page_size=page_size
+    )
+    # Fetch the first page up front so a missing collection or bad filter is
+    # reported with a proper status instead of a truncated stream
+    first = await anext(pages, None)
+
+    async def body():
+        if first is None:
+            return
+        yield b"".join(orjson.dumps(doc) + b"\n" for doc in first)
+        async for page in pages:
+            yield b"".join(orjson.dumps(doc) + b"\n" for doc in page)
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
@@ -1,18 +1,207 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
-from app.db.database import get_db
+from sqlalchemy import select, desc, tuple_, Integer, DateTime
+from app.db.database import get_db, AsyncSessionLocal
 from app.models.db_models import ChatLog
-from app.models.schemas import LogItem
-from typing import List
+from datetime import datetime
+from typing import Literal, Optional
+import base64
+import csv
+import io
+import orjson
 
 
 router = APIRouter(prefix="/logs", tags=["logs"])
 
+LOG_FIELDS = {column.name: column for column in ChatLog.__table__.columns}
+# Always selected: they form the pagination cursor
+CURSOR_FIELDS = ("id", "created_at")
+# Rows fetched per server-side cursor round-trip while exporting
+EXPORT_BATCH_SIZE = 2000
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
 
-@router.get("", response_model=List[LogItem])
-async def get_logs(limit: int = Query(50, ge=1, le=500), db: AsyncSession = Depends(get_db)):
 
-    stmt = select(ChatLog).order_by(desc(ChatLog.created_at)).limit(limit)
-    rows = (await db.execute(stmt)).scalars().all()
-    return rows
\ No newline at end of file
+def encode_cursor(created_at: datetime, log_id: int) -> str:
+    raw = orjson.dumps([created_at.isoformat(), log_id])
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, log_id = orjson.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(log_id)
+    except Exception:
+        raise HTTPException(400, detail="invalid cursor")
+
+
+def parse_fields(fields: Optional[str]) -> list[str]:
+    if not fields:
+        return list(LOG_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in LOG_FIELDS]
+    if unknown:
+        raise HTTPException(400, detail=f"unknown fields: {', '.join(unknown)}")
+    return list(CURSOR_FIELDS) + [f for f in requested if f not in CURSOR_FIELDS]
+
+
+def filtered_logs_query(
+    columns: list[str],
+    user_id: Optional[str] = None,
+    category: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    stmt = select(*(LOG_FIELDS[name] for name in columns))
+    if user_id:
+        stmt = stmt.where(ChatLog.user_id == user_id)
+    if category:
+        stmt = stmt.where(ChatLog.category == category)
+    if since:
+        stmt = stmt.where(ChatLog.created_at >= since)
+    if until:
+        stmt = stmt.where(ChatLog.created_at < until)
+    return stmt
+
+
+@router.get("")
+async def get_logs(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    user_id: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma separated columns, e.g. id,user_id,category,created_at"),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Newest-first page of chat logs using keyset pagination on (created_at, id),
+    so every page costs the same index seek regardless of depth. The cursor of
+    the next page is returned in the X-Next-Cursor header.
+    """
+    columns = parse_fields(fields)
+    stmt = filtered_logs_query(columns, user_id=user_id, category=category, since=since, until=until)
+
+    if cursor:
+        created_at, log_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(ChatLog.created_at, ChatLog.id) < tuple_(created_at, log_id))
+
+    stmt = stmt.order_by(desc(ChatLog.created_at), desc(ChatLog.id)).limit(limit)
+    rows = [dict(row) for row in (await db.execute(stmt)).mappings()]
+
+    headers = {}
+    if len(rows) == limit:
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return ORJSONResponse(rows, headers=headers)
+
+
+async def _iter_export_batches(stmt):
+    # The request-scoped session is closed before a streamed body is sent,
+    # so the export owns its session for the lifetime of the stream.
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for batch in result.mappings().partitions(EXPORT_BATCH_SIZE):
+            yield batch
+
+
+async def _export_ndjson(stmt):
+    async for batch in _iter_export_batches(stmt):
+        yield b"".join(orjson.dumps(dict(row)) + b"\n" for row in batch)
+
+
+async def _export_csv(stmt, columns: list[str]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    async for batch in _iter_export_batches(stmt):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            [row[name].isoformat() if isinstance(row[name], datetime) else row[name] for name in columns]
+            for row in batch
+        )
+        yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands written bytes back to the generator."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def _export_parquet(stmt, columns: list[str]):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    def arrow_type(column):
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        return pa.string()
+
+    schema = pa.schema([(name, arrow_type(LOG_FIELDS[name])) for name in columns])
+    sink = _ChunkSink()
+    # One row group per fetched batch keeps memory flat
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        async for batch in _iter_export_batches(stmt):
+            writer.write_table(pa.Table.from_pylist([dict(row) for row in batch], schema=schema))
+            yield sink.drain()
+    yield sink.drain()
+
+
+@router.get("/export")
+async def export_logs(
+    format: Literal["ndjson", "csv", "parquet"] = Query("ndjson"),
+    user_id: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma separated columns to export"),
+):
+    """
+    Stream the (optionally filtered) chat_logs table from a server-side cursor.
+    Rows are fetched and encoded EXPORT_BATCH_SIZE at a time, so memory use
+    does not grow with the size of the table.
+    """
+    columns = parse_fields(fields)
+    stmt = filtered_logs_query(columns, user_id=user_id, category=category, since=since, until=until)
+    stmt = stmt.order_by(ChatLog.id)
+
+    if format == "ndjson":
+        body = _export_ndjson(stmt)
+    elif format == "csv":
+        body = _export_csv(stmt, columns)
+    else:
+        body = _export_parquet(stmt, columns)
+
+    filename = f"chat_logs_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
\ No newline at end of file
@@ -12,13 +12,118 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     OPENAI_EMBEDDING_MODEL: str = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+    OPENAI_BASE_URL: str | None = os.getenv("OPENAI_BASE_URL") or None
+
+    # Shared HTTP pool / concurrency for the async OpenAI client
+    OPENAI_MAX_CONNECTIONS: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+    OPENAI_MAX_KEEPALIVE: int = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+    OPENAI_TIMEOUT: float = float(os.getenv("OPENAI_TIMEOUT", "60"))
+    OPENAI_CONNECT_TIMEOUT: float = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+    OPENAI_MAX_CONCURRENCY: int = int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))
+    OPENAI_MAX_RETRIES: int = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+    OPENAI_MAX_OUTPUT_TOKENS: int = int(os.getenv("OPENAI_MAX_OUTPUT_TOKENS", "256"))
+    LLM_MAX_OUTPUT_TOKENS: int = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "1000"))
+
+    # Prompt token budgets (ContextAssembler). TOKENIZER_PATH points at a local
+    # `tokenizers` tokenizer.json; when empty, tokens are estimated as chars / 4.
+    TOKENIZER_PATH: str = os.getenv("TOKENIZER_PATH", "")
+    CONTEXT_MAX_TOKENS: int = int(os.getenv("CONTEXT_MAX_TOKENS", "6000"))
+    CONTEXT_BUDGET_SYSTEM: int = int(os.getenv("CONTEXT_BUDGET_SYSTEM", "1500"))
+    CONTEXT_BUDGET_HISTORY: int = int(os.getenv("CONTEXT_BUDGET_HISTORY", "2500"))
+    CONTEXT_BUDGET_DOCUMENTS: int = int(os.getenv("CONTEXT_BUDGET_DOCUMENTS", "2000"))
+    CONTEXT_BUDGET_SUMMARY: int = int(os.getenv("CONTEXT_BUDGET_SUMMARY", "300"))
     
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./database.db")
     
+    # Write-behind batching of chat_logs / chat_messages inserts. Rows queued while a
+    # commit runs share the next one; FLUSH_MS > 0 also waits that long for more rows
+    WRITE_BEHIND_FLUSH_MS: int = int(os.getenv("WRITE_BEHIND_FLUSH_MS", "0"))
+    WRITE_BEHIND_MAX_BATCH: int = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "200"))
+    WRITE_BEHIND_QUEUE_SIZE: int = int(os.getenv("WRITE_BEHIND_QUEUE_SIZE", "10000"))
+    # "commit": acknowledge after the row is committed; "buffered": after it is queued
+    WRITE_BEHIND_DURABILITY: str = os.getenv("WRITE_BEHIND_DURABILITY", "commit")
+
+    # Per-session conversation memory (LLMService)
+    SESSION_MEMORY_MAX_SESSIONS: int = int(os.getenv("SESSION_MEMORY_MAX_SESSIONS", "10000"))
+    SESSION_MEMORY_IDLE_TTL: int = int(os.getenv("SESSION_MEMORY_IDLE_TTL", "3600"))
+    SESSION_MEMORY_MAX_CHARS: int = int(os.getenv("SESSION_MEMORY_MAX_CHARS", "50000000"))
+    # SQLite file to persist/share sessions across restarts and workers; empty disables it
+    SESSION_MEMORY_DB_PATH: str = os.getenv("SESSION_MEMORY_DB_PATH", "")
+
+    # Local message classifier; the LLM is only asked below CLASSIFIER_CONFIDENCE
+    CLASSIFIER_MODEL_PATH: str = os.getenv("CLASSIFIER_MODEL_PATH", "./classifier_model.npz")
+    CLASSIFIER_CONFIDENCE: float = float(os.getenv("CLASSIFIER_CONFIDENCE", "0.6"))
+    CLASSIFIER_LLM_FALLBACK: bool = os.getenv("CLASSIFIER_LLM_FALLBACK", "true").lower() == "true"
+    CLASSIFIER_HASH_FEATURES: int = int(os.getenv("CLASSIFIER_HASH_FEATURES", str(2 ** 18)))
+
+    # Reject messages containing BANNED_CONTEXT terms before calling the LLM
+    SCREEN_REJECT_BANNED: bool = os.getenv("SCREEN_REJECT_BANNED", "true").lower() == "true"
+    # Also match inflections of banned terms ("hacking", "bombs"); off, since it catches "hacker news"
+    SCREEN_BANNED_INFLECTIONS: bool = os.getenv("SCREEN_BANNED_INFLECTIONS", "false").lower() == "true"
+
+    SUMMARY_CACHE_SIZE: int = int(os.getenv("SUMMARY_CACHE_SIZE", "1024"))
+
+    # Knowledge base ingestion (app/services/ingestion.py, scripts/ingest.py)
+    INGEST_CHUNK_CHARS: int = int(os.getenv("INGEST_CHUNK_CHARS", "1500"))
+    INGEST_CHUNK_OVERLAP: int = int(os.getenv("INGEST_CHUNK_OVERLAP", "200"))
+    INGEST_EMBED_BATCH: int = int(os.getenv("INGEST_EMBED_BATCH", "64"))
+    INGEST_CONCURRENCY: int = int(os.getenv("INGEST_CONCURRENCY", "4"))
+    INGEST_UPSERT_BATCH: int = int(os.getenv("INGEST_UPSERT_BATCH", "1000"))
+    # Comma separated file extensions picked up when ingesting directories
+    INGEST_EXTENSIONS: str = os.getenv("INGEST_EXTENSIONS", ".txt,.md,.rst")
+
+    # Documents fetched per Chroma round-trip when iterating or streaming a collection
+    DOCUMENT_PAGE_SIZE: int = int(os.getenv("DOCUMENT_PAGE_SIZE", "1000"))
+
+    # Scheduled purge of old knowledge base documents (app/services/retention.py).
+    # Comma separated "source:max_age_hours" rules, e.g. "web:168,file:720"; empty disables it
+    RETENTION_RULES: str = os.getenv("RETENTION_RULES", "")
+    RETENTION_COLLECTION: str = os.getenv("RETENTION_COLLECTION", "Document")
+    RETENTION_INTERVAL_MINUTES: float = float(os.getenv("RETENTION_INTERVAL_MINUTES", "60"))
+    # Rows per delete transaction; 0 deletes everything matching in one call
+    RETENTION_BATCH_SIZE: int = int(os.getenv("RETENTION_BATCH_SIZE", "5000"))
+    # VACUUM the Chroma SQLite file after a purge once this share of its pages is free
+    RETENTION_COMPACT_FREE_RATIO: float = float(os.getenv("RETENTION_COMPACT_FREE_RATIO", "0.2"))
+
+    # Reciprocal rank fusion constant for merging multi-query / hybrid results
+    SEARCH_RRF_K: int = int(os.getenv("SEARCH_RRF_K", "60"))
+
+    # Hybrid retrieval: BM25 over a local inverted index fused with the vector results.
+    # Off by default: each process holds the index for every searched collection
+    HYBRID_SEARCH_ENABLED: bool = os.getenv("HYBRID_SEARCH_ENABLED", "false").lower() == "true"
+    # Results taken from each retriever before fusion
+    HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "20"))
+    # Once this has passed, fuse whichever retrievers have finished
+    HYBRID_LATENCY_BUDGET_MS: int = int(os.getenv("HYBRID_LATENCY_BUDGET_MS", "800"))
+    LEXICAL_BM25_K1: float = float(os.getenv("LEXICAL_BM25_K1", "1.2"))
+    LEXICAL_BM25_B: float = float(os.getenv("LEXICAL_BM25_B", "0.75"))
+    # How often a search compares the collection count with the index to catch writes from other processes
+    LEXICAL_SYNC_SECONDS: float = float(os.getenv("LEXICAL_SYNC_SECONDS", "60"))
+
     CHROMA_DIR: str = os.getenv("CHROMA_DIR", "./chroma_db")
     CHROMA_DB_PATH: str = os.getenv("CHROMA_DB_PATH", "chromadb")
     CHROMA_COLLECTION_NAME: str = os.getenv("CHROMA_COLLECTION_NAME", "chromadb_data")
     
+    # Content-addressed embedding cache (float32 vectors in SQLite)
+    EMBEDDING_CACHE_ENABLED: bool = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.db")
+    EMBEDDING_CACHE_MAX_ROWS: int = int(os.getenv("EMBEDDING_CACHE_MAX_ROWS", "200000"))
+    EMBEDDING_CACHE_MEMORY_SIZE: int = int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "5000"))
+
+    # Opt-in semantic cache of LLM replies for near-duplicate questions
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+    RESPONSE_CACHE_THRESHOLD: float = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+    RESPONSE_CACHE_TTL: int = int(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+    # Seconds between deletes of expired entries, run from store()
+    RESPONSE_CACHE_PURGE_INTERVAL: int = int(os.getenv("RESPONSE_CACHE_PURGE_INTERVAL", "600"))
+    # Comma separated categories to cache; empty means every category
+    RESPONSE_CACHE_CATEGORIES: str = os.getenv("RESPONSE_CACHE_CATEGORIES", "")
+
+    # Background Chroma indexing of chat messages
+    INDEX_QUEUE_SIZE: int = int(os.getenv("INDEX_QUEUE_SIZE", "1000"))
+    INDEX_FLUSH_INTERVAL: float = float(os.getenv("INDEX_FLUSH_INTERVAL", "0.5"))
+    INDEX_ENQUEUE_TIMEOUT: float = float(os.getenv("INDEX_ENQUEUE_TIMEOUT", "1.0"))
+    
     CORS_ORIGINS: list = ["*"]
 
     class Config:
@@ -0,0 +1,38 @@
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, TypeVar
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    """Collects wall-clock durations of named request stages (in milliseconds)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = (time.perf_counter() - start) * 1000
+
+    async def track(self, name: str, awaitable: Awaitable[T]) -> T:
+        """Await `awaitable` and record how long it took; handy inside asyncio.gather."""
+        with self.stage(name):
+            return await awaitable
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        """Render as a Server-Timing header value (visible in browser devtools)."""
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.stages.items()]
+        parts.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(parts)
+
+    def log(self, label: str) -> None:
+        print(f"[TIMING] {label}: {self.server_timing()}")
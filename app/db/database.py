@@ -1,7 +1,9 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
 from app.core.config import settings
+from app.models.db_models import Base
 
 
 engine = create_async_engine(
@@ -19,7 +21,7 @@ AsyncSessionLocal = sessionmaker(
 )
 
 # Add event listener to set WAL mode
-@event.listens_for(engine, "connect")
+@event.listens_for(engine.sync_engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA journal_mode=WAL")
@@ -27,7 +29,11 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor.execute("PRAGMA busy_timeout=5000")
     cursor.close()
 
-Base = declarative_base()
+def dialect_insert(table):
+    """Dialect-specific INSERT so ON CONFLICT clauses are available."""
+    if engine.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
 
 async def get_db():
     async with AsyncSessionLocal() as session:
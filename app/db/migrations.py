@@ -0,0 +1,53 @@
+from sqlalchemy import exists, func, insert, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateColumn
+
+from app.models.db_models import Base, CategoryDailyCount, ChatLog
+
+
+def _add_missing_columns(conn: Connection) -> None:
+    """ALTER TABLE ... ADD COLUMN for nullable model columns the existing tables lack."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+            print(f"[MIGRATIONS] Added column {table.name}.{column.name}")
+
+
+def _backfill_category_counts(conn: Connection) -> None:
+    """
+    Fill category_daily_counts from chat_logs when the counters are empty
+    but logs exist, i.e. the first start after the table was added. Writes
+    keep it current from then on; scripts/category_counts.py repairs drift.
+    """
+    if conn.execute(select(exists().select_from(CategoryDailyCount))).scalar():
+        return
+    day = func.date(ChatLog.created_at)
+    category = func.coalesce(func.nullif(ChatLog.category, ""), "other")
+    counts = select(day, category, func.count(ChatLog.id)).group_by(day, category)
+    result = conn.execute(
+        insert(CategoryDailyCount).from_select(["day", "category", "count"], counts)
+    )
+    if result.rowcount:
+        print(f"[MIGRATIONS] Backfilled {result.rowcount} category counters from chat_logs")
+
+
+def run_migrations(conn: Connection) -> None:
+    """
+    Bring an existing database up to the current models.
+    create_all only creates missing tables (with their indexes); indexes added
+    to tables that already exist are created here, so upgrading a populated
+    database picks them up without a manual step. The same goes for new
+    nullable columns and for the /analysis counters, which are backfilled
+    from chat_logs when empty.
+    """
+    Base.metadata.create_all(conn)
+    _add_missing_columns(conn)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+    _backfill_category_counts(conn)
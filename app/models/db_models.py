@@ -1,5 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, DateTime, Text, Column, JSON, Boolean, ForeignKey
+from sqlalchemy import String, Integer, Date, DateTime, Text, Column, JSON, Boolean, ForeignKey, Index
 from datetime import datetime, timezone
 
 
@@ -23,4 +23,50 @@ class ChatMessage(Base):
     sender = Column(String)
     category = Column(String, index=True)
     timestamp = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    session = relationship("ChatSession", back_populates="messages")
\ No newline at end of file
+    session = relationship("ChatSession", back_populates="messages")
+
+    __table_args__ = (
+        # Per-session transcript (ordered) and "last assistant message" lookups
+        Index("ix_chat_messages_session_id_timestamp", "session_id", "timestamp"),
+        Index("ix_chat_messages_session_id_sender_timestamp", "session_id", "sender", "timestamp"),
+    )
+
+class ChatLog(Base):
+    __tablename__ = "chat_logs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    conversation_id = Column(String, nullable=False)
+    user_id = Column(String, nullable=True)
+    user_message = Column(Text, nullable=False)
+    bot_response = Column(Text, nullable=False)
+    category = Column(String)
+    # Classifier tier that chose `category` ("rule", "model", "llm", "default"), or
+    # "human" for corrected labels; NULL for rows written before it was recorded
+    category_source = Column(String, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+
+    __table_args__ = (
+        # Per-user history: user_id = ? AND created_at >= ? ORDER BY created_at DESC
+        Index("ix_chat_logs_user_id_created_at", "user_id", "created_at"),
+        Index("ix_chat_logs_conversation_id_created_at", "conversation_id", "created_at"),
+        # /logs filtered by category, newest first
+        Index("ix_chat_logs_category_created_at", "category", "created_at"),
+    )
+
+class ConversationSummary(Base):
+    __tablename__ = "conversation_summaries"
+
+    conversation_id = Column(String, primary_key=True)
+    summary = Column(Text, nullable=False)
+    # Timestamp of the newest chat log the summary was built from; a newer
+    # log in the same conversation makes the cached summary stale.
+    last_message_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class CategoryDailyCount(Base):
+    """Per-day, per-category message counts maintained alongside chat_logs writes."""
+    __tablename__ = "category_daily_counts"
+
+    day = Column(Date, primary_key=True)
+    category = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
@@ -1,18 +1,28 @@
 
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 
 
 class ChatRequest(BaseModel):
-    query: str
-    user_id: str
-    session_id: str
+    message: str
+    user_id: Optional[str] = None
+    conversation_id: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
     reply: str
     category: str
+    # None when WRITE_BEHIND_DURABILITY is "buffered" and the row isn't committed yet
+    log_id: Optional[int] = None
+    conversation_id: str
+
+
+class ChatData(BaseModel):
+    """One turn for LLMService; memory is kept per session_id."""
+    query: str
+    session_id: str
+    user_id: Optional[str] = None
 
 
 class ChatMessage(BaseModel):
@@ -34,4 +44,8 @@ class MessageResponse(BaseModel):
 
 class ConversationResponse(BaseModel):
     session_id: str
-    messages: List[MessageResponse]
\ No newline at end of file
+    messages: List[MessageResponse]
+
+class AnalysisSummary(BaseModel):
+    counts: Dict[str, int]
+    most_used: Optional[str] = None
@@ -1,3 +1,5 @@
+from app.templates.registry import register_template
+
 WHATSAPP_PROMPT = ("SPECIAL NOTE ==> This user is chatting from whatsapp, so give whatsapp friendly text format "
                    "in your 'conversational_response' like avoiding MD format, anchor text (use raw URL if needed). "
                    "(i.e: Use the formats and text styling supported by whatsapp.)")
@@ -80,11 +82,7 @@ URLS_MD_FORMAT = """
                 | General Development    | Software developers, Custom solutions, Front end, Back end                       | [Hire Software Developers](https://www.softsuave.com/hire-software-developers)               |
 """
 
-def _get_tuned_prompt(query, history, previous_context, current_context, query_count: int, schedule_status: str):
-
-    print(f"Query count -->  {query_count}")
-
-    links_and_contact_prompt = f"""For career (job openings), hiring developers, to develop an app, or service inquiries,
+LINKS_AND_CONTACT_PROMPT = f"""For career (job openings), hiring developers, to develop an app, or service inquiries,
          Share appropriate URL from below URLs along with the response from the context given, **But only when necessary**:
          (Critical Note: **Don't just end the chat after sharing the URL, build conversation**)
 
@@ -95,13 +93,24 @@ def _get_tuned_prompt(query, history, previous_context, current_context, query_c
                          If a service is missing, default to General Development URL. Also do not share the URL which is already in history**
     """
 
-    response_length = "**By defualt you must give short and on-point replies (i.e: Short response conversationally).** But If the user asks for detailed, structured, or elaborate replies, respond accordingly."
+RESPONSE_LENGTH = "**By defualt you must give short and on-point replies (i.e: Short response conversationally).** But If the user asks for detailed, structured, or elaborate replies, respond accordingly."
 
-    general_prompt = f"""
+# Static reference sections (URLs, case studies) come before the per-request
+# context so they are part of the cached prompt prefix.
+GENERAL_PROMPT_HEAD = f"""
     Critical note: You're a RAG based AI assistant for the company, generate response conversationally by Checking the 'Conversation History' and context given below.
                    Follow the rule and the prompt.
 
-    ### Previous Context (use if relevant):
+    ### Contact Guidance & services pages (URLs):
+         └──  {LINKS_AND_CONTACT_PROMPT}
+    
+    ### Case studies link (Use only when required):
+          └──  {CASE_STUDIES_URLS_MD_FORMAT}
+    
+    
+"""
+
+REQUEST_SECTIONS = """    ### Previous Context (use if relevant):
          └── {previous_context}
 
     ### Current Context (Will be from 3 sources: web, case_study, niche_info. **See source for case study related queries**):
@@ -111,19 +120,14 @@ def _get_tuned_prompt(query, history, previous_context, current_context, query_c
          └──  {history}
          (NOTE: Do not repeat the 30 minutes call question if history already has that.)
         
-    ### Current Query (query_num - {query_count + 1}):
+    ### Current Query (query_num - {query_num}):
          └──  {query}
          (NOTE: User may ask this query, in related to your previous response, so answer accordingly)
  
-    ### Contact Guidance & services pages (URLs):
-         └──  {links_and_contact_prompt}
-    
-    ### Case studies link (Use only when required):
-          └──  {CASE_STUDIES_URLS_MD_FORMAT}
-    
-    
-    ### Instructions:
-        1. **Be on-point and conversational:** {response_length}.
+"""
+
+INSTRUCTIONS = f"""    ### Instructions:
+        1. **Be on-point and conversational:** {RESPONSE_LENGTH}.
         2. **Context Awareness:** Make use of Conversation History, Previous and Current context provided above from semantic search. 
                                   (NOTE: View the chat in conversational perspective by relating the query number sequentially and answer accordingly with the context)
 
@@ -140,7 +144,7 @@ def _get_tuned_prompt(query, history, previous_context, current_context, query_c
                                                       (NOTE: You must not mention the same URLs which is already in Conversation history, to avoid displaying redundant URLs).
     """
 
-    schedule_prompt = f"""
+SCHEDULE_PROMPT = """
     ### Scheduling Call (30-minutes online meeting/call, **Only when necessary**):
     
     You can tell the user about our 30-minutes call feature when appropriate, by checking the below condition.
@@ -160,22 +164,16 @@ def _get_tuned_prompt(query, history, previous_context, current_context, query_c
            
     (**SPECIAL CASE: If user directly asking for booking or scheduling a call/meeting. (i.e: asking for schedule meeting or call, need meeting, book a slot, book a appointment), you can directly assign 'activate_scheduler: TRUE' without explicitly asking **but only for this special case**, otherwise you need to strictly follow the above PROCEDURE)"""
 
-    restrict_meeting = f"""
+RESTRICT_MEETING = """
         9. NOTE: This user has already booked a meeting with us. If they request another meeting, politely remind them 
         that their meeting is already scheduled. **Only provide this reminder if they specifically ask to schedule a 
         meeting, you must avoid repeating it unnecessarily**. After informing them, guide them positively to SoftSuave’s contact page.
         If they ask for cancellation or reschedule, tell them they have that options in the mail they received.
     """
 
-    if schedule_status != "completed":
-        return general_prompt + schedule_prompt
-    return general_prompt + restrict_meeting
 
-
-def get_prompt(query, history, previous_context, current_context, query_count: int, schedule_status: str, whatsapp_chat: bool)  ->  str:
-    prompt = _get_tuned_prompt(query, history, previous_context, current_context, query_count, schedule_status)
-
-    dynamic_prompt = f"""
+def _sales_prefix() -> str:
+    return f"""
     Consider yourself as an assistant for SoftSuave Technologies (service based IT company).
     Always respond in this exact JSON format:
     {{
@@ -202,7 +200,24 @@ def get_prompt(query, history, previous_context, current_context, query_count: i
 
 
     ### Prompt:
-        {prompt}
+        """ + GENERAL_PROMPT_HEAD
+
+
+def _scheduled_prefix() -> str:
+    return f"""Consider yourself as an assistant for SoftSuave Technologies (service based IT company).
+                             Follow the prompt and give response.
+                             
+                             Rules:
+                                1. *We are providing software related services only.*, 
+                                2. Include all other responses in conversational_response, (Human like responses and tone should be like a real assistant)
+                                3. Add appropriate URL related to the query's category. (Strictly don't construct the URLs by yourself, use the URLs which is mentioned in the prompt only.)
+                                4. Demonstrate about our projects by providing detailed case study (from context), if the user asks about our projects.
+
+                            ### Prompt:
+                                """ + GENERAL_PROMPT_HEAD
+
+
+SALES_INFO = """
         
     ### General Info About the Company. (**Use only when needed**)
         HR contacts (Phone numbers and mail IDs)   
@@ -236,18 +251,7 @@ def get_prompt(query, history, previous_context, current_context, query_count: i
         **Finally you must never forget that 'we are providing software related services only', Strictly adhere to the RED FLAGS given above and politely decline any other unrelated queries**
     """
 
-    if schedule_status == "completed":
-        dynamic_prompt = f"""Consider yourself as an assistant for SoftSuave Technologies (service based IT company).
-                             Follow the prompt and give response.
-                             
-                             Rules:
-                                1. *We are providing software related services only.*, 
-                                2. Include all other responses in conversational_response, (Human like responses and tone should be like a real assistant)
-                                3. Add appropriate URL related to the query's category. (Strictly don't construct the URLs by yourself, use the URLs which is mentioned in the prompt only.)
-                                4. Demonstrate about our projects by providing detailed case study (from context), if the user asks about our projects.
-
-                            ### Prompt:
-                                {prompt}
+SCHEDULED_INFO = """
                             
                             ### General Info About the Company. (**Use only when needed**)
                                 HR contacts (Phone numbers and mail IDs)   
@@ -279,9 +283,24 @@ def get_prompt(query, history, previous_context, current_context, query_count: i
                                 **Finally you must never forget that 'we are providing software related services only', Strictly adhere to the RED FLAGS given above and politely decline any other unrelated queries**
                             """
 
+sales_template = register_template(
+    "sales", _sales_prefix, REQUEST_SECTIONS + INSTRUCTIONS + SCHEDULE_PROMPT + SALES_INFO
+)
+scheduled_template = register_template(
+    "sales_scheduled", _scheduled_prefix, REQUEST_SECTIONS + INSTRUCTIONS + RESTRICT_MEETING + SCHEDULED_INFO
+)
+
+
+def get_prompt(query, history, previous_context, current_context, query_count: int, schedule_status: str, whatsapp_chat: bool)  ->  str:
+    template = scheduled_template if schedule_status == "completed" else sales_template
+    dynamic_prompt = template.render(
+        previous_context=previous_context,
+        current_context=current_context,
+        history=history,
+        query=query,
+        query_num=query_count + 1,
+    )
+
     if whatsapp_chat:
         dynamic_prompt += f"\n\n {WHATSAPP_PROMPT}"
-    # print(f"\n\ndynamic_prompt ---> {dynamic_prompt}\n\n")
     return dynamic_prompt
-
-
@@ -0,0 +1,122 @@
+from collections import Counter
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import dialect_insert
+from app.models.db_models import CategoryDailyCount, ChatLog
+
+
+def _day_and_category(log: ChatLog) -> Tuple[date, str]:
+    created_at = log.created_at or datetime.now(timezone.utc)
+    return created_at.date(), log.category or "other"
+
+
+async def increment_category_counts(session: AsyncSession, objects: Iterable) -> None:
+    """
+    Add the ChatLog rows in `objects` to the daily counters.
+    Meant to run inside the transaction that inserts the logs, so the
+    counters can't drift from chat_logs on commit or rollback.
+    """
+    logs = [obj for obj in objects if isinstance(obj, ChatLog)]
+    if not logs:
+        return
+    # Populate created_at defaults before bucketing by day
+    await session.flush()
+
+    increments = Counter(_day_and_category(log) for log in logs)
+    stmt = dialect_insert(CategoryDailyCount).values([
+        {"day": day, "category": category, "count": count}
+        for (day, category), count in increments.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CategoryDailyCount.day, CategoryDailyCount.category],
+        set_={"count": CategoryDailyCount.count + stmt.excluded.count},
+    )
+    await session.execute(stmt)
+
+
+async def get_category_counts(
+    db: AsyncSession, since: Optional[date] = None, until: Optional[date] = None
+) -> Dict[str, int]:
+    stmt = select(CategoryDailyCount.category, func.sum(CategoryDailyCount.count)).group_by(CategoryDailyCount.category)
+    if since is not None:
+        stmt = stmt.where(CategoryDailyCount.day >= since)
+    if until is not None:
+        stmt = stmt.where(CategoryDailyCount.day <= until)
+    rows = (await db.execute(stmt)).all()
+    return {category: int(count) for category, count in rows}
+
+
+async def get_daily_counts(
+    db: AsyncSession, since: Optional[date] = None, until: Optional[date] = None
+) -> List[dict]:
+    stmt = select(CategoryDailyCount).order_by(CategoryDailyCount.day, CategoryDailyCount.category)
+    if since is not None:
+        stmt = stmt.where(CategoryDailyCount.day >= since)
+    if until is not None:
+        stmt = stmt.where(CategoryDailyCount.day <= until)
+    rows = (await db.execute(stmt)).scalars().all()
+    return [{"day": row.day.isoformat(), "category": row.category, "count": row.count} for row in rows]
+
+
+async def _counts_from_logs(db: AsyncSession) -> Dict[Tuple[date, str], int]:
+    day = func.date(ChatLog.created_at)
+    stmt = select(day, ChatLog.category, func.count(ChatLog.id)).group_by(day, ChatLog.category)
+    counts: Dict[Tuple[date, str], int] = Counter()
+    for log_day, category, count in (await db.execute(stmt)).all():
+        if isinstance(log_day, str):
+            log_day = date.fromisoformat(log_day)
+        counts[(log_day, category or "other")] += int(count)
+    return counts
+
+
+async def backfill_category_counts(db: AsyncSession) -> int:
+    """Rebuild the counter table from chat_logs (one full scan). Returns rows written."""
+    counts = await _counts_from_logs(db)
+    await db.execute(delete(CategoryDailyCount))
+    if counts:
+        await db.execute(dialect_insert(CategoryDailyCount).values([
+            {"day": day, "category": category, "count": count}
+            for (day, category), count in counts.items()
+        ]))
+    await db.commit()
+    return len(counts)
+
+
+async def reconcile_category_counts(db: AsyncSession, fix: bool = False) -> List[dict]:
+    """
+    Compare the counters with chat_logs and return the (day, category) buckets
+    that differ. With fix=True the mismatching buckets are overwritten.
+    """
+    expected = await _counts_from_logs(db)
+    actual = {
+        (row.day, row.category): row.count
+        for row in (await db.execute(select(CategoryDailyCount))).scalars().all()
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key, 0) != actual.get(key, 0):
+            day, category = key
+            mismatches.append({
+                "day": day.isoformat(),
+                "category": category,
+                "expected": expected.get(key, 0),
+                "actual": actual.get(key, 0),
+            })
+
+    if fix and mismatches:
+        stmt = dialect_insert(CategoryDailyCount).values([
+            {"day": date.fromisoformat(m["day"]), "category": m["category"], "count": m["expected"]}
+            for m in mismatches
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CategoryDailyCount.day, CategoryDailyCount.category],
+            set_={"count": stmt.excluded.count},
+        )
+        await db.execute(stmt)
+        await db.commit()
+    return mismatches
@@ -1,52 +1,128 @@
 import textwrap
-from collections import OrderedDict
+from collections import deque
 
+from app.core.config import settings
+from app.services.context_assembler import ContextAssembler, Section, token_counter
 from app.templates.prompt import get_prompt
 
+NO_HISTORY = "No history found for the user, as they are just started their conversation."
+WRAP_WIDTH = 130
+
+context_assembler = ContextAssembler()
+
+
+class _HistoryEntry:
+    """One stored message plus its wrapped block, cached for a given key alignment."""
+    __slots__ = ("key", "value", "rendered", "aligned_to")
+
+    def __init__(self, key: str, value: str):
+        self.key = key
+        self.value = value
+        self.rendered = None
+        self.aligned_to = None
+
+    def render(self, max_key_length: int) -> str:
+        # Keys are right-aligned to the longest key in the window, so a block
+        # only needs re-wrapping when that width changes (e.g. 9 -> 10 queries).
+        if self.aligned_to != max_key_length:
+            self.rendered = textwrap.fill(
+                self.value,
+                width=WRAP_WIDTH,
+                initial_indent=' ' * (max_key_length - len(self.key)) + f"{self.key}: ",
+                subsequent_indent=' ' * (max_key_length + 2)
+            )
+            self.aligned_to = max_key_length
+        return self.rendered
+
+
 class ChatManage:
     def __init__(self):
-        self.memory = OrderedDict()
+        # Ring buffer of entries, oldest first
+        self.memory = deque()
         self.query_count = 0
         self.max_memory_size = 7
+        self._history = None
+        self._blocks = []
+
+    def _append(self, key: str, value: str):
+        self._history = None
+        for entry in self.memory:
+            if entry.key == key:
+                # Same key replaces the stored message in place
+                entry.value, entry.rendered, entry.aligned_to = value, None, None
+                return
+        self.memory.append(_HistoryEntry(key, value))
 
     def add_user_message(self, query: str):
         self.query_count += 1
-        self.memory[f"User (query_num -> {self.query_count})"] = query
+        self._append(f"User (query_num -> {self.query_count})", query)
 
     def add_bot_message(self, response: str):
-        self.memory[f"AI (response_num -> {self.query_count})"] = response
+        self._append(f"AI (response_num -> {self.query_count})", response)
         self._manage_memory()
 
     def _manage_memory(self):
         if len(self.memory) > self.max_memory_size * 2:
             # Pop the first two items (oldest chat pairs)
-            self.memory.popitem(last=False)  # Oldest user message
-            self.memory.popitem(last=False)  # Oldest bot/MSP response
-        self.get_history()
+            self.memory.popleft()  # Oldest user message
+            self.memory.popleft()  # Oldest bot/MSP response
+            self._history = None
+
+    def _history_blocks(self):
+        """Rendered entries (with their separators), oldest first."""
+        if self._history is None:
+            max_key_length = max(len(entry.key) for entry in self.memory)
+            # Add an extra newline after every 2 entries (a pair)
+            self._blocks = [
+                entry.render(max_key_length) + ("\n\n" if i % 2 == 1 else "\n")
+                for i, entry in enumerate(self.memory)
+            ]
+            self._history = "".join(self._blocks)
+        return self._blocks
 
     def get_history(self):
         if not self.memory:
-            return "No history found for the user, as they are just started their conversation."
-        max_key_length = max(len(key) for key in self.memory)
-        indent_space = max_key_length + 2
-        history_str = ""
-
-        for i, (key, value) in enumerate(self.memory.items()):
-            wrapped = textwrap.fill(
-                value,
-                width=130,
-                initial_indent=' ' * (max_key_length - len(key)) + f"{key}: ",
-                subsequent_indent=' ' * indent_space
-            )
-            history_str += f"{wrapped}\n"
-            # Add an extra newline after every 2 entries (a pair)
-            if i % 2 == 1:
-                history_str += '\n'
-        # print(f"History str ---> {history_str}")
-        return history_str
+            return NO_HISTORY
+        self._history_blocks()
+        return self._history
+
+    def to_dict(self) -> dict:
+        return {"memory": [(entry.key, entry.value) for entry in self.memory], "query_count": self.query_count}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ChatManage":
+        manager = cls()
+        manager.memory = deque(_HistoryEntry(key, value) for key, value in data.get("memory", []))
+        manager.query_count = data.get("query_count", 0)
+        return manager
+
+    def size(self) -> int:
+        """Approximate footprint in characters, used for the global memory cap."""
+        return sum(len(entry.key) + len(entry.value) for entry in self.memory)
+
+    def get_response_prompt(self, query, current_context, admission_status, token_report=None):
+        """
+        History keeps its newest entries and the retrieved context its top
+        results when they exceed their token budgets. Per-section token usage
+        is written into `token_report` when given.
+        """
+        sections = [
+            Section("query", query, required=True),
+            Section("documents", current_context or "", budget=settings.CONTEXT_BUDGET_DOCUMENTS, priority=1),
+        ]
+        if self.memory:
+            sections.append(Section(
+                "history", items=self._history_blocks(), budget=settings.CONTEXT_BUDGET_HISTORY, priority=2, keep="tail"
+            ))
+        else:
+            sections.append(Section("history", NO_HISTORY, required=True))
+
+        fitted = context_assembler.assemble(sections)
 
-    def get_response_prompt(self, query, current_context, admission_status):
-        history = self.get_history()
+        history = fitted["history"]
         query_count: int = self.query_count
-        prompt = get_prompt(query, history, current_context, query_count, admission_status)
-        return prompt
\ No newline at end of file
+        prompt = get_prompt(query, history, fitted["documents"], query_count, admission_status)
+        if token_report is not None:
+            token_report.update(context_assembler.report(sections))
+            token_report["prompt"] = {"tokens": token_counter.count(prompt), "budget": 0, "trimmed": False}
+        return prompt
@@ -1,13 +1,24 @@
 import asyncio
-from contextlib import contextmanager
+import os
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
 from datetime import timezone, datetime, timedelta
-from app.core.config import Settings
+from typing import Callable, Dict, List, Optional
+from app.core.config import settings
+from app.services.lexical_index import lexical_indexes
+from app.services.openai_client import embed_texts
+from app.services.rank_fusion import reciprocal_rank_fusion
 import chromadb
+from chromadb.errors import NotFoundError
 from fastapi import HTTPException
 
 
-GLOBAL_EMBEDDING_MODEL = Settings.OPENAI_EMBEDDING_MODEL
-CHROMA_DB_PATH = Settings.CHROMA_DB_PATH
+CHROMA_DB_PATH = settings.CHROMA_DB_PATH
+# Fields returned by the document iterators unless `include` says otherwise
+DOCUMENT_FIELDS = ("documents", "metadatas")
+# Metadata field holding each source's last-write time, used for age-based deletes
+TIMESTAMP_FIELDS = {"web": "updated_at", "file": "uploaded_at"}
 CLIENT = chromadb.PersistentClient(
     path=CHROMA_DB_PATH,
     settings=chromadb.Settings(allow_reset=True)
@@ -19,6 +30,11 @@ class ChromaDBService:
         self.client = None
         # Use a lock to avoid race conditions when initializing the client
         self._client_lock = asyncio.Lock()
+        # Collection handles, and the names known to hold documents; the sync
+        # paths run in worker threads, hence a threading lock
+        self._collections: Dict[str, chromadb.Collection] = {}
+        self._non_empty: set = set()
+        self._cache_lock = threading.Lock()
 
     async def get_client_async(self):
         """Get or initialize a ChromaDB client asynchronously with proper locking"""
@@ -45,33 +61,96 @@ class ChromaDBService:
                 raise HTTPException(status_code=500, detail="Failed to connect to ChromaDB")
         yield self.client
 
-    async def get_or_create_collection(self, name="Document"):
-        """Asynchronously create or retrieve a collection in ChromaDB."""
-        client = await self.get_client_async()
-
-        def sync_get_or_create():
-            collections = client.list_collections()
-            collection_names = [c.name for c in collections]
+    def _collection(self, client, name: str, create: bool = False):
+        """Cached collection handle."""
+        with self._cache_lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = client.get_or_create_collection(name) if create else client.get_collection(name)
+                self._collections[name] = collection
+            return collection
 
-            if name in collection_names:
-                return client.get_collection(name)
+    @contextmanager
+    def _collection_errors(self, collection_name: str, http: bool = True, client_errors: bool = False):
+        """
+        Wrap Chroma calls on `collection_name`: a NotFoundError (collection
+        deleted elsewhere) drops the cached handle so the next call looks it
+        up again. With `http`, failures are re-raised as HTTPException(500);
+        with `client_errors` as well, a missing collection is a 404 and an
+        invalid `where` filter (ValueError) a 400.
+        """
+        try:
+            yield
+        except HTTPException:
+            raise
+        except Exception as e:
+            if isinstance(e, NotFoundError):
+                self.invalidate_collection(collection_name)
+            if not http:
+                raise
+            if client_errors and isinstance(e, NotFoundError):
+                raise HTTPException(status_code=404, detail=f"Collection '{collection_name}' not found")
+            if client_errors and isinstance(e, ValueError):
+                raise HTTPException(status_code=400, detail=str(e))
+            raise HTTPException(status_code=500, detail=str(e))
+
+    def invalidate_collection(self, name: Optional[str] = None):
+        """Drop the cached handle for `name`, or for every collection, and its BM25 index."""
+        with self._cache_lock:
+            if name is None:
+                self._collections.clear()
+                self._non_empty.clear()
             else:
-                print(f"Creating collection '{name}'")
-                return client.create_collection(name)
+                self._collections.pop(name, None)
+                self._non_empty.discard(name)
+        lexical_indexes.invalidate(name)
+
+    def _mark_written(self, name: str):
+        # A successful add/upsert leaves at least one document, whether or not
+        # its ids were new (Chroma skips duplicate ids, so counts can't be tracked)
+        with self._cache_lock:
+            self._non_empty.add(name)
+
+    def _mark_deleted(self, name: str):
+        # The collection may be empty now; the next _is_empty asks Chroma
+        with self._cache_lock:
+            self._non_empty.discard(name)
+
+    def _is_empty(self, name: str, collection) -> bool:
+        # Only collections not known to hold documents are counted, since
+        # another process may have added documents since
+        if name in self._non_empty:
+            return False
+        count = collection.count()
+        if count:
+            with self._cache_lock:
+                self._non_empty.add(name)
+        return count == 0
+
+    def document_count(self, collection_name="Document") -> int:
+        """Number of documents in the collection, read from Chroma."""
+        with self.get_client() as client, self._collection_errors(collection_name, http=False):
+            return self._collection(client, collection_name).count()
+
+    def reset(self):
+        """Reset the whole Chroma store and forget every cached handle."""
+        with self.get_client() as client:
+            client.reset()
+        self.invalidate_collection()
 
-        return await asyncio.to_thread(sync_get_or_create)
+    async def get_or_create_collection(self, name="Document"):
+        """Asynchronously create or retrieve a collection in ChromaDB."""
+        client = await self.get_client_async()
+        with self._cache_lock:
+            collection = self._collections.get(name)
+        if collection is not None:
+            return collection
+        return await asyncio.to_thread(self._collection, client, name, True)
 
     def __create_collection(self, name="Document"):
         """Synchronously create a collection for compatibility"""
         with self.get_client() as client:
-            collections = client.list_collections()
-            collection_names = collections
-
-            if name in collection_names:
-                return client.get_collection(name)
-            else:
-                print(f"Creating collection '{name}'")
-                return client.create_collection(name)
+            return self._collection(client, name, create=True)
 
     async def store_document_async(self, text: str, embedding: list, metadata: dict, collection_name="Document"):
         """Asynchronously store a document with embedding and metadata in ChromaDB."""
@@ -83,12 +162,15 @@ class ChromaDBService:
 
         def sync_add():
             try:
-                collection.add(
-                    documents=[text],
-                    embeddings=[embedding],
-                    metadatas=[metadata],
-                    ids=[document_id]
-                )
+                with self._collection_errors(collection_name, http=False):
+                    collection.add(
+                        documents=[text],
+                        embeddings=[embedding],
+                        metadatas=[metadata],
+                        ids=[document_id]
+                    )
+                self._mark_written(collection_name)
+                lexical_indexes.add(collection_name, [document_id], [text])
                 total_docs = collection.count()
                 print(f"Document with ID: {document_id} inserted successfully! Total Documents: {total_docs}")
                 return {"status": "success"}
@@ -107,150 +189,183 @@ class ChromaDBService:
 
             document_id = f"{metadata.get('file_id', 'unknown_id')}_{metadata.get('chunk_number', '000')}"
             try:
-                collection.add(
-                    documents=[text],
-                    embeddings=[embedding],
-                    metadatas=[metadata],
-                    ids=[document_id]
-                )
-
+                with self._collection_errors(collection_name, http=False):
+                    collection.add(
+                        documents=[text],
+                        embeddings=[embedding],
+                        metadatas=[metadata],
+                        ids=[document_id]
+                    )
+
+                self._mark_written(collection_name)
+                lexical_indexes.add(collection_name, [document_id], [text])
                 total_docs = collection.count()
                 print(f"Document with ID: {document_id} inserted successfully! Total Documents: {total_docs}")
                 return {"status": "success"}
             except Exception as e:
                 return {"status": "failed", "reason": str(e)}
 
-    async def get_document_async(self, collection_name="Document"):
-        """Asynchronously retrieve documents from a ChromaDB collection."""
+    def _get_page(self, client, collection_name: str, where: Optional[dict], include: List[str],
+                  limit: int, offset: int) -> List[dict]:
+        with self._collection_errors(collection_name, client_errors=True):
+            collection = self._collection(client, collection_name)
+            response = collection.get(where=where, include=include, limit=limit, offset=offset)
+
+        page = []
+        for i, doc_id in enumerate(response["ids"]):
+            item = {"id": doc_id}
+            if "documents" in include:
+                item["text"] = response["documents"][i]
+            if "metadatas" in include:
+                item["metadata"] = response["metadatas"][i]
+            if "embeddings" in include:
+                embedding = response["embeddings"][i]
+                item["embedding"] = embedding.tolist() if hasattr(embedding, "tolist") else embedding
+            page.append(item)
+        return page
+
+    def iter_document_pages(self, collection_name="Document", where: Optional[dict] = None,
+                            include=DOCUMENT_FIELDS, page_size: int = settings.DOCUMENT_PAGE_SIZE):
+        """
+        Yield the collection's documents one page (list of dicts) at a time,
+        using offset/limit so at most `page_size` documents are in memory.
+        `include` selects fields out of documents, metadatas and embeddings.
+        """
+        include = list(include)
+        offset = 0
+        with self.get_client() as client:
+            while True:
+                page = self._get_page(client, collection_name, where, include, page_size, offset)
+                if page:
+                    yield page
+                if len(page) < page_size:
+                    return
+                offset += page_size
+
+    def iter_documents(self, collection_name="Document", where: Optional[dict] = None,
+                       include=DOCUMENT_FIELDS, page_size: int = settings.DOCUMENT_PAGE_SIZE):
+        for page in self.iter_document_pages(collection_name, where, include, page_size):
+            yield from page
+
+    async def aiter_document_pages(self, collection_name="Document", where: Optional[dict] = None,
+                                   include=DOCUMENT_FIELDS, page_size: int = settings.DOCUMENT_PAGE_SIZE):
+        """Async variant of iter_document_pages; each page is fetched in a worker thread."""
+        include = list(include)
         client = await self.get_client_async()
+        offset = 0
+        while True:
+            page = await asyncio.to_thread(self._get_page, client, collection_name, where, include, page_size, offset)
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            offset += page_size
 
-        def sync_get():
-            try:
-                collection = client.get_collection(collection_name)
-                response = collection.get(include=["documents", "metadatas"], limit=None)
-
-                if not response or "documents" not in response:
-                    return {"data": []}
-
-                data = [{"text": doc, "metadata": meta} for doc, meta in
-                        zip(response["documents"], response["metadatas"])]
-                return {"data": data}
-
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=str(e))
-
-        return await asyncio.to_thread(sync_get)
+    async def get_document_async(self, collection_name="Document"):
+        """
+        Asynchronously retrieve documents from a ChromaDB collection.
+        Builds the full list; use aiter_document_pages (or GET /documents) for large collections.
+        """
+        data = []
+        async for page in self.aiter_document_pages(collection_name):
+            data.extend(page)
+        return {"data": [{"text": d["text"], "metadata": d["metadata"]} for d in data]}
 
     def get_document(self, collection_name="Document"):
         """Retrieve documents from a ChromaDB collection (synchronous for compatibility)."""
-        with self.get_client() as client:
-            try:
-                collection = client.get_collection(collection_name)
-                response = collection.get(include=["documents", "metadatas"], limit=None)
-
-                if not response or "documents" not in response:
-                    return {"data": []}
+        return {"data": [
+            {"text": d["text"], "metadata": d["metadata"]} for d in self.iter_documents(collection_name)
+        ]}
 
-                data = [{"text": doc, "metadata": meta} for doc, meta in
-                        zip(response["documents"], response["metadatas"])]
-                return {"data": data}
+    @staticmethod
+    def retention_filter(source: str, hours: Optional[float] = None) -> dict:
+        """`where` filter for documents of `source`, optionally only those older than `hours`."""
+        if hours is None:
+            return {"source": source}
+        cutoff_timestamp = (datetime.now(timezone.utc) - timedelta(hours=hours)).timestamp()
+        field = TIMESTAMP_FIELDS.get(source)
+        if field is None:
+            raise ValueError(f"No timestamp field known for source '{source}'")
+        return {"$and": [{"source": source}, {field: {"$lt": cutoff_timestamp}}]}
+
+    def delete_where(self, where: dict, collection_name="Document", batch_size: int = settings.RETENTION_BATCH_SIZE,
+                     progress: Optional[Callable[[int], None]] = None) -> int:
+        """
+        Delete every document matching `where` and return how many went.
 
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=str(e))
+        With `batch_size` 0 Chroma resolves and deletes the matches in one
+        call. Otherwise at most `batch_size` ids are deleted per call (only
+        ids are fetched, not documents or metadata), which keeps each write
+        short when a large backlog is purged; `progress` gets the running
+        total after each batch.
+        """
+        with self.get_client() as client, self._collection_errors(collection_name, http=False):
+            collection = self._collection(client, collection_name)
+            if not batch_size:
+                before = collection.count()
+                collection.delete(where=where)
+                deleted = max(0, before - collection.count())
+                self._mark_deleted(collection_name)
+                if deleted:
+                    # The deleted ids aren't known here; rebuild on the next search
+                    lexical_indexes.invalidate(collection_name)
+                return deleted
+
+            deleted = 0
+            while True:
+                doc_ids = collection.get(where=where, include=[], limit=batch_size)["ids"]
+                if not doc_ids:
+                    return deleted
+                collection.delete(ids=doc_ids)
+                deleted += len(doc_ids)
+                self._mark_deleted(collection_name)
+                lexical_indexes.remove(collection_name, doc_ids)
+                if progress is not None:
+                    progress(deleted)
+
+    def compact(self, min_free_ratio: float = 0.0) -> int:
+        """
+        VACUUM the Chroma SQLite file once at least `min_free_ratio` of its
+        pages are free (left behind by deletes), returning the bytes reclaimed.
+        """
+        path = os.path.join(CHROMA_DB_PATH, "chroma.sqlite3")
+        if not os.path.exists(path):
+            return 0
+        size = os.path.getsize(path)
+        with closing(sqlite3.connect(path, timeout=30)) as conn:
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            if not free or free < pages * min_free_ratio:
+                return 0
+            conn.execute("VACUUM")
+        return max(0, size - os.path.getsize(path))
+
+    def _delete_documents(self, client, source, hours, collection_name):
+        with self._collection_errors(collection_name):
+            # "all" drops the entire collection
+            if source == "all":
+                client.delete_collection(collection_name)
+                self.invalidate_collection(collection_name)
+                return {"message": f"Deleted entire collection '{collection_name}'"}
+
+            delete_filter = self.retention_filter(getattr(source, "value", source), hours)
+            total_deleted = self.delete_where(delete_filter, collection_name)
+
+        if total_deleted > 0:
+            print(f"\n\nDeleted {total_deleted} documents with filter: {delete_filter}")
+            return f"Deleted {total_deleted} documents with filter: {delete_filter}"
+        print(f"No matching documents found for filter: {delete_filter}")
+        return f"No matching documents found for filter: {delete_filter}"
 
     async def delete_document_async(self, source, hours=None, collection_name="Document"):
         """Asynchronously delete documents from ChromaDB based on filters."""
         client = await self.get_client_async()
-
-        def sync_delete():
-            try:
-                collection = client.get_collection(collection_name)
-
-                # If NO filter is provided → DELETE ENTIRE COLLECTION
-                if source == "all":
-                    client.delete_collection(collection_name)
-                    return {"message": f"Deleted entire collection '{collection_name}'"}
-
-                # Filter for selective deletion
-                delete_filter = {"source": source.value}
-
-                if hours is not None:
-                    cutoff_timestamp = (datetime.now(timezone.utc) - timedelta(hours=hours)).timestamp()
-                    if source.value == "web":
-                        delete_filter = {"updated_at": {"$lt": cutoff_timestamp}}
-                    if source.value == "file":
-                        delete_filter = {"uploaded_at": {"$lt": cutoff_timestamp}}
-
-                # Batch Deletion Logic to avoid request limit errors
-                batch_size = 5000  # ChromaDB limit
-                total_deleted = 0
-
-                while True:
-                    matching_docs = collection.get(where=delete_filter, include=["metadatas"], limit=batch_size)
-                    doc_ids = matching_docs.get("ids", [])
-                    if not doc_ids:
-                        break
-
-                    # Delete the current batch
-                    collection.delete(ids=doc_ids)
-                    total_deleted += len(doc_ids)
-
-                if total_deleted > 0:
-                    print(f"\n\nDeleted {total_deleted} documents with filter: {delete_filter}")
-                    return f"Deleted {total_deleted} documents with filter: {delete_filter}"
-                else:
-                    print(f"No matching documents found for filter: {delete_filter}")
-                    return f"No matching documents found for filter: {delete_filter}"
-
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=str(e))
-
-        return await asyncio.to_thread(sync_delete)
+        return await asyncio.to_thread(self._delete_documents, client, source, hours, collection_name)
 
     def delete_document(self, source, hours=None, collection_name="Document"):
         """Delete documents from ChromaDB (synchronous for compatibility)."""
         with self.get_client() as client:
-            try:
-                collection = client.get_collection(collection_name)
-
-                # If NO filter is provided → DELETE ENTIRE COLLECTION
-                if source == "all":
-                    client.delete_collection(collection_name)
-                    return {"message": f"Deleted entire collection '{collection_name}'"}
-
-                # Filter for selective deletion
-                delete_filter = {"source": source.value}
-
-                if hours is not None:
-                    cutoff_timestamp = (datetime.now(timezone.utc) - timedelta(hours=hours)).timestamp()
-                    if source.value == "web":
-                        delete_filter = {"updated_at": {"$lt": cutoff_timestamp}}
-                    if source.value == "file":
-                        delete_filter = {"uploaded_at": {"$lt": cutoff_timestamp}}
-
-                # Batch Deletion Logic to avoid request limit errors
-                batch_size = 5000  # ChromaDB limit
-                total_deleted = 0
-
-                while True:
-                    matching_docs = collection.get(where=delete_filter, include=["metadatas"], limit=batch_size)
-                    doc_ids = matching_docs.get("ids", [])
-                    if not doc_ids:
-                        break
-
-                    # Delete the current batch
-                    collection.delete(ids=doc_ids)
-                    total_deleted += len(doc_ids)
-
-                if total_deleted > 0:
-                    print(f"\n\nDeleted {total_deleted} documents with filter: {delete_filter}")
-                    return f"Deleted {total_deleted} documents with filter: {delete_filter}"
-                else:
-                    print(f"No matching documents found for filter: {delete_filter}")
-                    return f"No matching documents found for filter: {delete_filter}"
-
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=str(e))
+            return self._delete_documents(client, source, hours, collection_name)
 
     async def __semantic_search_async(self, embedding: list, collection_name="Document", top_k=5,
                                       include_embeddings=False):
@@ -258,11 +373,11 @@ class ChromaDBService:
         client = await self.get_client_async()
 
         def sync_search():
-            try:
-                collection = client.get_collection(collection_name)
+            with self._collection_errors(collection_name):
+                collection = self._collection(client, collection_name)
 
                 # Check if a collection is empty to avoid errors
-                if collection.count() == 0:
+                if self._is_empty(collection_name, collection):
                     return {"status": "success", "documents": []}
 
                 include_fields = ["documents", "metadatas", "distances"]
@@ -294,61 +409,165 @@ class ChromaDBService:
 
                 return {"status": "success", "documents": results}
 
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=str(e))
 
         return await asyncio.to_thread(sync_search)
 
-    def __semantic_search(self, embedding: list, collection_name="Document", top_k=5, include_embeddings=False):
-        """Perform semantic search (synchronous for compatibility)."""
-        with self.get_client() as client:
-            try:
-                collection = client.get_collection(collection_name)
-
-                # Check if a collection is empty to avoid errors
-                if collection.count() == 0:
-                    return {"status": "success", "documents": []}
-
-                include_fields = ["documents", "metadatas", "distances"]
-                if include_embeddings:
-                    include_fields.append("embeddings")
+    def _search_many(self, client, embeddings: list, collection_name: str, top_k: int, include_embeddings: bool):
+        """One collection.query for all embeddings; returns one ranked result list per embedding."""
+        with self._collection_errors(collection_name):
+            collection = self._collection(client, collection_name)
+            if self._is_empty(collection_name, collection):
+                return [[] for _ in embeddings]
 
-                response = collection.query(
-                    query_embeddings=[embedding],
-                    n_results=top_k,
-                    include=include_fields
-                )
+            include_fields = ["documents", "metadatas", "distances"]
+            if include_embeddings:
+                include_fields.append("embeddings")
 
-                if not response or not response.get("documents"):
-                    return {"status": "success", "documents": []}
+            response = collection.query(query_embeddings=embeddings, n_results=top_k, include=include_fields)
 
+            per_query = []
+            for q, ids in enumerate(response.get("ids") or []):
                 results = []
-                for i, doc in enumerate(response["documents"][0]):  # Access the first list of documents
+                for i, doc_id in enumerate(ids):
                     result = {
-                        "id": response["ids"][0][i] if i < len(response["ids"][0]) else None,
-                        "text": doc,
-                        "metadata": response["metadatas"][0][i] if i < len(response["metadatas"][0]) else {},
-                        "distance": response["distances"][0][i] if i < len(response["distances"][0]) else None,
+                        "id": doc_id,
+                        "text": response["documents"][q][i],
+                        "metadata": response["metadatas"][q][i] or {},
+                        "distance": response["distances"][q][i],
                     }
-
-                    if include_embeddings and "embeddings" in response:
-                        result["embedding"] = response["embeddings"][0][i]
+                    if include_embeddings:
+                        result["embedding"] = response["embeddings"][q][i]
                     results.append(result)
+                per_query.append(results)
+            return per_query
 
-                return {"status": "success", "documents": results}
 
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=str(e))
+    async def semantic_search_many(self, queries: List[str], collection_name="Document", top_k=5,
+                                   include_embeddings=False):
+        """
+        Search several texts at once (e.g. a query and its refine_query form,
+        or the last few turns): one embedding request and one collection.query
+        for all of them. Results are deduplicated and merged with reciprocal
+        rank fusion; `per_query` keeps each text's own ranking.
+        """
+        unique = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+        if not unique:
+            return {"status": "success", "documents": [], "per_query": {}}
 
+        embeddings = await embed_texts(unique)
+        client = await self.get_client_async()
+        per_query = await asyncio.to_thread(
+            self._search_many, client, embeddings, collection_name, top_k, include_embeddings
+        )
+        return {
+            "status": "success",
+            "documents": reciprocal_rank_fusion(per_query, limit=top_k),
+            "per_query": dict(zip(unique, per_query)),
+        }
+
+    def _lexical_search(self, query: str, collection_name: str, top_k: int) -> Optional[List[dict]]:
+        def count():
+            with self.get_client() as client:
+                return self._collection(client, collection_name).count()
+
+        return lexical_indexes.search(
+            collection_name, query, top_k, lambda: self.iter_document_pages(collection_name, include=["documents"]),
+            count,
+        )
+
+    def _fill_documents(self, client, collection_name: str, documents: List[dict]) -> List[dict]:
+        """Fetch text and metadata for results that only carry an id (BM25 hits); drop ids Chroma no longer has."""
+        missing = [doc["id"] for doc in documents if "text" not in doc]
+        if not missing:
+            return documents
+        with self._collection_errors(collection_name):
+            response = self._collection(client, collection_name).get(ids=missing, include=["documents", "metadatas"])
+        found = {
+            doc_id: (text, metadata or {})
+            for doc_id, text, metadata in zip(response["ids"], response["documents"], response["metadatas"])
+        }
+        filled = []
+        for doc in documents:
+            if "text" not in doc:
+                if doc["id"] not in found:
+                    continue
+                doc["text"], doc["metadata"] = found[doc["id"]]
+            filled.append(doc)
+        return filled
+
+    async def hybrid_search(self, queries: List[str], collection_name="Document", top_k=5,
+                            candidates: int = settings.HYBRID_CANDIDATES,
+                            budget_ms: int = settings.HYBRID_LATENCY_BUDGET_MS):
+        """
+        Vector search over all `queries` (semantic_search_many) and BM25 over
+        the first one, run concurrently and merged with reciprocal rank fusion.
+        BM25 catches exact identifiers (error codes, function and package
+        names) that embeddings blur. The index holds no text, so BM25-only
+        hits in the top `top_k` are read back from Chroma in one get.
+
+        After `budget_ms` the retrievers that have finished are fused and the
+        rest cancelled; if none has produced results by then, the first one
+        to do so is used. `retrievers` reports how many candidates each
+        contributed (None when it was skipped, late or failed).
+        """
+        queries = [q for q in queries if q and q.strip()]
+        if not queries:
+            return {"status": "success", "documents": [], "retrievers": {}}
+        tasks = {
+            "vector": asyncio.create_task(self.semantic_search_many(queries, collection_name, candidates)),
+            "lexical": asyncio.create_task(
+                asyncio.to_thread(self._lexical_search, queries[0], collection_name, candidates)
+            ),
+        }
+
+        def finished() -> Dict[str, List[List[dict]]]:
+            lists = {}
+            for name, task in tasks.items():
+                if not task.done() or task.cancelled() or task.exception() is not None:
+                    continue
+                result = task.result()
+                if name == "vector":
+                    lists[name] = list(result["per_query"].values())
+                elif result is not None:
+                    lists[name] = [result]
+            return lists
+
+        pending = set(tasks.values())
+        _, pending = await asyncio.wait(pending, timeout=budget_ms / 1000)
+        while pending and not finished():
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+
+        for name, task in tasks.items():
+            if task.done() and not task.cancelled() and task.exception() is not None:
+                print(f"[HYBRID] {name} search failed: {task.exception()}")
+        lists = finished()
+        if not lists and tasks["vector"].exception() is not None:
+            raise tasks["vector"].exception()
+
+        # Vector lists come first, so a document both retrievers found keeps the copy with its text
+        fused = reciprocal_rank_fusion([ranked for name in lists for ranked in lists[name]], limit=top_k)
+        client = await self.get_client_async()
+        return {
+            "status": "success",
+            "documents": await asyncio.to_thread(self._fill_documents, client, collection_name, fused),
+            "retrievers": {name: sum(map(len, lists[name])) if name in lists else None for name in tasks},
+        }
 
-    async def similar_search_async(self, query):
-        """Asynchronously perform similar search with proper dependency injection."""
+    async def similar_search_async(self, query, related_queries: Optional[List[str]] = None):
+        """
+        Asynchronously perform similar search with proper dependency injection.
+        `related_queries` (e.g. the refine_query rewrite) are searched in the
+        same round-trip and fused with the main query's results; with
+        HYBRID_SEARCH_ENABLED, BM25 results for the query are fused in too.
+        """
         try:
-
-
-            query_embedding = await asyncio.to_thread(self._get_text_embedding, query)
-
-            raw_response = await self.__semantic_search_async(query_embedding)
+            queries = [query, *(related_queries or [])]
+            if settings.HYBRID_SEARCH_ENABLED:
+                raw_response = await self.hybrid_search(queries)
+            else:
+                raw_response = await self.semantic_search_many(queries)
 
             structured_documents = []
             context_parts = []
@@ -362,14 +581,15 @@ class ChromaDBService:
                 for i in range(min(6, len(documents))):
                     doc = documents[i]
                     structured_documents.append(doc)
-                    distance = doc.get("distance", 0)
+                    # BM25-only hits have no distance
+                    distance = doc.get("distance")
 
-                    relevance = round((1 - distance) * 100, 2) if distance is not None else "Unknown"
+                    relevance = f"{round((1 - distance) * 100, 2)}%" if distance is not None else "Unknown"
 
                     source = doc["metadata"].get("source", "Unknown")
                     if source == "file":
                         filename = doc["metadata"].get("file_name", "Unnamed file")
-                        context_parts.append(f"Source (Relevance: {relevance}%) -> File: {filename}\n{doc['text']}")
+                        context_parts.append(f"Source (Relevance: {relevance}) -> File: {filename}\n{doc['text']}")
 
             top_k_match = "\n\n".join(context_parts) if context_parts else "No relevant context found."
             return top_k_match
@@ -377,41 +597,6 @@ class ChromaDBService:
         except Exception as e:
             raise e
 
-    def similar_search(self, query):
-        """Perform a similar search (synchronous for compatibility)."""
-        try:
-            query_embedding = self._get_text_embedding(query)
-            raw_response = self.__semantic_search(query_embedding)
-
-            # Restructure the response and format the top_k_match string
-            structured_documents = []
-            context_parts = []
-
-            if raw_response.get("documents") and len(raw_response["documents"]) > 0:
-                documents = raw_response["documents"]
-
-                # Create structured documents and format the context for each
-                for i in range(min(5, len(documents))):
-                    doc = documents[i]
-                    structured_documents.append(doc)
-
-                    # Format the context for this document
-                    source = doc["metadata"].get("source", "Unknown")
-                    context_parts.append(f"Source - {source}: {doc['text']}")
-
-            # Create the formatted top_k_match string
-            # top_k_match = "\n\n".join(context_parts) if context_parts else "No relevant context found."
-            return structured_documents
-
-        except Exception as e:
-            raise e
-
-
-    @staticmethod
-    def _get_text_embedding(sentence):
-        embeddings = GLOBAL_EMBEDDING_MODEL.encode(sentence)
-        return embeddings.tolist()
-
     @staticmethod
     def refine_query(user_query, previous_response):
         """
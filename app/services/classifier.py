@@ -0,0 +1,264 @@
+import os
+import re
+import threading
+import zlib
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.db_models import ChatLog
+from app.services.openai_client import generate_reply
+from app.templates.prompt import MESSAGE_CATEGORY
+
+# The ten categories of the MESSAGE_CATEGORY prompt
+CATEGORIES = [
+    "Question", "Doubt", "Request", "Problem", "Information",
+    "Feedback", "Greeting", "Acknowledgment", "Help/Guidance", "Emotional/Expressive",
+]
+DEFAULT_CATEGORY = "Question"
+RULE_CONFIDENCE = 1.0
+# Below CLASSIFIER_CONFIDENCE: the model or the LLM decides, the rule is only the fallback
+AMBIGUOUS_RULE_CONFIDENCE = 0.5
+# Labels written by these tiers are used for training; rule/model labels would
+# teach the model its own output
+TRAINING_SOURCES = ("llm", "human")
+
+_CANONICAL = {category.lower(): category for category in CATEGORIES}
+_CANONICAL.update({"acknowledgement": "Acknowledgment", "help": "Help/Guidance", "emotional": "Emotional/Expressive"})
+
+# Tier 1: (category, pattern, confidence); only near-certain patterns skip the model
+_RULES = [
+    ("Greeting", re.compile(
+        r"^(hi+|hello+|hey+|hiya|howdy|greetings|good (morning|afternoon|evening))( there| team| all)?[\s!.,]*$", re.I),
+     RULE_CONFIDENCE),
+    ("Acknowledgment", re.compile(
+        r"^(ok(ay)?|k|sure|got it|noted|thanks?( you)?( so much)?|thx|ty|great|cool|perfect|alright|yes|yep|yeah)[\s!.,]*$",
+        re.I), RULE_CONFIDENCE),
+    ("Problem", re.compile(
+        r"\b(traceback|stack ?trace|error code|segfault|(unhandled|uncaught) exception|"
+        r"exception (was |is )?(thrown|raised)|threw an exception)", re.I), RULE_CONFIDENCE),
+    # Exception class names ("ValueError", "KeyError"); case-sensitive so "terror" doesn't match
+    ("Problem", re.compile(r"\b[A-Z]\w*Error\b"), RULE_CONFIDENCE),
+    # Usually a problem, but not always ("do you make exceptions", "crash course")
+    ("Problem", re.compile(r"\b(exceptions?|crash(es|ed|ing)?|not working|doesn'?t work)\b", re.I),
+     AMBIGUOUS_RULE_CONFIDENCE),
+    ("Help/Guidance", re.compile(r"\b(step[- ]by[- ]step|walk me through|guide me)\b", re.I), RULE_CONFIDENCE),
+]
+
+_TOKEN = re.compile(r"[a-z0-9']+|[?!]")
+
+
+def normalize_category(label: Optional[str]) -> Optional[str]:
+    """Map LLM output or stored labels ("**question**.", "help") onto CATEGORIES."""
+    if not label:
+        return None
+    cleaned = label.strip().strip("*.:\"' ").lower()
+    if cleaned in _CANONICAL:
+        return _CANONICAL[cleaned]
+    for key, category in _CANONICAL.items():
+        if cleaned.startswith(key):
+            return category
+    return None
+
+
+def rule_match(message: str) -> Optional[Tuple[str, float]]:
+    """(category, confidence) of the first matching rule."""
+    text = message.strip()
+    for category, pattern, confidence in _RULES:
+        if pattern.search(text):
+            return category, confidence
+    return None
+
+
+def rule_category(message: str) -> Optional[str]:
+    match = rule_match(message)
+    return match[0] if match else None
+
+
+def _features(message: str, n_features: int) -> np.ndarray:
+    """Hashed word 1-2 grams and char 3-grams (crc32, so stable across processes)."""
+    text = message.lower()
+    words = _TOKEN.findall(text)
+    grams = ["w:" + w for w in words]
+    grams += ["b:" + a + " " + b for a, b in zip(words, words[1:])]
+    padded = f" {' '.join(words)} "
+    grams += ["c:" + padded[i:i + 3] for i in range(len(padded) - 2)]
+    # Index 0 is reserved for the bias feature
+    return np.array([0] + [zlib.crc32(g.encode()) % (n_features - 1) + 1 for g in grams], dtype=np.int64)
+
+
+class HashedNgramClassifier:
+    """Multinomial logistic regression over hashed n-gram features, in numpy."""
+
+    def __init__(self, labels: Sequence[str] = CATEGORIES, n_features: int = settings.CLASSIFIER_HASH_FEATURES):
+        self.labels = list(labels)
+        self.n_features = n_features
+        self.weights = np.zeros((n_features, len(self.labels)), dtype=np.float32)
+
+    def _logits(self, rows: List[np.ndarray]):
+        """Logits plus the flattened feature indices, per-feature scale and row lengths (for the gradient)."""
+        lengths = np.array([len(r) for r in rows])
+        indices = np.concatenate(rows)
+        scale = np.repeat(1.0 / np.sqrt(lengths), lengths).astype(np.float32)[:, None]
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        return np.add.reduceat(self.weights[indices] * scale, starts, axis=0), indices, scale, lengths
+
+    def fit(self, messages: Sequence[str], labels: Sequence[str], epochs: int = 15,
+            lr: float = 2.0, l2: float = 1e-6, batch_size: int = 256, seed: int = 0) -> "HashedNgramClassifier":
+        label_index = {label: i for i, label in enumerate(self.labels)}
+        rows = [_features(m, self.n_features) for m in messages]
+        targets = np.array([label_index[label] for label in labels])
+        rng = np.random.default_rng(seed)
+
+        for _ in range(epochs):
+            order = rng.permutation(len(rows))
+            for start in range(0, len(order), batch_size):
+                batch = order[start:start + batch_size]
+                logits, indices, scale, lengths = self._logits([rows[i] for i in batch])
+                probs = _softmax(logits)
+                probs[np.arange(len(batch)), targets[batch]] -= 1.0
+                grad = np.repeat(probs, lengths, axis=0).astype(np.float32) * scale
+                np.add.at(self.weights, indices, -lr * grad / len(batch))
+                if l2:
+                    self.weights[indices] *= (1.0 - lr * l2)
+        return self
+
+    def predict_proba(self, messages: Sequence[str]) -> np.ndarray:
+        logits, _, _, _ = self._logits([_features(m, self.n_features) for m in messages])
+        return _softmax(logits)
+
+    def predict(self, message: str) -> Tuple[str, float]:
+        probs = self.predict_proba([message])[0]
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+    def save(self, path: str) -> None:
+        # Hashed weights are mostly zero; store only the touched rows
+        rows = np.flatnonzero(np.any(self.weights != 0, axis=1))
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, rows=rows, weights=self.weights[rows],
+                            labels=np.array(self.labels), n_features=self.n_features)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "HashedNgramClassifier":
+        with np.load(path) as data:
+            model = cls(labels=[str(label) for label in data["labels"]], n_features=int(data["n_features"]))
+            model.weights[data["rows"]] = data["weights"]
+        return model
+
+
+def _softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return shifted / shifted.sum(axis=1, keepdims=True)
+
+
+class MessageClassifier:
+    """
+    Rules first, then the hashed n-gram model; the LLM (MESSAGE_CATEGORY
+    prompt) is only asked when the model's confidence is below `threshold`.
+    """
+
+    def __init__(self, model_path: str = settings.CLASSIFIER_MODEL_PATH,
+                 threshold: float = settings.CLASSIFIER_CONFIDENCE,
+                 llm_fallback: bool = settings.CLASSIFIER_LLM_FALLBACK):
+        self.model_path = model_path
+        self.threshold = threshold
+        self.llm_fallback = llm_fallback
+        self._model: Optional[HashedNgramClassifier] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.counts = {"rule": 0, "model": 0, "llm": 0, "default": 0}
+
+    @property
+    def model(self) -> Optional[HashedNgramClassifier]:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    if os.path.exists(self.model_path):
+                        self._model = HashedNgramClassifier.load(self.model_path)
+                        print(f"[CLASSIFIER] Loaded model from {self.model_path}")
+                    else:
+                        print(f"[CLASSIFIER] No model at {self.model_path}; using rules and LLM only")
+                    self._loaded = True
+        return self._model
+
+    def set_model(self, model: Optional[HashedNgramClassifier]) -> None:
+        with self._lock:
+            self._model, self._loaded = model, True
+
+    def classify_local(self, message: str) -> Tuple[Optional[str], float, str]:
+        """Returns (category, confidence, tier) without any network call."""
+        rule = rule_match(message)
+        if rule and rule[1] >= self.threshold:
+            return rule[0], rule[1], "rule"
+        if self.model is not None:
+            category, confidence = self.model.predict(message)
+            if rule is None or confidence >= rule[1]:
+                return category, confidence, "model"
+        if rule:
+            return rule[0], rule[1], "rule"
+        return None, 0.0, "default"
+
+    async def classify_with_source(self, message: str) -> Tuple[str, str]:
+        """(category, tier that decided it); the tier is stored as ChatLog.category_source."""
+        category, confidence, tier = self.classify_local(message)
+        if confidence < self.threshold and self.llm_fallback:
+            try:
+                llm_category = normalize_category(await generate_reply(message, system_prompt=MESSAGE_CATEGORY))
+                if llm_category:
+                    category, tier = llm_category, "llm"
+            except Exception as e:
+                print(f"[CLASSIFIER] LLM fallback failed: {e}")
+        if category is None:
+            category, tier = DEFAULT_CATEGORY, "default"
+        self.counts[tier] += 1
+        return category, tier
+
+    async def classify(self, message: str) -> str:
+        category, _ = await self.classify_with_source(message)
+        return category
+
+    def stats(self) -> dict:
+        return {**self.counts, "model_loaded": self.model is not None, "threshold": self.threshold}
+
+
+async def load_labeled_logs(db: AsyncSession, limit: Optional[int] = None,
+                            sources: Optional[Sequence[str]] = TRAINING_SOURCES) -> Tuple[List[str], List[str]]:
+    """
+    (messages, categories) from chat_logs, keeping only rows labelled with one
+    of CATEGORIES by one of `sources` (ChatLog.category_source); None keeps
+    every label, including rows written before the source was recorded.
+    """
+    stmt = select(ChatLog.user_message, ChatLog.category).where(ChatLog.category.isnot(None)).order_by(ChatLog.id)
+    if sources is not None:
+        stmt = stmt.where(ChatLog.category_source.in_(sources))
+    if limit:
+        stmt = stmt.limit(limit)
+    messages, labels = [], []
+    async for message, label in await db.stream(stmt):
+        category = normalize_category(label)
+        if message and category:
+            messages.append(message)
+            labels.append(category)
+    return messages, labels
+
+
+message_classifier = MessageClassifier()
+
+
+async def classify_message(message: str) -> str:
+    return await message_classifier.classify(message)
+
+
+async def classify_message_with_source(message: str) -> Tuple[str, str]:
+    return await message_classifier.classify_with_source(message)
+
+
+def predict_category(message: str) -> str:
+    """Local-only classification (no LLM call), e.g. for display in the UI."""
+    category, _, _ = message_classifier.classify_local(message)
+    return category or DEFAULT_CATEGORY
@@ -0,0 +1,155 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+# Rough chars-per-token ratio for English text when no tokenizer file is configured
+CHARS_PER_TOKEN = 4
+
+
+class TokenCounter:
+    """
+    Counts tokens with a local `tokenizers` tokenizer.json (TOKENIZER_PATH).
+    Without one it falls back to a chars/4 estimate, so prompt assembly never
+    depends on network access to a model hub.
+    """
+
+    def __init__(self, path: str = settings.TOKENIZER_PATH):
+        self.path = path
+        self._tokenizer = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    if self.path:
+                        try:
+                            from tokenizers import Tokenizer
+                            self._tokenizer = Tokenizer.from_file(self.path)
+                        except Exception as e:
+                            print(f"[TOKENS] Could not load tokenizer from {self.path}, estimating instead: {e}")
+                    self._loaded = True
+        return self._tokenizer
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        tokenizer = self._get()
+        if tokenizer is None:
+            return -(-len(text) // CHARS_PER_TOKEN)
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def truncate(self, text: str, max_tokens: int, keep: str = "head") -> str:
+        """Cut `text` to at most `max_tokens`, keeping its start ("head") or end ("tail")."""
+        if max_tokens <= 0:
+            return ""
+        tokenizer = self._get()
+        if tokenizer is None:
+            max_chars = max_tokens * CHARS_PER_TOKEN
+            if len(text) <= max_chars:
+                return text
+            return text[:max_chars] if keep == "head" else text[-max_chars:]
+
+        offsets = tokenizer.encode(text, add_special_tokens=False).offsets
+        if len(offsets) <= max_tokens:
+            return text
+        if keep == "head":
+            return text[:offsets[max_tokens - 1][1]]
+        return text[offsets[-max_tokens][0]:]
+
+
+token_counter = TokenCounter()
+
+
+@dataclass
+class Section:
+    """
+    One part of a prompt. Lower `priority` is more important and is trimmed
+    last. `required` sections are counted but never trimmed. When `items` is
+    given, whole items are dropped (oldest first with keep="tail") before any
+    text is cut.
+    """
+    name: str
+    text: str = ""
+    budget: int = 0
+    priority: int = 0
+    keep: str = "head"
+    required: bool = False
+    items: Optional[List[str]] = None
+    separator: str = ""
+    tokens: int = field(default=0, init=False)
+    trimmed: bool = field(default=False, init=False)
+
+
+class ContextAssembler:
+    """
+    Fits prompt sections into per-section budgets and an overall budget.
+    Each section is first cut to its own budget; if the total still exceeds
+    `total_budget`, the least important sections shrink further.
+    """
+
+    def __init__(self, total_budget: int = settings.CONTEXT_MAX_TOKENS, counter: TokenCounter = token_counter):
+        self.total_budget = total_budget
+        self.counter = counter
+
+    def _fit_items(self, section: Section, budget: int) -> str:
+        items = section.items if section.keep == "head" else list(reversed(section.items))
+        kept, used = [], 0
+        for item in items:
+            cost = self.counter.count(item + section.separator)
+            if used + cost > budget:
+                if not kept:
+                    # Not even one whole item fits; cut the most important one
+                    kept.append(self.counter.truncate(item, budget, keep=section.keep))
+                break
+            kept.append(item)
+            used += cost
+        if section.keep != "head":
+            kept.reverse()
+        return section.separator.join(kept)
+
+    def _fit(self, section: Section, budget: int) -> None:
+        if section.required:
+            return
+        if section.tokens <= budget:
+            return
+        if section.items is not None:
+            section.text = self._fit_items(section, budget)
+        else:
+            section.text = self.counter.truncate(section.text, budget, keep=section.keep)
+        section.tokens = self.counter.count(section.text)
+        section.trimmed = True
+
+    def assemble(self, sections: List[Section]) -> Dict[str, str]:
+        for section in sections:
+            if section.items is not None:
+                section.text = section.separator.join(section.items)
+            section.tokens = self.counter.count(section.text)
+            if section.budget:
+                self._fit(section, section.budget)
+
+        overflow = sum(s.tokens for s in sections) - self.total_budget
+        for section in sorted(sections, key=lambda s: s.priority, reverse=True):
+            if overflow <= 0:
+                break
+            before = section.tokens
+            self._fit(section, max(0, section.tokens - overflow))
+            overflow -= before - section.tokens
+
+        return {section.name: section.text for section in sections}
+
+    @staticmethod
+    def report(sections: List[Section]) -> Dict[str, dict]:
+        return {
+            section.name: {"tokens": section.tokens, "budget": section.budget, "trimmed": section.trimmed}
+            for section in sections
+        }
+
+
+def format_report(report: Dict[str, dict]) -> str:
+    return ", ".join(
+        f"{name}={info['tokens']}{'*' if info.get('trimmed') else ''}" for name, info in report.items()
+    )
@@ -1,19 +1,27 @@
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc, func
+from app.core.config import settings
 from app.models.db_models import ChatLog
+from app.services.context_assembler import ContextAssembler, Section
 from app.services.openai_client import generate_reply
+from app.services.summary_cache import summary_cache
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 import json
 
 
+FALLBACK_SUMMARY = "Previous conversation topics"
+
+
 class ConversationService:
     """Service to handle conversation continuity and context management"""
     
     def __init__(self):
         self.max_history_messages = 10  # Limit context size
         self.recent_conversation_threshold = timedelta(hours=24)  # Consider conversations within 24h as recent
+        self.summary_cache = summary_cache
+        self.context_assembler = ContextAssembler()
     
     async def get_user_conversation_history(
         self, 
@@ -38,7 +46,7 @@ class ConversationService:
         result = await db.execute(stmt)
         return result.scalars().all()
     
-    async def analyze_conversation_context(self, history: List[ChatLog]) -> Dict:
+    async def analyze_conversation_context(self, history: List[ChatLog], db: Optional[AsyncSession] = None) -> Dict:
         """Analyze conversation history to extract context and topics"""
         
         if not history:
@@ -71,6 +79,7 @@ class ConversationService:
         
         # Find the most recent significant conversation
         most_recent_conv = None
+        most_recent_conv_id = None
         most_recent_time = None
         
         for conv_id, conv_data in conversations.items():
@@ -78,6 +87,7 @@ class ConversationService:
             if conv_data["message_count"] >= 2:
                 if most_recent_time is None or conv_data["last_activity"] > most_recent_time:
                     most_recent_conv = conv_data
+                    most_recent_conv_id = conv_id
                     most_recent_time = conv_data["last_activity"]
         
         if not most_recent_conv:
@@ -97,10 +107,32 @@ class ConversationService:
                                    key=lambda x: sum(1 for msg in most_recent_conv["messages"] 
                                                    if msg["category"] == x)),
             "message_count": most_recent_conv["message_count"],
-            "recent_messages": most_recent_conv["messages"][-3:],  # Last 3 messages for context
-            "conversation_summary": await self._summarize_conversation(most_recent_conv["messages"])
+            # History arrives newest first; keep the last 3 messages, oldest to newest
+            "recent_messages": sorted(most_recent_conv["messages"], key=lambda msg: msg["created_at"])[-3:],
+            "conversation_summary": await self._get_conversation_summary(
+                db, most_recent_conv_id, most_recent_time, most_recent_conv["messages"]
+            )
         }
     
+    async def _get_conversation_summary(
+        self,
+        db: Optional[AsyncSession],
+        conversation_id: str,
+        last_message_at: datetime,
+        messages: List[Dict]
+    ) -> str:
+        """Serve the summary from cache, summarizing only when the conversation has new logs"""
+        
+        summary = await self.summary_cache.get(db, conversation_id, last_message_at)
+        if summary is not None:
+            return summary
+        
+        summary = await self._summarize_conversation(messages)
+        # Don't pin the fallback text; retry the LLM next time instead
+        if summary != FALLBACK_SUMMARY:
+            await self.summary_cache.set(conversation_id, last_message_at, summary, persist=db is not None)
+        return summary
+    
     async def _summarize_conversation(self, messages: List[Dict]) -> str:
         """Create a brief summary of the conversation topic"""
         
@@ -124,14 +156,15 @@ class ConversationService:
             summary = await generate_reply(summary_prompt.strip())
             return summary
         except Exception:
-            return "Previous conversation topics"
+            return FALLBACK_SUMMARY
     
     async def should_offer_continuation(
         self, 
         db: AsyncSession, 
         user_id: str, 
         current_message: str,
-        current_conversation_id: Optional[str] = None
+        current_conversation_id: Optional[str] = None,
+        history: Optional[List[ChatLog]] = None
     ) -> Tuple[bool, Optional[Dict]]:
         """
         Determine if we should offer conversation continuation to the user
@@ -141,16 +174,17 @@ class ConversationService:
         if not user_id:
             return False, None
         
-        # Get user's conversation history
-        history = await self.get_user_conversation_history(
-            db, user_id, exclude_conversation_id=current_conversation_id
-        )
+        # Get user's conversation history (callers may pass what they already fetched)
+        if history is None:
+            history = await self.get_user_conversation_history(
+                db, user_id, exclude_conversation_id=current_conversation_id
+            )
         
         if not history:
             return False, None
         
         # Analyze the context
-        context = await self.analyze_conversation_context(history)
+        context = await self.analyze_conversation_context(history, db=db)
         
         if not context["has_context"]:
             return False, None
@@ -212,24 +246,51 @@ class ConversationService:
         current_message: str, 
         context: Dict, 
         system_prompt: str,
-        include_full_context: bool = False
+        include_full_context: bool = False,
+        token_report: Optional[Dict] = None
     ) -> str:
-        """Build an enhanced prompt with conversation context"""
+        """
+        Build an enhanced prompt with conversation context.
+        History and summary are trimmed to their token budgets; history is in
+        chronological order, so trimming from the front keeps the newest
+        messages. Per-section token usage is written into `token_report`.
+        """
         
         if not context or not context.get("has_context"):
             return system_prompt
         
-        context_section = ""
+        sections = [
+            Section("system", system_prompt, budget=settings.CONTEXT_BUDGET_SYSTEM, priority=0),
+            Section("message", current_message, required=True),
+        ]
         if include_full_context and context.get("recent_messages"):
-            context_section = "\n\nPrevious conversation context:\n"
-            for msg in context["recent_messages"]:
-                context_section += f"User: {msg['user_message']}\n"
-                context_section += f"Assistant: {msg['bot_response']}\n\n"
+            history = Section(
+                "history",
+                items=[
+                    f"User: {msg['user_message']}\nAssistant: {msg['bot_response']}\n\n"
+                    for msg in context["recent_messages"]
+                ],
+                budget=settings.CONTEXT_BUDGET_HISTORY,
+                priority=2,
+                keep="tail",
+            )
+        else:
+            history = Section(
+                "summary", context["conversation_summary"], budget=settings.CONTEXT_BUDGET_SUMMARY, priority=1
+            )
+        sections.append(history)
+        
+        fitted = self.context_assembler.assemble(sections)
+        if token_report is not None:
+            token_report.update(self.context_assembler.report(sections))
+        
+        if history.name == "history":
+            context_section = "\n\nPrevious conversation context:\n" + fitted["history"]
         else:
-            context_section = f"\n\nPrevious conversation summary: {context['conversation_summary']}"
+            context_section = f"\n\nPrevious conversation summary: {fitted['summary']}"
         
         enhanced_prompt = f"""
-        {system_prompt}
+        {fitted["system"]}
         
         IMPORTANT: This user has previous conversation history with you.{context_section}
         
@@ -238,4 +299,4 @@ class ConversationService:
         If relevant, you can reference previous discussions to provide better continuity and personalized assistance.
         """
         
-        return enhanced_prompt
\ No newline at end of file
+        return enhanced_prompt
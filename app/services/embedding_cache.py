@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from app.core.config import settings
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case so trivially different inputs share an entry."""
+    return " ".join(text.split()).lower()
+
+
+def _cache_key(model: str, text: str) -> bytes:
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).digest()
+
+
+def _pack(vector: List[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def _unpack(blob: bytes) -> List[float]:
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed on (model, normalized text hash).
+    Vectors are stored as float32 blobs in SQLite, with an in-process LRU in
+    front. The table is bounded by max_rows; the least recently used rows are
+    evicted in bulk once it grows past that.
+    """
+
+    def __init__(
+        self,
+        path: str = settings.EMBEDDING_CACHE_PATH,
+        max_rows: int = settings.EMBEDDING_CACHE_MAX_ROWS,
+        memory_size: int = settings.EMBEDDING_CACHE_MEMORY_SIZE,
+    ):
+        self.path = path
+        self.max_rows = max_rows
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._rows = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key BLOB PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " dim INTEGER NOT NULL,"
+                " vec BLOB NOT NULL,"
+                " last_used REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+            self._rows = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return self._conn
+
+    def _remember(self, key: bytes, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def _lookup_memory(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(found)
+        return found
+
+    def _lookup_disk(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        if not keys:
+            return {}
+        with self._lock:
+            conn = self._db()
+            placeholders = ",".join("?" * len(keys))
+            rows = conn.execute(f"SELECT key, vec FROM embeddings WHERE key IN ({placeholders})", keys).fetchall()
+            found = {key: _unpack(blob) for key, blob in rows}
+            if found:
+                conn.execute(
+                    f"UPDATE embeddings SET last_used = ? WHERE key IN ({','.join('?' * len(found))})",
+                    [time.time(), *found.keys()],
+                )
+                conn.commit()
+            for key, vector in found.items():
+                self._remember(key, vector)
+            self.disk_hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def _store(self, model: str, items: Dict[bytes, List[float]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._db()
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, model, dim, vec, last_used) VALUES (?, ?, ?, ?, ?)",
+                [(key, model, len(vector), _pack(vector), now) for key, vector in items.items()],
+            )
+            self._rows += conn.total_changes - before
+            if self._rows > self.max_rows:
+                # Evict a tenth of the table at once so eviction isn't paid on every insert
+                excess = self._rows - int(self.max_rows * 0.9)
+                conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self._rows -= excess
+            conn.commit()
+            for key, vector in items.items():
+                self._remember(key, vector)
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        keys = [_cache_key(model, text) for text in texts]
+        found = self._lookup_memory(keys)
+        found.update(self._lookup_disk([key for key in dict.fromkeys(keys) if key not in found]))
+        return [found.get(key) for key in keys]
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]) -> None:
+        self._store(model, {_cache_key(model, text): list(vector) for text, vector in zip(texts, vectors)})
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text])[0]
+
+    def put(self, model: str, text: str, vector: List[float]) -> None:
+        self.put_many(model, [text], [vector])
+
+    async def aget_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Async variant: memory hits are served inline, only SQLite reads go to a thread."""
+        keys = [_cache_key(model, text) for text in texts]
+        found = self._lookup_memory(keys)
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing:
+            found.update(await asyncio.to_thread(self._lookup_disk, missing))
+        return [found.get(key) for key in keys]
+
+    async def aput_many(self, model: str, texts: List[str], vectors: List[List[float]]) -> None:
+        await asyncio.to_thread(self.put_many, model, texts, vectors)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "disk_rows": self._rows,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+embedding_cache = EmbeddingCache()
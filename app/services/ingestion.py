@@ -0,0 +1,282 @@
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.chroma_service import ChromaDBService
+from app.services.lexical_index import lexical_indexes
+from app.services.openai_client import embed_texts
+
+
+@dataclass
+class Chunk:
+    id: str
+    text: str
+    metadata: dict
+
+
+@dataclass
+class _FileWrite:
+    """A file's stored chunks that are gone, deleted once its `pending` new chunks are written."""
+    gone: List[str]
+    pending: int
+
+
+@dataclass
+class IngestReport:
+    files: int = 0
+    chunks: int = 0
+    embedded: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+    failed_chunks: int = 0
+    failed_files: List[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+    def as_dict(self) -> dict:
+        return {**self.__dict__, "seconds": round(self.seconds, 2)}
+
+
+def iter_files(paths: Iterable[str], extensions: Tuple[str, ...]) -> Iterator[str]:
+    """Files under `paths` (files or directories, walked recursively) with a matching extension."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(extensions):
+                        yield os.path.join(root, name)
+        elif os.path.isfile(path):
+            yield path
+
+
+def _paragraphs(lines: Iterable[str]) -> Iterator[str]:
+    paragraph = []
+    for line in lines:
+        if line.strip():
+            paragraph.append(line.rstrip())
+        elif paragraph:
+            yield "\n".join(paragraph)
+            paragraph = []
+    if paragraph:
+        yield "\n".join(paragraph)
+
+
+def chunk_lines(lines: Iterable[str], chunk_chars: int, overlap: int) -> Iterator[str]:
+    """
+    Pack paragraphs into chunks of up to `chunk_chars` characters, reading
+    `lines` lazily. Paragraphs longer than a chunk are split with `overlap`
+    characters carried into the next piece.
+    """
+    current = ""
+    for paragraph in _paragraphs(lines):
+        while len(paragraph) > chunk_chars:
+            if current:
+                yield current
+                current = ""
+            yield paragraph[:chunk_chars]
+            paragraph = paragraph[chunk_chars - overlap:]
+        if current and len(current) + 2 + len(paragraph) > chunk_chars:
+            yield current
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        yield current
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IngestionPipeline:
+    """
+    Ingest files into a knowledge base collection incrementally.
+
+    Chunk ids are derived from the file id and the chunk's content hash, so
+    a chunk that is already stored is never re-embedded, even if it moved
+    within the file; its metadata (chunk_number, uploaded_at) is refreshed
+    instead. Chunks that disappeared from a file are deleted only after all of
+    the file's new chunks are written, so a failed batch never leaves the file
+    without content. New chunks are embedded in batches by `concurrency`
+    workers and written by a single writer in bulk upserts.
+    """
+
+    def __init__(
+        self,
+        service: Optional[ChromaDBService] = None,
+        collection_name: str = "Document",
+        chunk_chars: int = settings.INGEST_CHUNK_CHARS,
+        overlap: int = settings.INGEST_CHUNK_OVERLAP,
+        embed_batch: int = settings.INGEST_EMBED_BATCH,
+        concurrency: int = settings.INGEST_CONCURRENCY,
+        upsert_batch: int = settings.INGEST_UPSERT_BATCH,
+        extensions: str = settings.INGEST_EXTENSIONS,
+    ):
+        if not 0 <= overlap < chunk_chars:
+            # chunk_lines advances by chunk_chars - overlap, so it would never finish
+            raise ValueError(f"Chunk overlap must be >= 0 and < chunk size ({chunk_chars}), got {overlap}")
+        self.service = service or ChromaDBService()
+        self.collection_name = collection_name
+        self.chunk_chars = chunk_chars
+        self.overlap = overlap
+        self.embed_batch = embed_batch
+        self.concurrency = concurrency
+        self.upsert_batch = upsert_batch
+        self.extensions = tuple(e.strip().lower() for e in extensions.split(",") if e.strip())
+
+    @staticmethod
+    def file_id(path: str) -> str:
+        return hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+
+    def _chunk_file(self, path: str, uploaded_at: float) -> List[Chunk]:
+        file_id = self.file_id(path)
+        chunks, seen = [], set()
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for number, text in enumerate(chunk_lines(f, self.chunk_chars, self.overlap)):
+                digest = content_hash(text)
+                chunk_id = f"{file_id}_{digest[:16]}"
+                if chunk_id in seen:
+                    continue
+                seen.add(chunk_id)
+                chunks.append(Chunk(chunk_id, text, {
+                    "source": "file",
+                    "file_id": file_id,
+                    "file_name": os.path.basename(path),
+                    "file_path": os.path.abspath(path),
+                    "chunk_number": number,
+                    "content_hash": digest,
+                    "uploaded_at": uploaded_at,
+                }))
+        return chunks
+
+    def _plan_file(self, collection, path: str, uploaded_at: float) -> Tuple[List[Chunk], List[Chunk], List[str]]:
+        """Split a file's chunks into (new, unchanged) and list the stored ids that are gone."""
+        chunks = self._chunk_file(path, uploaded_at)
+        stored = collection.get(where={"file_id": self.file_id(path)}, include=[])["ids"]
+        stored_ids = set(stored)
+        new = [c for c in chunks if c.id not in stored_ids]
+        unchanged = [c for c in chunks if c.id in stored_ids]
+        current = {c.id for c in chunks}
+        return new, unchanged, [doc_id for doc_id in stored if doc_id not in current]
+
+    async def ingest(self, paths: Iterable[str]) -> IngestReport:
+        report = IngestReport()
+        started = time.perf_counter()
+        collection = await self.service.get_or_create_collection(self.collection_name)
+        uploaded_at = datetime.now(timezone.utc).timestamp()
+
+        # files -> embed workers -> single writer, with bounded queues for backpressure
+        to_embed: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        to_write: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        # Failed batches are counted rather than raised, so the other stages
+        # keep draining their queues; those chunks are retried on the next run
+        async def embed_worker():
+            while (batch := await to_embed.get()) is not None:
+                try:
+                    vectors = await embed_texts([c.text for c, _ in batch])
+                except Exception as e:
+                    print(f"[INGEST] Embedding {len(batch)} chunk(s) failed: {e}")
+                    report.failed_chunks += len(batch)
+                    continue
+                await to_write.put((batch, vectors))
+
+        async def writer():
+            pending: List[Tuple[Chunk, _FileWrite, list]] = []
+
+            async def flush():
+                if not pending:
+                    return
+                try:
+                    await asyncio.to_thread(
+                        collection.upsert,
+                        ids=[c.id for c, _, _ in pending],
+                        embeddings=[v for _, _, v in pending],
+                        documents=[c.text for c, _, _ in pending],
+                        metadatas=[c.metadata for c, _, _ in pending],
+                    )
+                    self.service._mark_written(self.collection_name)
+                    lexical_indexes.add(
+                        self.collection_name, [c.id for c, _, _ in pending], [c.text for c, _, _ in pending]
+                    )
+                    report.embedded += len(pending)
+                except Exception as e:
+                    print(f"[INGEST] Upserting {len(pending)} chunk(s) failed: {e}")
+                    report.failed_chunks += len(pending)
+                else:
+                    # A file whose new chunks are all stored no longer needs its old ones
+                    for _, file_write, _ in pending:
+                        file_write.pending -= 1
+                        if file_write.pending == 0 and file_write.gone:
+                            await self._delete_gone(collection, file_write.gone, report)
+                pending.clear()
+
+            while (item := await to_write.get()) is not None:
+                batch, vectors = item
+                pending.extend((chunk, file_write, vector) for (chunk, file_write), vector in zip(batch, vectors))
+                if len(pending) >= self.upsert_batch:
+                    await flush()
+            await flush()
+
+        workers = [asyncio.create_task(embed_worker()) for _ in range(self.concurrency)]
+        writer_task = asyncio.create_task(writer())
+        try:
+            batch: List[Tuple[Chunk, _FileWrite]] = []
+            for path in iter_files(paths, self.extensions):
+                try:
+                    new, unchanged, gone = await asyncio.to_thread(self._plan_file, collection, path, uploaded_at)
+                except (OSError, UnicodeError) as e:
+                    print(f"[INGEST] Skipping {path}: {e}")
+                    report.failed_files.append(path)
+                    continue
+                report.files += 1
+                report.chunks += len(new) + len(unchanged)
+                if unchanged:
+                    # No re-embedding; only chunk_number / uploaded_at move forward
+                    await asyncio.to_thread(self._update_metadata, collection, unchanged)
+                    report.unchanged += len(unchanged)
+                if not new:
+                    if gone:
+                        await self._delete_gone(collection, gone, report)
+                    continue
+                file_write = _FileWrite(gone, len(new))
+                for chunk in new:
+                    batch.append((chunk, file_write))
+                    if len(batch) >= self.embed_batch:
+                        await to_embed.put(batch)
+                        batch = []
+            if batch:
+                await to_embed.put(batch)
+            for _ in workers:
+                await to_embed.put(None)
+            await asyncio.gather(*workers)
+            await to_write.put(None)
+            await writer_task
+        except BaseException:
+            for task in [*workers, writer_task]:
+                task.cancel()
+            raise
+
+        report.seconds = time.perf_counter() - started
+        print(f"[INGEST] {report.as_dict()}")
+        return report
+
+    async def _delete_gone(self, collection, gone: List[str], report: IngestReport) -> None:
+        try:
+            await asyncio.to_thread(collection.delete, ids=gone)
+        except Exception as e:
+            # Left in place; the next run finds them gone again
+            print(f"[INGEST] Deleting {len(gone)} stale chunk(s) failed: {e}")
+            return
+        self.service._mark_deleted(self.collection_name)
+        lexical_indexes.remove(self.collection_name, gone)
+        report.deleted += len(gone)
+
+    def _update_metadata(self, collection, chunks: List[Chunk]) -> None:
+        for start in range(0, len(chunks), self.upsert_batch):
+            part = chunks[start:start + self.upsert_batch]
+            collection.update(ids=[c.id for c in part], metadatas=[c.metadata for c in part])
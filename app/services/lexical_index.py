@@ -0,0 +1,244 @@
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.core.config import settings
+
+# Identifiers are kept whole ("err_conn_refused", "numpy.linalg", "e1101",
+# "my-package") and also split into their parts, so both the exact
+# identifier and its pieces match
+_TOKEN = re.compile(r"[A-Za-z0-9_]+(?:[.\-:/][A-Za-z0-9_]+)*")
+_PARTS = re.compile(r"[A-Za-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in into is it its me my not of on "
+    "or our so that the their then there these this to was we what when where which who why will with you your".split()
+)
+
+Loader = Callable[[], Iterable[List[dict]]]
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        parts = _PARTS.findall(token)
+        if not parts:
+            continue
+        if len(parts) > 1 or parts[0] != token:
+            tokens.append(token)
+        tokens.extend(p for p in parts if p not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    In-memory inverted index scored with Okapi BM25.
+
+    Only postings and ids are kept: documents get an internal number,
+    postings map a term to {number: term frequency}, and results are ids
+    (callers fetch text from Chroma). Removed or replaced documents leave
+    their postings behind as tombstones that searches skip; they are swept
+    out in one pass once they make up `sweep_ratio` of the index.
+    """
+
+    def __init__(self, k1: float = settings.LEXICAL_BM25_K1, b: float = settings.LEXICAL_BM25_B,
+                 sweep_ratio: float = 0.2):
+        self.k1 = k1
+        self.b = b
+        self.sweep_ratio = sweep_ratio
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._numbers: Dict[str, int] = {}  # id -> number
+        self._ids: Dict[int, str] = {}  # number -> id, live documents only
+        self._lengths: Dict[int, int] = {}
+        self._next = 0
+        self._dead = 0
+        self._total_len = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _remove(self, doc_id: str) -> None:
+        number = self._numbers.pop(doc_id, None)
+        if number is None:
+            return
+        del self._ids[number]
+        self._total_len -= self._lengths.pop(number)
+        self._dead += 1
+
+    def _sweep(self) -> None:
+        if self._dead <= max(1000, len(self._ids) * self.sweep_ratio):
+            return
+        for term in list(self._postings):
+            posting = {number: tf for number, tf in self._postings[term].items() if number in self._ids}
+            if posting:
+                self._postings[term] = posting
+            else:
+                del self._postings[term]
+        self._dead = 0
+
+    def add(self, ids: List[str], texts: List[Optional[str]]) -> None:
+        """Add or replace documents."""
+        with self._lock:
+            for doc_id, text in zip(ids, texts):
+                self._remove(doc_id)
+                number = self._next
+                self._next += 1
+                counts = Counter(tokenize(text or ""))
+                self._numbers[doc_id] = number
+                self._ids[number] = doc_id
+                self._lengths[number] = length = sum(counts.values())
+                self._total_len += length
+                for term, tf in counts.items():
+                    self._postings.setdefault(term, {})[number] = tf
+            self._sweep()
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                self._remove(doc_id)
+            self._sweep()
+
+    def search(self, query: str, top_k: int = 5) -> List[dict]:
+        """Top `top_k` documents as [{"id", "bm25"}]."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._ids)
+            if not n or not terms:
+                return []
+            avg_len = self._total_len / n or 1.0
+            scores: Dict[int, float] = {}
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                # Tombstones still count towards the posting size until swept
+                df = min(len(posting), n)
+                idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+                for number, tf in posting.items():
+                    length = self._lengths.get(number)
+                    if length is None:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_len)
+                    scores[number] = scores.get(number, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+            best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return [{"id": self._ids[number], "bm25": score} for number, score in best]
+
+
+class LexicalIndexes:
+    """
+    One BM25Index per Chroma collection, built from the collection on first
+    use and kept in sync by ChromaDBService's write paths (add/upsert,
+    deletes). Writes to collections whose index hasn't
+    been built are ignored; the build reads the current state anyway.
+
+    Builds run in a background thread, and searches skip an index that is
+    not ready rather than waiting for it. Writes made by other processes
+    (e.g. scripts/ingest.py) are picked up by comparing the collection's
+    count with the index size every `sync_seconds`.
+    """
+
+    def __init__(self, sync_seconds: float = settings.LEXICAL_SYNC_SECONDS):
+        self.sync_seconds = sync_seconds
+        self._indexes: Dict[str, BM25Index] = {}
+        self._building: Dict[str, threading.Thread] = {}
+        self._dirty: set = set()  # written to while building
+        self._checked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.searches = 0
+        self.not_ready = 0
+
+    def ready(self, collection_name: str) -> bool:
+        return collection_name in self._indexes
+
+    def build(self, collection_name: str, loader: Loader) -> BM25Index:
+        """Build the index from `loader` (pages of {id, text}) and swap it in."""
+        index = BM25Index()
+        started = time.perf_counter()
+        for page in loader():
+            index.add([d["id"] for d in page], [d.get("text") for d in page])
+        with self._lock:
+            self._indexes[collection_name] = index
+            self._checked[collection_name] = time.monotonic()
+            self._building.pop(collection_name, None)
+            rebuild = collection_name in self._dirty
+            self._dirty.discard(collection_name)
+            self.builds += 1
+        elapsed = time.perf_counter() - started
+        print(f"[LEXICAL] Indexed {len(index)} documents of '{collection_name}' in {elapsed:.2f}s")
+        if rebuild:
+            # Writes landed while the snapshot was read; read it again
+            self.build_in_background(collection_name, loader)
+        return index
+
+    def build_in_background(self, collection_name: str, loader: Loader) -> None:
+        def run():
+            try:
+                self.build(collection_name, loader)
+            except Exception as e:
+                with self._lock:
+                    self._building.pop(collection_name, None)
+                print(f"[LEXICAL] Building the '{collection_name}' index failed: {e}")
+
+        with self._lock:
+            if collection_name in self._building:
+                return
+            thread = self._building[collection_name] = threading.Thread(target=run, daemon=True)
+        thread.start()
+
+    def search(self, collection_name: str, query: str, top_k: int, loader: Loader,
+               count: Optional[Callable[[], int]] = None) -> Optional[List[dict]]:
+        """BM25 results ([{"id", "bm25"}]), or None if the index is not ready yet (a build is started)."""
+        index = self._indexes.get(collection_name)
+        if index is None:
+            self.not_ready += 1
+            self.build_in_background(collection_name, loader)
+            return None
+        if count is not None and time.monotonic() - self._checked.get(collection_name, 0) > self.sync_seconds:
+            self._checked[collection_name] = time.monotonic()
+            if count() != len(index):
+                self.build_in_background(collection_name, loader)
+        self.searches += 1
+        return index.search(query, top_k)
+
+    def _index(self, collection_name: str) -> Optional[BM25Index]:
+        with self._lock:
+            if collection_name in self._building:
+                self._dirty.add(collection_name)
+            return self._indexes.get(collection_name)
+
+    def add(self, collection_name: str, ids: List[str], texts: List[Optional[str]]) -> None:
+        index = self._index(collection_name)
+        if index is not None:
+            index.add(ids, texts)
+
+    def remove(self, collection_name: str, ids: Iterable[str]) -> None:
+        index = self._index(collection_name)
+        if index is not None:
+            index.remove(ids)
+
+    def invalidate(self, collection_name: Optional[str] = None) -> None:
+        """Forget an index (or all); it is rebuilt on the next search."""
+        with self._lock:
+            names = list(self._indexes) if collection_name is None else [collection_name]
+            for name in names:
+                self._indexes.pop(name, None)
+                if name in self._building:
+                    self._dirty.add(name)
+
+    def stats(self) -> dict:
+        return {
+            "collections": {name: len(index) for name, index in self._indexes.items()},
+            "building": list(self._building),
+            "builds": self.builds,
+            "searches": self.searches,
+            "not_ready": self.not_ready,
+        }
+
+
+lexical_indexes = LexicalIndexes()
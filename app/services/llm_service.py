@@ -1,66 +1,67 @@
-from openai import OpenAI
-
 from app.core.config import settings
 from app.models.schemas import ChatData
+from app.services.context_assembler import format_report
+from app.services.openai_client import generate_reply
 from app.services.sql_service import SqlService
-from app.services.chat_manager_service import ChatManage
-from app.services.admission_service import AdmissionProcessor
+from app.services.session_memory import session_memory
+from app.services.text_screen import BLOCKED_REPLY, screen_message
 
 class LLMService:
     def __init__(self):
-        """Initialize the OpenAI client"""
-        self.client = OpenAI(base_url=settings.BASE_URL, api_key=settings.OPENROUTER_API_KEY)
-        self.model = settings.MODEL
-        self.admission_processor = AdmissionProcessor()
-        self.chat_manager = ChatManage()
+        """Calls go through the shared pooled client in openai_client"""
+        # Conversation memory is per session; never shared across users
+        self.memory_store = session_memory
         self.sql_service = SqlService()
-        self.response_data = {
+
+    async def get_response(self, chat_data: ChatData, admission_status: str, chromadb_context: str) -> dict:
+        # Built per call so concurrent requests can't overwrite each other's result
+        response_data = {
             "activate_processor": False,
             "conversational_response": ""
         }
-
-    async def get_response(self, chat_data: ChatData, admission_status: str, chromadb_context: str) -> str:
         try:
             query = chat_data.query.strip()
+            if settings.SCREEN_REJECT_BANNED and screen_message(query).blocked:
+                # No LLM call (and no memory update) for queries with banned terms
+                response_data["conversational_response"] = BLOCKED_REPLY
+                return response_data
 
-            system_prompt = self.chat_manager.get_response_prompt(query, chromadb_context, admission_status)
+            chat_manager = await self.memory_store.get(chat_data.session_id)
+
+            token_report = {}
+            system_prompt = chat_manager.get_response_prompt(query, chromadb_context, admission_status, token_report)
             print(f"[MODEL] AI Assistant")
+            print(f"[TOKENS] {format_report(token_report)}")
 
-            self.chat_manager.add_user_message(query)
+            chat_manager.add_user_message(query)
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                {
-                    "role": "system",
-                    "content": system_prompt
-                },
-                {"role": "user", "content": query}
-            ],
-                max_tokens=1000,
+            ai_response = await generate_reply(
+                query,
+                system_prompt=system_prompt,
                 temperature=0.2,
+                max_tokens=settings.LLM_MAX_OUTPUT_TOKENS,
             )
 
-            if response and response.choices and len(response.choices) > 0:
-                ai_response = response.choices[0].message.content
-
+            if ai_response:
                 if ai_response == "start_admission":
-                    self.response_data["activate_processor"] = True
-                    self.response_data["conversational_response"] = ai_response
-                    return self.response_data
+                    await self.memory_store.save(chat_data.session_id, chat_manager)
+                    response_data["activate_processor"] = True
+                    response_data["conversational_response"] = ai_response
+                    return response_data
                 
-                self.chat_manager.add_bot_message(ai_response)
+                chat_manager.add_bot_message(ai_response)
+                await self.memory_store.save(chat_data.session_id, chat_manager)
 
                 print(f"[LLM] Response received: {ai_response}")
-                self.response_data["conversational_response"] = ai_response
-                return self.response_data
+                response_data["conversational_response"] = ai_response
+                return response_data
             
             else:
-                print("[ERROR] Invalid response structure from API")
-                self.response_data["conversational_response"] = "I apologize, but I couldn't generate a response. Please try again."
-                return self.response_data
+                print("[ERROR] Empty response from API")
+                response_data["conversational_response"] = "I apologize, but I couldn't generate a response. Please try again."
+                return response_data
 
         except Exception as e:
             print(f"[ERROR] Error in get_response: {str(e)}")
-            self.response_data["conversational_response"] = "I apologize, but I encountered an error while processing your request. Please try again."
-            return self.response_data
\ No newline at end of file
+            response_data["conversational_response"] = "I apologize, but I encountered an error while processing your request. Please try again."
+            return response_data
\ No newline at end of file
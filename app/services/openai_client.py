@@ -1,26 +1,121 @@
-from openai import OpenAI
+import asyncio
+import httpx
+from openai import AsyncOpenAI
 from app.core.config import settings
+from app.services.embedding_cache import embedding_cache
 
-# Correct way with new SDK
-_client = OpenAI(api_key=settings.OPENAI_API_KEY)
+# One AsyncOpenAI client (and one pooled httpx client) per process.
+# Created lazily so it binds to the running event loop, closed from the app lifespan.
+_client: AsyncOpenAI | None = None
+_semaphore: asyncio.Semaphore | None = None
 
-async def generate_reply(message: str, system_prompt: str | None = None) -> str:
+
+def _build_client() -> AsyncOpenAI:
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.OPENAI_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE,
+        ),
+        timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OPENAI_CONNECT_TIMEOUT),
+    )
+    return AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        http_client=http_client,
+        max_retries=settings.OPENAI_MAX_RETRIES,
+    )
+
+
+def get_client() -> AsyncOpenAI:
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    # Caps in-flight upstream calls so a burst of /chat requests queues here
+    # instead of opening more sockets than the pool allows.
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(settings.OPENAI_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def close_client() -> None:
+    global _client, _semaphore
+    if _client is not None:
+        await _client.close()
+    _client = None
+    _semaphore = None
+
+
+async def generate_reply(message: str, system_prompt: str | None = None, timeout: float | None = None,
+                         temperature: float = 0.6, max_tokens: int | None = None) -> str:
     messages = []
     if system_prompt:
         messages.append({"role": "system", "content": system_prompt})
     messages.append({"role": "user", "content": message})
 
-    resp = _client.chat.completions.create(
-        model=settings.OPENAI_MODEL,
-        messages=messages,
-        temperature=0.6,
-        max_tokens=256,
-    )
+    async with _get_semaphore():
+        resp = await get_client().chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens or settings.OPENAI_MAX_OUTPUT_TOKENS,
+            timeout=timeout or settings.OPENAI_TIMEOUT,
+        )
     return resp.choices[0].message.content.strip()
 
-async def embed_text(text: str) -> list[float]:
-    emb = _client.embeddings.create(
-        model=settings.OPENAI_EMBEDDING_MODEL,
-        input=text
-    )
-    return emb.data[0].embedding
+
+async def _embed_uncached(texts: list[str], timeout: float | None = None) -> list[list[float]]:
+    async with _get_semaphore():
+        emb = await get_client().embeddings.create(
+            model=settings.OPENAI_EMBEDDING_MODEL,
+            input=texts,
+            timeout=timeout or settings.OPENAI_TIMEOUT,
+        )
+    return [item.embedding for item in sorted(emb.data, key=lambda item: item.index)]
+
+
+async def embed_texts(texts: list[str], timeout: float | None = None) -> list[list[float]]:
+    """Embed several texts in a single request; results keep the input order."""
+    if not texts:
+        return []
+    if not settings.EMBEDDING_CACHE_ENABLED:
+        return await _embed_uncached(texts, timeout)
+
+    model = settings.OPENAI_EMBEDDING_MODEL
+    vectors = await embedding_cache.aget_many(model, texts)
+    # Only send distinct texts that missed the cache upstream
+    missing = list(dict.fromkeys(text for text, vec in zip(texts, vectors) if vec is None))
+    if missing:
+        fresh = dict(zip(missing, await _embed_uncached(missing, timeout)))
+        await embedding_cache.aput_many(model, list(fresh), list(fresh.values()))
+        vectors = [vec if vec is not None else fresh[text] for text, vec in zip(texts, vectors)]
+    return vectors
+
+
+async def embed_text(text: str, timeout: float | None = None) -> list[float]:
+    return (await embed_texts([text], timeout))[0]
+
+
+async def stream_reply(message: str, system_prompt: str | None = None, timeout: float | None = None):
+    """Yield completion text deltas as they arrive from the provider."""
+    messages = []
+    if system_prompt:
+        messages.append({"role": "system", "content": system_prompt})
+    messages.append({"role": "user", "content": message})
+
+    async with _get_semaphore():
+        stream = await get_client().chat.completions.create(
+            model=settings.OPENAI_MODEL,
+            messages=messages,
+            temperature=0.6,
+            max_tokens=settings.OPENAI_MAX_OUTPUT_TOKENS,
+            timeout=timeout or settings.OPENAI_TIMEOUT,
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
@@ -0,0 +1,34 @@
+from typing import Dict, List, Optional, Sequence
+
+from app.core.config import settings
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: Sequence[List[dict]],
+    k: int = settings.SEARCH_RRF_K,
+    limit: Optional[int] = None,
+    key: str = "id",
+) -> List[dict]:
+    """
+    Merge several ranked result lists into one, deduplicated by `key`.
+
+    Each document scores sum(1 / (k + rank)) over the lists it appears in,
+    so documents retrieved by several queries rise to the top. The merged
+    entry keeps the first copy seen, the smallest distance across lists,
+    and adds `score` and `hits` (number of lists it appeared in).
+    """
+    merged: Dict[str, dict] = {}
+    for results in ranked_lists:
+        for rank, doc in enumerate(results, start=1):
+            doc_id = doc.get(key)
+            entry = merged.get(doc_id)
+            if entry is None:
+                entry = merged[doc_id] = {**doc, "score": 0.0, "hits": 0}
+            entry["score"] += 1.0 / (k + rank)
+            entry["hits"] += 1
+            distance = doc.get("distance")
+            if distance is not None and (entry.get("distance") is None or distance < entry["distance"]):
+                entry["distance"] = distance
+
+    fused = sorted(merged.values(), key=lambda d: d["score"], reverse=True)
+    return fused[:limit] if limit else fused
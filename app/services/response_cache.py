@@ -0,0 +1,137 @@
+import asyncio
+import hashlib
+import time
+from collections import defaultdict
+from typing import Optional
+
+from app.core.config import settings
+from app.services.embedding_cache import normalize_text
+from app.services.openai_client import embed_text
+from app.services.vector_store import response_collection
+
+
+def prompt_fingerprint(system_prompt: str) -> str:
+    """Replies are only reused under the exact same system prompt / injected context."""
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Semantic cache in front of generate_reply.
+    Each entry is the user query (document + embedding) with the reply, the
+    prompt fingerprint, category and creation time in its metadata. A lookup
+    returns the nearest entry's reply when its cosine similarity reaches
+    `threshold`, it shares the prompt fingerprint and is younger than `ttl`.
+    Expired entries are deleted from store(), at most once per `purge_interval`.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = settings.RESPONSE_CACHE_ENABLED,
+        threshold: float = settings.RESPONSE_CACHE_THRESHOLD,
+        ttl: int = settings.RESPONSE_CACHE_TTL,
+        categories: str = settings.RESPONSE_CACHE_CATEGORIES,
+        purge_interval: int = settings.RESPONSE_CACHE_PURGE_INTERVAL,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.ttl = ttl
+        self.categories = {c.strip().lower() for c in categories.split(",") if c.strip()}
+        self.purge_interval = purge_interval
+        self.last_purge = 0.0
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self._pending = set()
+
+    def applies_to(self, category: str) -> bool:
+        if not self.enabled:
+            return False
+        return not self.categories or (category or "").lower() in self.categories
+
+    async def lookup(self, query: str, category: str, system_prompt: str) -> Optional[str]:
+        if not self.applies_to(category):
+            return None
+        try:
+            vector = await embed_text(query)
+            out = await asyncio.to_thread(
+                response_collection.query,
+                query_embeddings=[vector],
+                n_results=1,
+                where={"$and": [
+                    {"fingerprint": prompt_fingerprint(system_prompt)},
+                    {"created_at": {"$gte": time.time() - self.ttl}},
+                ]},
+                include=["metadatas", "distances"],
+            )
+        except Exception as e:
+            print(f"[CACHE] Response cache lookup failed: {e}")
+            self.misses[category] += 1
+            return None
+
+        if out["ids"] and out["ids"][0]:
+            similarity = 1 - out["distances"][0][0]
+            if similarity >= self.threshold:
+                self.hits[category] += 1
+                return out["metadatas"][0][0]["reply"]
+        self.misses[category] += 1
+        return None
+
+    async def store(self, query: str, category: str, system_prompt: str, reply: str) -> None:
+        if not self.applies_to(category):
+            return
+        fingerprint = prompt_fingerprint(system_prompt)
+        entry_id = hashlib.sha256(f"{fingerprint}\x00{normalize_text(query)}".encode("utf-8")).hexdigest()
+        try:
+            # The query embedding is already in the embedding cache from lookup()
+            vector = await embed_text(query)
+            await asyncio.to_thread(
+                response_collection.upsert,
+                ids=[entry_id],
+                embeddings=[vector],
+                documents=[query],
+                metadatas=[{
+                    "reply": reply,
+                    "fingerprint": fingerprint,
+                    "category": category or "",
+                    "created_at": time.time(),
+                }],
+            )
+        except Exception as e:
+            print(f"[CACHE] Response cache store failed: {e}")
+            return
+        if time.time() - self.last_purge >= self.purge_interval:
+            await self.purge_expired()
+
+    async def purge_expired(self) -> None:
+        """Delete entries older than `ttl`; lookups already ignore them."""
+        self.last_purge = time.time()
+        try:
+            await asyncio.to_thread(response_collection.delete, where={"created_at": {"$lt": self.last_purge - self.ttl}})
+        except Exception as e:
+            print(f"[CACHE] Purging expired responses failed: {e}")
+
+    def store_later(self, query: str, category: str, system_prompt: str, reply: str) -> None:
+        """Schedule store() without holding up the response."""
+        if not self.applies_to(category):
+            return
+        task = asyncio.create_task(self.store(query, category, system_prompt, reply))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def stats(self) -> dict:
+        by_category = {}
+        for category in set(self.hits) | set(self.misses):
+            hits, misses = self.hits[category], self.misses[category]
+            by_category[category] = {"hits": hits, "misses": misses, "hit_rate": round(hits / (hits + misses), 4)}
+        total_hits, total_misses = sum(self.hits.values()), sum(self.misses.values())
+        lookups = total_hits + total_misses
+        return {
+            "enabled": self.enabled,
+            "hits": total_hits,
+            "misses": total_misses,
+            "hit_rate": round(total_hits / lookups, 4) if lookups else 0.0,
+            "by_category": by_category,
+        }
+
+
+response_cache = ResponseCache()
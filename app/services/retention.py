@@ -0,0 +1,176 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from app.core.config import settings
+from app.services.chroma_service import TIMESTAMP_FIELDS, ChromaDBService
+from chromadb.errors import NotFoundError
+
+
+@dataclass
+class RetentionRule:
+    source: str
+    max_age_hours: float
+
+    def __post_init__(self):
+        if self.source not in TIMESTAMP_FIELDS:
+            raise ValueError(f"No timestamp field known for source '{self.source}'")
+
+
+def parse_rules(spec: str) -> List[RetentionRule]:
+    """Parse "web:168,file:720" into rules."""
+    rules = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        source, _, hours = part.partition(":")
+        try:
+            rules.append(RetentionRule(source.strip(), float(hours)))
+        except ValueError:
+            raise ValueError(f"Invalid retention rule '{part.strip()}', expected source:max_age_hours")
+    return rules
+
+
+@dataclass
+class PurgeReport:
+    source: str
+    where: dict
+    deleted: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    @property
+    def rate(self) -> float:
+        return self.deleted / self.seconds if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {**self.__dict__, "seconds": round(self.seconds, 2), "rate": round(self.rate, 1)}
+
+
+@dataclass
+class RetentionRun:
+    purges: List[PurgeReport] = field(default_factory=list)
+    compacted_bytes: int = 0
+    seconds: float = 0.0
+
+    @property
+    def deleted(self) -> int:
+        return sum(p.deleted for p in self.purges)
+
+    def as_dict(self) -> dict:
+        return {
+            "deleted": self.deleted,
+            "compacted_bytes": self.compacted_bytes,
+            "seconds": round(self.seconds, 2),
+            "purges": [p.as_dict() for p in self.purges],
+        }
+
+
+class RetentionEngine:
+    """
+    Deletes knowledge base documents older than their source's max age.
+
+    Each rule becomes a single `where` filter (source and timestamp cutoff)
+    handed to ChromaDBService.delete_where, which deletes in batches of
+    `batch_size` rows. After a run that deleted something, the Chroma SQLite
+    file is vacuumed if at least `compact_free_ratio` of it is free pages.
+    start() runs a purge every `interval_minutes` in the background.
+    """
+
+    def __init__(
+        self,
+        service: Optional[ChromaDBService] = None,
+        rules: Optional[List[RetentionRule]] = None,
+        collection_name: str = settings.RETENTION_COLLECTION,
+        interval_minutes: float = settings.RETENTION_INTERVAL_MINUTES,
+        batch_size: int = settings.RETENTION_BATCH_SIZE,
+        compact_free_ratio: float = settings.RETENTION_COMPACT_FREE_RATIO,
+    ):
+        self.service = service or ChromaDBService()
+        self.rules = parse_rules(settings.RETENTION_RULES) if rules is None else rules
+        self.collection_name = collection_name
+        self.interval = interval_minutes * 60
+        self.batch_size = batch_size
+        self.compact_free_ratio = compact_free_ratio
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.runs = 0
+        self.last_run: Optional[RetentionRun] = None
+
+    def _purge(self, rule: RetentionRule) -> PurgeReport:
+        where = self.service.retention_filter(rule.source, rule.max_age_hours)
+        report = PurgeReport(rule.source, where)
+        started = time.perf_counter()
+
+        def progress(deleted: int):
+            elapsed = time.perf_counter() - started
+            print(f"[RETENTION] {rule.source}: {deleted} deleted ({deleted / elapsed:.0f}/s)")
+
+        try:
+            report.deleted = self.service.delete_where(where, self.collection_name, self.batch_size, progress)
+        except NotFoundError:
+            report.error = f"collection '{self.collection_name}' does not exist"
+        except Exception as e:
+            report.error = str(e)
+            print(f"[RETENTION] Purging {rule.source} failed: {e}")
+        report.seconds = time.perf_counter() - started
+        return report
+
+    async def run_once(self) -> RetentionRun:
+        """Apply every rule once, then compact if enough space was freed."""
+        async with self._lock:
+            run = RetentionRun()
+            started = time.perf_counter()
+            for rule in self.rules:
+                report = await asyncio.to_thread(self._purge, rule)
+                run.purges.append(report)
+                if report.deleted:
+                    print(f"[RETENTION] {rule.source} older than {rule.max_age_hours:g}h: "
+                          f"{report.deleted} deleted in {report.seconds:.2f}s ({report.rate:.0f}/s)")
+            if run.deleted and self.compact_free_ratio > 0:
+                try:
+                    run.compacted_bytes = await asyncio.to_thread(self.service.compact, self.compact_free_ratio)
+                except Exception as e:
+                    print(f"[RETENTION] Compaction failed: {e}")
+                if run.compacted_bytes:
+                    print(f"[RETENTION] Compacted, reclaimed {run.compacted_bytes / 2 ** 20:.1f} MB")
+            run.seconds = time.perf_counter() - started
+            self.runs += 1
+            self.last_run = run
+            return run
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                # Keep the schedule alive; the next run retries
+                print(f"[RETENTION] Run failed: {e}")
+
+    async def start(self):
+        if self._task is None and self.rules and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self._task is not None,
+            "rules": {rule.source: rule.max_age_hours for rule in self.rules},
+            "interval_minutes": self.interval / 60,
+            "runs": self.runs,
+            "last_run": self.last_run.as_dict() if self.last_run else None,
+        }
+
+
+retention_engine = RetentionEngine()
@@ -0,0 +1,138 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.core.config import settings
+from app.services.chat_manager_service import ChatManage
+
+
+class SessionMemoryStore:
+    """
+    Conversation memory keyed by session_id.
+
+    Each session gets its own ChatManage (which already bounds its window).
+    Sessions are kept in LRU order and evicted when idle for longer than
+    `idle_ttl` seconds, or when the store exceeds `max_sessions` or
+    `max_chars` in total. With `db_path` set, every update is written through
+    to SQLite, so evicted sessions come back on their next turn, memory
+    survives restarts, and uvicorn workers see each other's turns.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = settings.SESSION_MEMORY_MAX_SESSIONS,
+        idle_ttl: int = settings.SESSION_MEMORY_IDLE_TTL,
+        max_chars: int = settings.SESSION_MEMORY_MAX_CHARS,
+        db_path: str = settings.SESSION_MEMORY_DB_PATH,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_chars = max_chars
+        self.db_path = db_path or None
+        # session_id -> (manager, last_access, version, size)
+        self._sessions: "OrderedDict[str, Tuple[ChatManage, float, int, int]]" = OrderedDict()
+        self._total_chars = 0
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.evictions = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS session_memory ("
+                " session_id TEXT PRIMARY KEY,"
+                " state TEXT NOT NULL,"
+                " version INTEGER NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+        return self._conn
+
+    def _load(self, session_id: str, known_version: int) -> Optional[Tuple[ChatManage, int]]:
+        """Return the persisted session if it is newer than `known_version`."""
+        with self._db_lock:
+            row = self._db().execute(
+                "SELECT state, version FROM session_memory WHERE session_id = ? AND version > ?",
+                (session_id, known_version),
+            ).fetchone()
+        if row is None:
+            return None
+        return ChatManage.from_dict(json.loads(row[0])), row[1]
+
+    def _persist(self, session_id: str, manager: ChatManage) -> int:
+        with self._db_lock:
+            conn = self._db()
+            version = conn.execute(
+                "INSERT INTO session_memory (session_id, state, version, updated_at) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET state = excluded.state, "
+                "version = session_memory.version + 1, updated_at = excluded.updated_at "
+                "RETURNING version",
+                (session_id, json.dumps(manager.to_dict()), time.time()),
+            ).fetchone()[0]
+            conn.commit()
+        return version
+
+    def _put(self, session_id: str, manager: ChatManage, version: int) -> None:
+        previous = self._sessions.pop(session_id, None)
+        if previous is not None:
+            self._total_chars -= previous[3]
+        size = manager.size()
+        self._sessions[session_id] = (manager, time.monotonic(), version, size)
+        self._total_chars += size
+        self._evict()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._sessions:
+            session_id, (_, last_access, _, size) = next(iter(self._sessions.items()))
+            idle = now - last_access > self.idle_ttl
+            over_cap = len(self._sessions) > self.max_sessions or self._total_chars > self.max_chars
+            if not (idle or over_cap):
+                break
+            # Persisted sessions are already written through; dropping is enough
+            self._sessions.pop(session_id)
+            self._total_chars -= size
+            self.evictions += 1
+
+    async def get(self, session_id: str) -> ChatManage:
+        entry = self._sessions.get(session_id)
+        version = entry[2] if entry else 0
+
+        if self.db_path:
+            # Picks up turns written by other workers (or before a restart)
+            loaded = await asyncio.to_thread(self._load, session_id, version)
+            if loaded is not None:
+                manager, version = loaded
+                self._put(session_id, manager, version)
+                return manager
+
+        if entry is not None:
+            self._put(session_id, entry[0], version)
+            return entry[0]
+
+        manager = ChatManage()
+        self._put(session_id, manager, 0)
+        return manager
+
+    async def save(self, session_id: str, manager: ChatManage) -> None:
+        """Record that `manager` changed (new turn) and write it through if persistence is on."""
+        version = 0
+        if self.db_path:
+            version = await asyncio.to_thread(self._persist, session_id, manager)
+        self._put(session_id, manager, version)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "total_chars": self._total_chars,
+            "evictions": self.evictions,
+            "persistent": bool(self.db_path),
+        }
+
+
+session_memory = SessionMemoryStore()
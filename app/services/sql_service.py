@@ -1,99 +1,84 @@
-import asyncio
 from fastapi import HTTPException
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import AsyncSessionLocal
+from app.db.database import dialect_insert
 from app.models.db_models import ChatSession, ChatMessage
+from app.services.write_behind import write_buffer
 
 
 class SqlService:
-
-    async def check_and_add_session(self, session_id: str) -> None:
-
-        def sync_check_and_add():
-            db = AsyncSessionLocal()
-            try:
-                session_exist = db.query(ChatSession).filter(ChatSession.id == session_id).first()
-                if not session_exist:
-                    session = ChatSession(id=session_id)
-                    db.add(session)
-                    db.commit()
-                    db.refresh(session)
-                    print(f"New session created: {session_id}")
-            except Exception as e:
-                print(f"Error while creating session: {e}")
-                db.rollback()
-                raise
-            finally:
-                db.close()
-
-        await asyncio.to_thread(sync_check_and_add)
+    """
+    Persistence for chat sessions/messages on native AsyncSession.
+    Request-path methods take the request's session (from get_db) so a turn
+    uses one session; background writes go through the write-behind buffer.
+    """
+
+    async def check_and_add_session(self, db: AsyncSession, session_id: str, user_id: str | None = None) -> None:
+        # Single round-trip upsert instead of SELECT-then-INSERT
+        stmt = (
+            dialect_insert(ChatSession)
+            .values(id=session_id, user_id=user_id)
+            .on_conflict_do_nothing(index_elements=[ChatSession.id])
+        )
+        try:
+            result = await db.execute(stmt)
+            await db.commit()
+            if result.rowcount:
+                print(f"New session created: {session_id}")
+        except Exception as e:
+            print(f"Error while creating session: {e}")
+            await db.rollback()
+            raise
+
+    async def store_chat_message(self, db: AsyncSession, session_id: str, sender: str, message: str, category: str) -> None:
+        db.add(ChatMessage(
+            session_id=session_id,
+            message=message,
+            sender=sender,
+            category=category
+        ))
+        await db.commit()
 
     async def store_chat_message_background(self, session_id: str, sender: str, message: str, category: str):
-
-        def sync_store_message():
-            db = AsyncSessionLocal()
-            try:
-                chat_message = ChatMessage(
-                    session_id=session_id,
-                    message=message,
-                    sender=sender,
-                    category=category
-                )
-                db.add(chat_message)
-                db.commit()
-
-            except Exception as e:
-                print(f"Error storing chat: {e}")
-                db.rollback()
-                raise
-            finally:
-                db.close()
-
+        # Grouped with other pending inserts into one transaction by the write-behind buffer
         try:
-            await asyncio.to_thread(sync_store_message)
+            await write_buffer.write(ChatMessage(
+                session_id=session_id,
+                message=message,
+                sender=sender,
+                category=category
+            ))
         except Exception as e:
             print(f"Background task error storing chat: {e}")
 
-
-    async def fetch_recent_context(self, db: AsyncSession, session_id: str):
-
-        def sync_fetch_context():
-            last_recent_context = (
-                db.query(ChatMessage)
-                .filter(ChatMessage.session_id == session_id, ChatMessage.sender == "assistant")
-                .order_by(ChatMessage.timestamp.desc())
-                .first()
-            )
-            return last_recent_context.message if last_recent_context else ""
-
-        return await asyncio.to_thread(sync_fetch_context)
-
-    async def get_session_conversation(self, session_id: str):
-
-        def sync_get_conversation():
-            db = AsyncSessionLocal()
-            try:
-                messages = (
-                    db.query(ChatMessage)
-                    .filter(ChatMessage.session_id == session_id)
-                    .order_by(ChatMessage.timestamp.asc())
-                    .all()
-                )
-
-                result = []
-                for msg in messages:
-                    result.append({
-                        "id": msg.id,
-                        "message": msg.message,
-                        "sender": msg.sender,
-                        "timestamp": msg.timestamp.isoformat()
-                    })
-
-                return result
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=f"Error fetching conversation: {str(e)}")
-            finally:
-                db.close()
-
-        return await asyncio.to_thread(sync_get_conversation)
+    async def fetch_recent_context(self, db: AsyncSession, session_id: str) -> str:
+        stmt = (
+            select(ChatMessage.message)
+            .where(ChatMessage.session_id == session_id, ChatMessage.sender == "assistant")
+            .order_by(ChatMessage.timestamp.desc())
+            .limit(1)
+        )
+        last_recent_context = (await db.execute(stmt)).scalar_one_or_none()
+        return last_recent_context or ""
+
+    async def get_session_conversation(self, db: AsyncSession, session_id: str):
+        stmt = (
+            select(ChatMessage.id, ChatMessage.message, ChatMessage.sender, ChatMessage.timestamp)
+            .where(ChatMessage.session_id == session_id)
+            .order_by(ChatMessage.timestamp.asc())
+        )
+        try:
+            rows = (await db.execute(stmt)).all()
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error fetching conversation: {str(e)}")
+
+        return [
+            {
+                "id": row.id,
+                "message": row.message,
+                "sender": row.sender,
+                "timestamp": row.timestamp.isoformat()
+            }
+            for row in rows
+        ]
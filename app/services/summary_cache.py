@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+from app.models.db_models import ConversationSummary
+
+
+class SummaryCache:
+    """
+    Two-level cache for conversation summaries: an in-process LRU in front of
+    the conversation_summaries table. An entry is valid only while its
+    last_message_at matches the newest log of the conversation.
+    """
+
+    def __init__(self, max_entries: int = settings.SUMMARY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, Tuple[datetime, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, conversation_id: str, last_message_at: datetime, summary: str) -> None:
+        self._memory[conversation_id] = (last_message_at, summary)
+        self._memory.move_to_end(conversation_id)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, db: Optional[AsyncSession], conversation_id: str, last_message_at: datetime) -> Optional[str]:
+        cached = self._memory.get(conversation_id)
+        if cached and cached[0] == last_message_at:
+            self._memory.move_to_end(conversation_id)
+            self.hits += 1
+            return cached[1]
+
+        if db is not None:
+            row = await db.get(ConversationSummary, conversation_id)
+            if row and row.last_message_at == last_message_at:
+                self._remember(conversation_id, row.last_message_at, row.summary)
+                self.hits += 1
+                return row.summary
+
+        self.misses += 1
+        return None
+
+    async def set(self, conversation_id: str, last_message_at: datetime, summary: str, persist: bool = True) -> None:
+        """
+        Remember the summary and, with `persist`, write it to the table. The
+        write uses its own session: committing or rolling back the caller's
+        request session would expire the ChatLog objects it still holds.
+        """
+        self._remember(conversation_id, last_message_at, summary)
+
+        if not persist:
+            return
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.merge(ConversationSummary(
+                    conversation_id=conversation_id,
+                    summary=summary,
+                    last_message_at=last_message_at,
+                    updated_at=datetime.now(timezone.utc),
+                ))
+                await session.commit()
+        except Exception as e:
+            # The memory entry is still usable; the table is only a second tier.
+            print(f"Error persisting conversation summary: {e}")
+
+    def invalidate(self, conversation_id: str) -> None:
+        """Drop the in-memory entry; the DB row is superseded on the next summary."""
+        self._memory.pop(conversation_id, None)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._memory), "hits": self.hits, "misses": self.misses}
+
+
+summary_cache = SummaryCache()
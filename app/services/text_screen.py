@@ -0,0 +1,79 @@
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from app.core.config import settings
+from app.templates.prompt import BANNED_CONTEXT
+
+CONTINUATION_KEYWORDS = ["continue", "previous", "yes", "first", "keep going", "where we left", "last time"]
+FRESH_START_KEYWORDS = ["fresh", "new", "current", "second", "start over"]
+# Replies to a continuation offer are short; longer messages are treated as new questions
+MAX_CONTINUATION_WORDS = 10
+
+BLOCKED_REPLY = "Sorry, I can't help with that topic. Is there anything else I can help you with?"
+
+
+def _alternation(keywords: List[str], suffix: str = "") -> str:
+    # Longest first so "start over" wins over shorter overlapping keywords
+    phrases = sorted(keywords, key=len, reverse=True)
+    body = "|".join(r"\s+".join(map(re.escape, phrase.split())) for phrase in phrases)
+    return rf"\b(?:{body}){suffix}\b"
+
+
+# Opt-in: banned terms also match common inflections ("hacking", "bombs")
+_BANNED_SUFFIX = "(?:s|es|ed|ing|er|ers)?" if settings.SCREEN_BANNED_INFLECTIONS else ""
+
+# One pattern, one pass: the named group that matched tells what was found
+_SCREEN = re.compile(
+    "|".join([
+        rf"(?P<banned>{_alternation(BANNED_CONTEXT, _BANNED_SUFFIX)})",
+        rf"(?P<continuation>{_alternation(CONTINUATION_KEYWORDS)})",
+        rf"(?P<fresh>{_alternation(FRESH_START_KEYWORDS)})",
+        # A bare option number, e.g. "1", "2.", "option 1" (not any digit in the text)
+        r"(?P<choice>^\s*(?:option\s*)?[12]\s*[.)!]?\s*$)",
+    ]),
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class ScreenResult:
+    continuation: bool = False
+    fresh_start: bool = False
+    choice: Optional[int] = None
+    banned: List[str] = field(default_factory=list)
+    short: bool = True
+
+    @property
+    def blocked(self) -> bool:
+        return bool(self.banned)
+
+    @property
+    def is_continuation_response(self) -> bool:
+        """Looks like an answer to the "continue previous conversation?" offer."""
+        return self.short and (self.continuation or self.fresh_start or self.choice is not None)
+
+    @property
+    def wants_continuation(self) -> bool:
+        if self.choice is not None:
+            return self.choice == 1
+        return self.continuation and not self.fresh_start
+
+
+def screen_message(message: str) -> ScreenResult:
+    result = ScreenResult(short=len(message.split()) <= MAX_CONTINUATION_WORDS)
+    for match in _SCREEN.finditer(message):
+        kind = match.lastgroup
+        if kind == "banned":
+            result.banned.append(match.group().lower())
+        elif kind == "continuation":
+            result.continuation = True
+        elif kind == "fresh":
+            result.fresh_start = True
+        else:
+            result.choice = int(re.search(r"[12]", match.group()).group())
+    return result
+
+
+def is_likely_continuation_response(message: str) -> bool:
+    return screen_message(message).is_continuation_response
@@ -1,13 +1,18 @@
 import chromadb
 from chromadb.config import Settings as ChromaSettings
 from app.core.config import settings
-from app.services.openai_client import embed_text
+from app.services.openai_client import embed_text, embed_texts
+from app.services.rank_fusion import reciprocal_rank_fusion
 from typing import Optional
+import asyncio
+import time
 
 
 # Persistent Chroma backed by SQLite in CHROMA_DIR
 _client = chromadb.PersistentClient(path=settings.CHROMA_DIR, settings=ChromaSettings(anonymized_telemetry=False))
 _collection = _client.get_or_create_collection(name="chat_logs", metadata={"hnsw:space": "cosine"})
+# (query -> reply) pairs for the semantic response cache
+response_collection = _client.get_or_create_collection(name="response_cache", metadata={"hnsw:space": "cosine"})
 
 
 ASYNC_BATCH = 32
@@ -18,16 +23,143 @@ async def add_to_index(doc_id: str, text: str, metadata: dict):
     _collection.add(ids=[doc_id], embeddings=[vec], documents=[text], metadatas=[metadata])
 
 
-def query_similar(text: str, n_results: int = 5):
-    # NOTE: This uses server-side embedding if provided, here we embed client-side first for better control.
-    # For quickness we accept raw text and do a naive query by document (not embedding), which is OK for demo
-    out = _collection.query(query_texts=[text], n_results=n_results)
-    results = []
-    for i in range(len(out.get("ids", [[]])[0])):
-        results.append({
-        "id": out["ids"][0][i],
-        "document": out["documents"][0][i],
-        "metadata": out["metadatas"][0][i],
-        "distance": out["distances"][0][i] if "distances" in out else None,
-        })
-    return results
\ No newline at end of file
+class IndexQueue:
+    """
+    Background indexer for chat messages.
+    Requests enqueue (doc_id, text, metadata) and return immediately; a single
+    worker groups up to ASYNC_BATCH items (or whatever arrived within
+    INDEX_FLUSH_INTERVAL), embeds them in one call and does one bulk add.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = ASYNC_BATCH,
+        max_size: int = settings.INDEX_QUEUE_SIZE,
+        flush_interval: float = settings.INDEX_FLUSH_INTERVAL,
+        enqueue_timeout: float = settings.INDEX_ENQUEUE_TIMEOUT,
+    ):
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.indexed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._worker = asyncio.create_task(self._run())
+
+    async def enqueue(self, doc_id: str, text: str, metadata: dict) -> bool:
+        """
+        Queue a document for indexing. When the queue is full the caller waits
+        up to enqueue_timeout (backpressure) before the item is dropped.
+        """
+        if self._worker is None:
+            # Not running inside the app lifespan (scripts, shell): index inline
+            await add_to_index(doc_id, text, metadata)
+            return True
+        try:
+            await asyncio.wait_for(self._queue.put((doc_id, text, metadata)), timeout=self.enqueue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            print(f"[INDEX] Queue full, dropped document {doc_id}")
+            return False
+
+    async def _next_batch(self) -> Optional[list]:
+        item = await self._queue.get()
+        if item is None:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                # Shutdown requested: flush what we have, then stop
+                self._queue.put_nowait(None)
+                break
+            batch.append(item)
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            if batch is None:
+                return
+            await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        ids = [doc_id for doc_id, _, _ in batch]
+        texts = [text for _, text, _ in batch]
+        metadatas = [metadata for _, _, metadata in batch]
+        try:
+            vectors = await embed_texts(texts)
+            await asyncio.to_thread(
+                _collection.add, ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas
+            )
+            self.indexed += len(batch)
+        except Exception as e:
+            # Same contract as the inline path: indexing failures never reach the user
+            self.failed += len(batch)
+            print(f"[INDEX] Failed to index batch of {len(batch)}: {e}")
+
+    async def stop(self):
+        """Flush everything still queued, then stop the worker."""
+        if self._worker is None:
+            return
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None
+        self._queue = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "indexed": self.indexed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+index_queue = IndexQueue()
+
+
+def _query_many(embeddings: list, n_results: int) -> list:
+    out = _collection.query(query_embeddings=embeddings, n_results=n_results)
+    per_query = []
+    for q, ids in enumerate(out.get("ids") or []):
+        per_query.append([{
+            "id": doc_id,
+            "document": out["documents"][q][i],
+            "metadata": out["metadatas"][q][i],
+            "distance": out["distances"][q][i] if out.get("distances") else None,
+        } for i, doc_id in enumerate(ids)])
+    return per_query
+
+
+async def query_similar_many(texts: list[str], n_results: int = 5) -> list:
+    """
+    Search the chat log index for several texts with one embedding call and
+    one Chroma query; results are deduplicated and merged by rank fusion.
+    """
+    unique = list(dict.fromkeys(t.strip() for t in texts if t and t.strip()))
+    if not unique:
+        return []
+    # Embedded client-side with the same model the IndexQueue indexes with
+    embeddings = await embed_texts(unique)
+    per_query = await asyncio.to_thread(_query_many, embeddings, n_results)
+    return reciprocal_rank_fusion(per_query, limit=n_results)
+
+
+async def query_similar(text: str, n_results: int = 5):
+    return await query_similar_many([text], n_results)
@@ -0,0 +1,186 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from app.core.config import settings
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import AsyncSessionLocal
+from app.services.category_counter import increment_category_counts
+
+AfterCommit = Optional[Callable[[], Awaitable[None]]]
+BeforeCommit = Callable[[AsyncSession, List], Awaitable[None]]
+
+
+class WriteBehindBuffer:
+    """
+    Groups ORM inserts from concurrent requests into one transaction.
+
+    A single worker takes everything already queued (up to `max_batch` rows)
+    and commits it at once, so an idle buffer adds no wait and rows queued
+    during a commit go out together in the next one. With
+    `flush_interval_ms` > 0 the worker also lingers that long for more rows
+    before committing, trading latency for fewer transactions.
+    `durability` controls when a caller is acknowledged:
+      - "commit":   write() returns once the row is committed (ids are set)
+      - "buffered": write() returns once the row is queued; rows not yet
+                    committed are lost if the process dies
+    """
+
+    def __init__(
+        self,
+        flush_interval_ms: int = settings.WRITE_BEHIND_FLUSH_MS,
+        max_batch: int = settings.WRITE_BEHIND_MAX_BATCH,
+        max_queue: int = settings.WRITE_BEHIND_QUEUE_SIZE,
+        durability: str = settings.WRITE_BEHIND_DURABILITY,
+    ):
+        if durability not in ("commit", "buffered"):
+            raise ValueError(f"Unknown write-behind durability '{durability}'")
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.durability = durability
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._callbacks = set()
+        self._before_commit: List[BeforeCommit] = []
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+
+    def add_before_commit(self, hook: BeforeCommit) -> None:
+        """Register `hook(session, objects)` to run inside every flush transaction."""
+        self._before_commit.append(hook)
+
+    async def _run_before_commit(self, session: AsyncSession, objects: List) -> None:
+        for hook in self._before_commit:
+            await hook(session, objects)
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._worker = asyncio.create_task(self._run())
+
+    async def write(self, obj, after_commit: AfterCommit = None):
+        """
+        Queue `obj` for insertion and honour the configured durability.
+        `after_commit` runs as a task once the row is committed (e.g. indexing
+        that needs the generated id).
+        """
+        committed = await self.submit(obj, after_commit)
+        if self.durability == "commit":
+            await committed
+        else:
+            # Failures are already logged by the worker; mark them as retrieved
+            committed.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return obj
+
+    async def submit(self, obj, after_commit: AfterCommit = None) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        if self._worker is None:
+            # Outside the app lifespan: write through
+            await self._commit([(obj, future, after_commit)])
+            return future
+        # Blocks when the queue is full, pushing back on producers
+        await self._queue.put((obj, future, after_commit))
+        return future
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            while len(batch) < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            deadline = time.monotonic() + self.flush_interval
+            while not stopping and len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._commit(batch)
+            if stopping:
+                return
+
+    async def _commit(self, batch: List[Tuple]):
+        started = time.perf_counter()
+        try:
+            async with AsyncSessionLocal() as session:
+                objects = [obj for obj, _, _ in batch]
+                session.add_all(objects)
+                await self._run_before_commit(session, objects)
+                await session.commit()
+        except Exception as e:
+            print(f"[WRITE-BEHIND] Batch of {len(batch)} failed, retrying rows individually: {e}")
+            await self._commit_individually(batch)
+        else:
+            self._settle(batch)
+        self.batches += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+
+    async def _commit_individually(self, batch: List[Tuple]):
+        # One bad row must not take the rest of the batch down with it
+        for entry in batch:
+            obj, future, _ = entry
+            try:
+                async with AsyncSessionLocal() as session:
+                    session.add(obj)
+                    await self._run_before_commit(session, [obj])
+                    await session.commit()
+            except Exception as e:
+                self.failed_rows += 1
+                print(f"[WRITE-BEHIND] Dropping row {obj!r}: {e}")
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            self._settle([entry])
+
+    def _settle(self, batch: List[Tuple]):
+        self.flushed_rows += len(batch)
+        for obj, future, after_commit in batch:
+            if not future.done():
+                future.set_result(obj)
+            if after_commit is not None:
+                task = asyncio.create_task(after_commit())
+                self._callbacks.add(task)
+                task.add_done_callback(self._callbacks.discard)
+
+    async def stop(self):
+        """Commit everything still queued, then stop the worker."""
+        if self._worker is None:
+            return
+        await self._queue.put(None)
+        await self._worker
+        if self._callbacks:
+            await asyncio.gather(*self._callbacks, return_exceptions=True)
+        self._worker = None
+        self._queue = None
+
+    def stats(self) -> dict:
+        return {
+            "durability": self.durability,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+        }
+
+
+write_buffer = WriteBehindBuffer()
+# Category counters are updated in the same transaction as the chat_logs rows
+write_buffer.add_before_commit(increment_category_counts)
@@ -1,3 +1,5 @@
+from app.templates.registry import register_template
+
 BANNED_CONTEXT = ["sex", "nude", "violence", "hack", "porn", "bomb", "drugs"]
 
 MESSAGE_CATEGORY = """
@@ -23,20 +25,17 @@ Your task is to read the user's message and assign it to one of the following ca
 Now classify the following user message into one of the categories.
 """
 
-def _get_tuned_prompt(query, history, context, query_count: int):
-    print(f"Query count -->  {query_count}")
-
-    GENERAL_PROMPT = f"""
+GENERAL_PROMPT = """
     Critical note: You're a AI assistant, generate response conversationally by Checking the 'Conversation History' and context given below.
                    Follow the rule and the prompt.
                    
     """
 
-    HISTORY = f"""
+HISTORY_SECTION = """
     ### Conversation History (**Carefully review and answer appropriately):
          └──  {history}
 
-    ### Current Query (query_num - {query_count + 1}):
+    ### Current Query (query_num - {query_num}):
          └──  {query}
          (NOTE: User may ask this query, in related to your previous response, so answer accordingly)
 
@@ -50,8 +49,7 @@ def _get_tuned_prompt(query, history, context, query_count: int):
         7. **Avoid generating own content:** Avoid generating your own content or opinions.
     """
 
-    if context:
-        CONTEXT =f"""
+CONTEXT_SECTION = """
         ### Previous Conversation Context:
              └──  {context}
 
@@ -64,14 +62,11 @@ def _get_tuned_prompt(query, history, context, query_count: int):
                 3. Ask whether they would like to continue that discussion.  
 
         """
-        return GENERAL_PROMPT + CONTEXT
-    
-    return GENERAL_PROMPT + HISTORY
 
-def get_prompt(query, history, context, query_count: int) -> str:
-    prompt = _get_tuned_prompt(query, history, context, query_count)
 
-    dynamic_prompt = f"""
+def _build_prefix() -> str:
+    # Everything up to the per-request sections is static
+    return f"""
     Consider yourself as an AI Assistant.
 
     ### Role and Responsibilities:
@@ -85,9 +80,18 @@ def get_prompt(query, history, context, query_count: int) -> str:
         (Adhering to these guidelines will prevent unnecessary consumption of our paid API resources.)
 
     ### Prompt:
-        {prompt}
+        """ + GENERAL_PROMPT
 
-    """
 
-    print(f"dynamic_prompt ---> {dynamic_prompt}")
-    return dynamic_prompt
\ No newline at end of file
+# Closes the "### Prompt:" block of the prefix
+PROMPT_TAIL = "\n\n    "
+
+chat_template = register_template("chat", _build_prefix, HISTORY_SECTION + PROMPT_TAIL)
+returning_template = register_template("chat_returning", _build_prefix, CONTEXT_SECTION + PROMPT_TAIL)
+
+
+def get_prompt(query, history, context, query_count: int, admission_status: str = None) -> str:
+    # admission_status is accepted for ChatManage's call signature; these templates don't use it
+    if context:
+        return returning_template.render(context=context)
+    return chat_template.render(history=history, query=query, query_num=query_count + 1)
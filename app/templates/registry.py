@@ -0,0 +1,65 @@
+from string import Formatter
+from typing import Callable, Dict, List, Tuple
+
+
+class PromptTemplate:
+    """
+    A prompt split into a static prefix and a dynamic suffix.
+
+    The prefix is built once (by `build_prefix`) and reused as the exact same
+    string on every call, so providers that cache prompt prefixes can hit it.
+    The suffix is a str.format-style template parsed once into literal/field
+    parts; rendering only joins those parts with the call's values.
+    """
+
+    def __init__(self, name: str, build_prefix: Callable[[], str], suffix: str):
+        self.name = name
+        self._build_prefix = build_prefix
+        self._prefix = None
+        self._parts: List[Tuple[str, str]] = [
+            (literal, field) for literal, field, _, _ in Formatter().parse(suffix)
+        ]
+        self.fields = {field for _, field in self._parts if field}
+
+    @property
+    def prefix(self) -> str:
+        if self._prefix is None:
+            self._prefix = self._build_prefix()
+        return self._prefix
+
+    def _fill(self, values: Dict) -> str:
+        out = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field:
+                out.append(str(values[field]))
+        return "".join(out)
+
+    def render(self, **values) -> str:
+        return self.prefix + self._fill(values)
+
+    def render_uncached(self, **values) -> str:
+        """Rebuild the prefix on every call (the pre-registry behaviour); for benchmarks."""
+        return self._build_prefix() + self._fill(values)
+
+
+_templates: Dict[str, PromptTemplate] = {}
+
+
+def register_template(name: str, build_prefix: Callable[[], str], suffix: str) -> PromptTemplate:
+    template = PromptTemplate(name, build_prefix, suffix)
+    _templates[name] = template
+    return template
+
+
+def get_template(name: str) -> PromptTemplate:
+    return _templates[name]
+
+
+def warm_templates() -> Dict[str, int]:
+    """Build every registered prefix up front (app startup); returns prefix sizes in chars."""
+    # Importing the template modules registers their templates
+    import app.prompt_template  # noqa: F401
+    import app.templates.prompt  # noqa: F401
+
+    return {name: len(template.prefix) for name, template in _templates.items()}
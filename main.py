@@ -2,21 +2,38 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings, validate_settings
 from contextlib import asynccontextmanager
-from app.db.database import engine, Base
+from app.db.database import engine
+from app.db.migrations import run_migrations
+from app.services.openai_client import close_client
+from app.services.retention import retention_engine
+from app.services.vector_store import index_queue
+from app.services.write_behind import write_buffer
+from app.templates.registry import warm_templates
 
 from app.api.chat import router as chat_router
 from app.api.analysis import router as analysis_router
 from app.api.logs import router as logs_router
+from app.api.documents import router as documents_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
 
     validate_settings()
+    warm_templates()
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
+    await index_queue.start()
+    await write_buffer.start()
+    await retention_engine.start()
 
     yield  
 
+    await retention_engine.stop()
+
+    # Drain writes first: their after-commit hooks feed the index queue
+    await write_buffer.stop()
+    await index_queue.stop()
+    await close_client()
     await engine.dispose()
 
 app = FastAPI(
@@ -36,6 +53,7 @@ app.add_middleware(
 app.include_router(chat_router)
 app.include_router(analysis_router)
 app.include_router(logs_router)
+app.include_router(documents_router)
 
 
 @app.get("/")
@@ -0,0 +1,99 @@
+"""
+Per-query overhead of ChromaDBService collection lookups, before and after
+caching handles and remembering which collections hold documents.
+
+    CHROMA_DB_PATH=/tmp/chroma_bench python -m scripts.bench_chroma_collection_cache --docs 100000
+
+"before" repeats what every search/store used to do: list_collections (store),
+get_collection and count() (search). "after" uses the cached handle and the
+non-empty flag. Both then run the same query, so the difference is the
+lookup overhead. The collection is filled once and reused on later runs.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.services.chroma_service import ChromaDBService
+
+COLLECTION = "bench_collection_cache"
+
+
+def _fill(client, docs: int, dim: int, batch: int = 5000):
+    collection = client.get_or_create_collection(COLLECTION)
+    existing = collection.count()
+    rng = random.Random(0)
+    for start in range(existing, docs, batch):
+        n = min(batch, docs - start)
+        collection.add(
+            ids=[f"doc-{start + i}" for i in range(n)],
+            embeddings=[[rng.random() for _ in range(dim)] for _ in range(n)],
+            documents=[f"document {start + i}" for i in range(n)],
+            metadatas=[{"source": "file"} for _ in range(n)],
+        )
+        print(f"   filled {start + n}/{docs}", end="\r")
+    if existing < docs:
+        print()
+    return collection
+
+
+def _time(fn, queries) -> list:
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def _report(label: str, timings: list) -> None:
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{label:<24} p50 {statistics.median(timings) * 1e3:8.3f}ms  p99 {p99 * 1e3:8.3f}ms")
+
+
+def main(docs: int, dim: int, n_queries: int) -> None:
+    service = ChromaDBService()
+    with service.get_client() as client:
+        print(f"Collection '{COLLECTION}' with {_fill(client, docs, dim).count()} documents")
+
+        rng = random.Random(1)
+        queries = [[rng.random() for _ in range(dim)] for _ in range(n_queries)]
+
+        def lookup_before(_):
+            names = [c.name for c in client.list_collections()]
+            assert COLLECTION in names
+            collection = client.get_collection(COLLECTION)
+            return collection, collection.count() == 0
+
+        def lookup_after(_):
+            collection = service._collection(client, COLLECTION)
+            return collection, service._is_empty(COLLECTION, collection)
+
+        def query_before(embedding):
+            collection, empty = lookup_before(embedding)
+            if not empty:
+                collection.query(query_embeddings=[embedding], n_results=5)
+
+        def query_after(embedding):
+            collection, empty = lookup_after(embedding)
+            if not empty:
+                collection.query(query_embeddings=[embedding], n_results=5)
+
+        # Warm both paths (HNSW index load, handle cache)
+        query_before(queries[0])
+        query_after(queries[0])
+
+        _report("lookup before", _time(lookup_before, queries))
+        _report("lookup after", _time(lookup_after, queries))
+        _report("lookup + query before", _time(query_before, queries))
+        _report("lookup + query after", _time(query_after, queries))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    main(args.docs, args.dim, args.queries)
@@ -0,0 +1,230 @@
+"""
+Offline recall / latency benchmark for hybrid (BM25 + vector) retrieval.
+
+    CHROMA_DB_PATH=/tmp/chroma_bench python -m scripts.bench_hybrid_search [--docs 20000] [--queries 500]
+
+A synthetic developer corpus is generated: every document mixes words from
+a few topics with one identifier (error code, function or package name).
+Two query sets are asked, each with exactly one relevant document:
+
+  identifier  the document's identifier plus two topic words
+  paraphrase  topic words of the document with synonyms swapped in
+
+Offline, dense vectors come from a stand-in embedder: synonyms share a
+direction (so paraphrases match) and identifiers only contribute a weak
+character-trigram component, which is roughly how real embeddings blur
+"E4821" vs "E4812". Its absolute recall says nothing about the production
+model; the comparison between retrievers is the point. With --openai the
+corpus and queries are embedded with OPENAI_EMBEDDING_MODEL instead and
+ChromaDBService.hybrid_search is also timed end to end.
+
+Reported per retriever: recall@k for each query set and p50/p95 latency
+(vector excludes embedding the query; hybrid runs both concurrently in
+worker threads and fuses with reciprocal rank fusion).
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+import zlib
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.chroma_service import ChromaDBService
+from app.services.lexical_index import lexical_indexes
+from app.services.openai_client import close_client, embed_texts
+from app.services.rank_fusion import reciprocal_rank_fusion
+
+COLLECTION = "bench_hybrid"
+STEMS = [
+    "connect", "timeout", "cache", "deploy", "token", "schema", "queue", "render", "upload", "backup",
+    "index", "socket", "cluster", "billing", "session", "migrate", "payload", "proxy", "thread", "config",
+    "router", "logging", "metric", "invoice", "webhook", "batch", "mirror", "shard", "quota", "retry",
+]
+SUFFIXES = ["", "ing", "er", "ion"]
+DIM = 96
+
+
+def _vocabulary(groups: int):
+    """`groups` synonym groups of readable pseudo-words, e.g. ["cacheing", "cache", "cacheer"]."""
+    rng = random.Random(7)
+    vocab = []
+    for g in range(groups):
+        stem = STEMS[g % len(STEMS)] + ("" if g < len(STEMS) else chr(ord("a") + g // len(STEMS)))
+        vocab.append([stem + s for s in rng.sample(SUFFIXES, 3)])
+    return vocab
+
+
+def _identifier(rng: random.Random, i: int) -> str:
+    kind = i % 3
+    if kind == 0:
+        return f"E{rng.randrange(1000, 9999)}{i}"
+    if kind == 1:
+        return f"{rng.choice(STEMS)}_{rng.choice(STEMS)}_v{i}"
+    return f"{rng.choice(STEMS)}-{rng.choice(STEMS)}{i}"
+
+
+def make_corpus(docs: int, n_queries: int, groups: int = 120):
+    rng = random.Random(0)
+    vocab = _vocabulary(groups)
+    corpus, topics = [], []
+    for i in range(docs):
+        doc_groups = rng.sample(range(groups), 3)
+        words = [rng.choice(vocab[g]) for g in doc_groups for _ in range(4)]
+        rng.shuffle(words)
+        ident = _identifier(rng, i)
+        words.insert(rng.randrange(len(words)), ident)
+        corpus.append((f"doc-{i}", " ".join(words), ident))
+        topics.append(doc_groups)
+
+    identifier_queries, paraphrase_queries = [], []
+    for target in rng.sample(range(docs), min(n_queries, docs)):
+        doc_id, _, ident = corpus[target]
+        g = topics[target]
+        identifier_queries.append((f"{ident} {rng.choice(vocab[g[0]])} {rng.choice(vocab[g[1]])}", doc_id))
+        # Synonyms the document may not use; BM25 only matches when they coincide
+        paraphrase_queries.append((" ".join(rng.choice(vocab[x]) for x in g for _ in range(2)), doc_id))
+    return corpus, vocab, {"identifier": identifier_queries, "paraphrase": paraphrase_queries}
+
+
+class StandInEmbedder:
+    """Synonyms share a random direction; other tokens get a weak char-trigram vector."""
+
+    def __init__(self, vocab, dim: int = DIM, identifier_weight: float = 0.15):
+        rng = np.random.default_rng(0)
+        self.dim = dim
+        self.identifier_weight = identifier_weight
+        self.word_vectors = {}
+        for group in vocab:
+            direction = rng.standard_normal(dim)
+            for word in group:
+                self.word_vectors[word] = direction + 0.1 * rng.standard_normal(dim)
+
+    def _trigrams(self, token: str) -> np.ndarray:
+        vector = np.zeros(self.dim)
+        padded = f"#{token}#"
+        for i in range(len(padded) - 2):
+            vector[zlib.crc32(padded[i:i + 3].encode()) % self.dim] += 1.0
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def __call__(self, texts):
+        out = []
+        for text in texts:
+            vector = np.zeros(self.dim)
+            for token in text.lower().split():
+                known = self.word_vectors.get(token)
+                vector += known if known is not None else self.identifier_weight * self._trigrams(token)
+            out.append((vector / (np.linalg.norm(vector) or 1.0)).tolist())
+        return out
+
+
+def _percentile(values, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def _latency(label: str, timings) -> str:
+    return f"{label:<8} p50 {statistics.median(timings) * 1e3:7.2f}ms  p95 {_percentile(timings, 0.95) * 1e3:7.2f}ms"
+
+
+async def _embed(texts, embedder, batch: int = 256):
+    if embedder is not None:
+        return embedder(texts)
+    vectors = []
+    for start in range(0, len(texts), batch):
+        vectors.extend(await embed_texts(texts[start:start + batch]))
+    return vectors
+
+
+async def main(docs: int, n_queries: int, top_k: int, use_openai: bool) -> None:
+    corpus, vocab, query_sets = make_corpus(docs, n_queries)
+    embedder = None if use_openai else StandInEmbedder(vocab)
+
+    service = ChromaDBService()
+    started = time.perf_counter()
+    with service.get_client() as client:
+        try:
+            client.delete_collection(COLLECTION)
+        except Exception:
+            pass
+        service.invalidate_collection(COLLECTION)
+        collection = client.create_collection(COLLECTION, metadata={"hnsw:space": "cosine"})
+    for start in range(0, len(corpus), 5000):
+        part = corpus[start:start + 5000]
+        collection.add(
+            ids=[doc_id for doc_id, _, _ in part],
+            embeddings=await _embed([text for _, text, _ in part], embedder),
+            documents=[text for _, text, _ in part],
+            metadatas=[{"source": "file"} for _ in part],
+        )
+    print(f"{len(corpus)} documents embedded and stored in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    bm25 = lexical_indexes.build(COLLECTION, lambda: service.iter_document_pages(COLLECTION, include=["documents"]))
+    print(f"BM25 index built in {time.perf_counter() - started:.2f}s "
+          f"({len(bm25._postings)} terms)")
+
+    def vector_search(embedding):
+        response = collection.query(query_embeddings=[embedding], n_results=settings.HYBRID_CANDIDATES,
+                                    include=["distances"])
+        return [{"id": doc_id} for doc_id in response["ids"][0]]
+
+    def lexical_search(query):
+        return bm25.search(query, settings.HYBRID_CANDIDATES)
+
+    async def hybrid(query, embedding):
+        ranked = await asyncio.gather(
+            asyncio.to_thread(vector_search, embedding), asyncio.to_thread(lexical_search, query)
+        )
+        return reciprocal_rank_fusion(ranked, limit=top_k)
+
+    timings = {"bm25": [], "vector": [], "hybrid": []}
+    print(f"\nrecall@{top_k}        bm25   vector   hybrid")
+    for name, queries in query_sets.items():
+        embeddings = await _embed([q for q, _ in queries], embedder)
+        hits = {"bm25": 0, "vector": 0, "hybrid": 0}
+        for (query, relevant), embedding in zip(queries, embeddings):
+            t0 = time.perf_counter()
+            lexical = lexical_search(query)[:top_k]
+            t1 = time.perf_counter()
+            vector = vector_search(embedding)[:top_k]
+            t2 = time.perf_counter()
+            fused = await hybrid(query, embedding)
+            t3 = time.perf_counter()
+            timings["bm25"].append(t1 - t0)
+            timings["vector"].append(t2 - t1)
+            timings["hybrid"].append(t3 - t2)
+            hits["bm25"] += any(d["id"] == relevant for d in lexical)
+            hits["vector"] += any(d["id"] == relevant for d in vector)
+            hits["hybrid"] += any(d["id"] == relevant for d in fused)
+        n = len(queries)
+        print(f"  {name:<14} {hits['bm25'] / n:6.1%}   {hits['vector'] / n:6.1%}   {hits['hybrid'] / n:6.1%}")
+
+    print()
+    for name, values in timings.items():
+        print(_latency(name, values))
+
+    if use_openai:
+        end_to_end = []
+        for query, _ in query_sets["identifier"][:100]:
+            started = time.perf_counter()
+            await service.hybrid_search([query], COLLECTION, top_k)
+            end_to_end.append(time.perf_counter() - started)
+        print(_latency("service", end_to_end) + f"  (incl. query embedding, budget {settings.HYBRID_LATENCY_BUDGET_MS}ms)")
+        await close_client()
+
+    with service.get_client() as client:
+        client.delete_collection(COLLECTION)
+    service.invalidate_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=500, help="Queries per query set")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--openai", action="store_true", help="Embed with OPENAI_EMBEDDING_MODEL instead of the stand-in")
+    args = parser.parse_args()
+    asyncio.run(main(args.docs, args.queries, args.top_k, args.openai))
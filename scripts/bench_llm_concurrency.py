@@ -0,0 +1,47 @@
+"""
+Compare blocking vs. async generate_reply under concurrent load.
+
+Start the stub first (see scripts/llm_stub_server.py), then:
+
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:9000/v1 \
+        python -m scripts.bench_llm_concurrency --requests 64
+"""
+import argparse
+import asyncio
+import time
+
+from openai import OpenAI
+
+from app.core.config import settings
+from app.services.openai_client import generate_reply, close_client
+
+
+async def _blocking_reply(client: OpenAI, message: str) -> str:
+    # Mirrors the previous implementation: sync client inside an async def.
+    resp = client.chat.completions.create(
+        model=settings.OPENAI_MODEL,
+        messages=[{"role": "user", "content": message}],
+        max_tokens=256,
+    )
+    return resp.choices[0].message.content
+
+
+async def _run(label: str, make_call, n: int) -> None:
+    started = time.perf_counter()
+    await asyncio.gather(*(make_call(f"question {i}") for i in range(n)))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10} {n} requests in {elapsed:6.2f}s  ({n / elapsed:7.1f} req/s)")
+
+
+async def main(n: int) -> None:
+    sync_client = OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+    await _run("blocking", lambda m: _blocking_reply(sync_client, m), n)
+    await _run("async", generate_reply, n)
+    await close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,58 @@
+"""
+Microbenchmark: building prompts from scratch vs. the precompiled templates.
+
+    python -m scripts.bench_prompt_templates --iterations 20000
+
+"rebuild" rebuilds the static prefix on every call and prints the prompt
+(to /dev/null), like the previous get_prompt implementations did;
+"compiled" reuses the cached prefix and only fills the dynamic sections.
+"""
+import argparse
+import contextlib
+import os
+import time
+
+from app.templates.registry import get_template, warm_templates
+
+SAMPLE = {
+    "history": "User (query_num -> 1): Do you build mobile apps?\nAI (response_num -> 1): Yes, iOS and Android.",
+    "query": "How long does a typical project take?",
+    "query_num": 2,
+    "context": "",
+    "previous_context": "",
+    "current_context": "Mobile app projects usually take 8-16 weeks depending on scope.",
+}
+
+
+def _time(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+def main(iterations: int) -> None:
+    sizes = warm_templates()
+    with open(os.devnull, "w") as devnull:
+        for name, prefix_chars in sizes.items():
+            template = get_template(name)
+            values = {field: SAMPLE[field] for field in template.fields}
+            assert template.render(**values) == template.render_uncached(**values)
+
+            def rebuild():
+                with contextlib.redirect_stdout(devnull):
+                    print(template.render_uncached(**values))
+
+            old = _time(rebuild, iterations)
+            new = _time(lambda: template.render(**values), iterations)
+            print(
+                f"{name:<16} prefix {prefix_chars:6d} chars  "
+                f"rebuild {old * 1e6:8.2f}us  compiled {new * 1e6:8.2f}us  ({old / new:5.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.iterations)
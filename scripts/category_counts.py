@@ -0,0 +1,42 @@
+"""
+Maintain the category_daily_counts table behind GET /analysis.
+
+    python -m scripts.category_counts backfill          # rebuild from chat_logs
+    python -m scripts.category_counts reconcile [--fix] # report (and repair) drift
+"""
+import argparse
+import asyncio
+import sys
+
+from app.db.database import AsyncSessionLocal, engine
+from app.db.migrations import run_migrations
+from app.services.category_counter import backfill_category_counts, reconcile_category_counts
+
+
+async def main(command: str, fix: bool) -> int:
+    async with engine.begin() as conn:
+        await conn.run_sync(run_migrations)
+
+    async with AsyncSessionLocal() as db:
+        if command == "backfill":
+            rows = await backfill_category_counts(db)
+            print(f"Rebuilt {rows} (day, category) counters")
+            status = 0
+        else:
+            mismatches = await reconcile_category_counts(db, fix=fix)
+            for m in mismatches:
+                print(f"{m['day']} {m['category']:<24} expected={m['expected']} actual={m['actual']}")
+            action = "fixed" if fix else "found"
+            print(f"{len(mismatches)} mismatching counter(s) {action}")
+            status = 1 if mismatches and not fix else 0
+
+    await engine.dispose()
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["backfill", "reconcile"])
+    parser.add_argument("--fix", action="store_true", help="Overwrite mismatching counters (reconcile only)")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.command, args.fix)))
@@ -0,0 +1,156 @@
+"""
+Train and evaluate the local message classifier on labelled chat_logs.
+
+    python -m scripts.classifier train                 # fit on all labelled logs, save CLASSIFIER_MODEL_PATH
+    python -m scripts.classifier bench [--holdout 0.2] [--llm-samples 50]
+
+Only logs labelled by the LLM or by a person (ChatLog.category_source) are
+used, so the model isn't trained on its own or the rules' output;
+--all-sources also reads rule/model labels and rows with no recorded source.
+
+`bench` trains on a split of the logs and reports accuracy and latency of
+each tier on the held-out part, plus how often the LLM would still be asked
+at CLASSIFIER_CONFIDENCE. With --llm-samples it also times the LLM
+classifier on that many held-out messages (needs OPENAI_API_KEY).
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+import zlib
+from collections import Counter
+
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal, engine
+from app.services.classifier import (
+    HashedNgramClassifier,
+    MessageClassifier,
+    TRAINING_SOURCES,
+    load_labeled_logs,
+    normalize_category,
+    rule_category,
+)
+from app.services.openai_client import close_client, generate_reply
+from app.templates.prompt import MESSAGE_CATEGORY
+
+
+def _split(messages, labels, holdout: float):
+    # Hash-based split: stable across runs and independent of row order
+    train, test = ([], []), ([], [])
+    for message, label in zip(messages, labels):
+        part = test if zlib.crc32(message.encode()) % 1000 < holdout * 1000 else train
+        part[0].append(message)
+        part[1].append(label)
+    return train, test
+
+
+def _percentile(values, pct: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+def _latency(label: str, timings) -> None:
+    print(f"{label:<14} p50 {statistics.median(timings) * 1e6:8.1f}us  p99 {_percentile(timings, 0.99) * 1e6:8.1f}us")
+
+
+async def bench(messages, labels, holdout: float, llm_samples: int) -> None:
+    (train_x, train_y), (test_x, test_y) = _split(messages, labels, holdout)
+    if not test_x or not train_x:
+        print("Not enough labelled logs to split")
+        return
+    print(f"{len(train_x)} training / {len(test_x)} held-out messages")
+    print(f"label distribution: {dict(Counter(labels).most_common())}")
+
+    started = time.perf_counter()
+    model = HashedNgramClassifier().fit(train_x, train_y)
+    print(f"trained in {time.perf_counter() - started:.2f}s")
+
+    classifier = MessageClassifier(llm_fallback=False)
+    classifier.set_model(model)
+
+    rule_hits = rule_correct = model_correct = local_correct = confident = confident_correct = 0
+    rule_times, model_times, local_times = [], [], []
+    per_category = Counter(), Counter()
+    for message, label in zip(test_x, test_y):
+        t0 = time.perf_counter()
+        rule = rule_category(message)
+        t1 = time.perf_counter()
+        predicted, _ = model.predict(message)
+        t2 = time.perf_counter()
+        local, confidence, _ = classifier.classify_local(message)
+        t3 = time.perf_counter()
+        rule_times.append(t1 - t0)
+        model_times.append(t2 - t1)
+        local_times.append(t3 - t2)
+
+        if rule:
+            rule_hits += 1
+            rule_correct += rule == label
+        model_correct += predicted == label
+        local_correct += local == label
+        if confidence >= classifier.threshold:
+            confident += 1
+            confident_correct += local == label
+        per_category[0][label] += 1
+        per_category[1][label] += local == label
+
+    n = len(test_x)
+    print(f"\nrules          coverage {rule_hits / n:6.1%}  accuracy {rule_correct / max(rule_hits, 1):6.1%}")
+    print(f"model only     accuracy {model_correct / n:6.1%}")
+    print(f"rules + model  accuracy {local_correct / n:6.1%}")
+    print(
+        f"at threshold {classifier.threshold}: {confident / n:6.1%} answered locally "
+        f"(accuracy {confident_correct / max(confident, 1):6.1%}), {1 - confident / n:6.1%} would go to the LLM"
+    )
+    print("\nper category (rules + model):")
+    for category, total in per_category[0].most_common():
+        print(f"   {category:<22} {per_category[1][category] / total:6.1%}  of {total}")
+
+    print()
+    _latency("rules", rule_times)
+    _latency("model", model_times)
+    _latency("rules + model", local_times)
+
+    if llm_samples:
+        correct, timings = 0, []
+        for message, label in list(zip(test_x, test_y))[:llm_samples]:
+            started = time.perf_counter()
+            reply = await generate_reply(message, system_prompt=MESSAGE_CATEGORY)
+            timings.append(time.perf_counter() - started)
+            correct += normalize_category(reply) == label
+        print(f"\nLLM            accuracy {correct / len(timings):6.1%} on {len(timings)} messages")
+        _latency("LLM", timings)
+        await close_client()
+
+
+async def main(command: str, holdout: float, llm_samples: int, limit: int, all_sources: bool) -> int:
+    async with AsyncSessionLocal() as db:
+        messages, labels = await load_labeled_logs(db, limit=limit or None, sources=None if all_sources else TRAINING_SOURCES)
+    await engine.dispose()
+
+    if not messages:
+        print("No chat_logs rows labelled with a known category" + ("" if all_sources else " by the LLM or a person (see --all-sources)"))
+        return 1
+
+    if command == "train":
+        started = time.perf_counter()
+        model = HashedNgramClassifier().fit(messages, labels)
+        model.save(settings.CLASSIFIER_MODEL_PATH)
+        print(f"Trained on {len(messages)} messages in {time.perf_counter() - started:.2f}s "
+              f"-> {settings.CLASSIFIER_MODEL_PATH}")
+    else:
+        await bench(messages, labels, holdout, llm_samples)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["train", "bench"])
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of logs held out for evaluation (bench)")
+    parser.add_argument("--llm-samples", type=int, default=0, help="Also time the LLM classifier on N messages (bench)")
+    parser.add_argument("--limit", type=int, default=0, help="Only read the first N labelled logs")
+    parser.add_argument("--all-sources", action="store_true",
+                        help="Also train on rule/model labels and rows without a recorded source")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.command, args.holdout, args.llm_samples, args.limit, args.all_sources)))
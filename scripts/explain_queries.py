@@ -0,0 +1,93 @@
+"""
+Print the SQLite EXPLAIN QUERY PLAN of the app's hot queries and flag full
+table scans.
+
+    python -m scripts.explain_queries [--database ./database.db]
+
+Runs the migrations first, so it can be pointed at an existing database to
+check that the new indexes are in place and used.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, desc, func, select, tuple_
+
+from app.core.config import settings
+from app.db.migrations import run_migrations
+from app.models.db_models import ChatLog, ChatMessage
+
+
+def hot_queries():
+    cutoff = datetime.utcnow() - timedelta(days=7)
+    return {
+        # ConversationService.get_user_conversation_history
+        "user_history": (
+            select(ChatLog)
+            .where(ChatLog.user_id == "u1", ChatLog.conversation_id != "c1", ChatLog.created_at >= cutoff)
+            .order_by(desc(ChatLog.created_at))
+            .limit(20)
+        ),
+        # GET /logs (first page, then a deep keyset page filtered by category)
+        "recent_logs": select(ChatLog).order_by(desc(ChatLog.created_at), desc(ChatLog.id)).limit(50),
+        "logs_keyset_page": (
+            select(ChatLog.id, ChatLog.created_at, ChatLog.category)
+            .where(ChatLog.category == "question")
+            .where(tuple_(ChatLog.created_at, ChatLog.id) < tuple_(cutoff, 1000))
+            .order_by(desc(ChatLog.created_at), desc(ChatLog.id))
+            .limit(50)
+        ),
+        # Category counter backfill / reconcile (GET /analysis reads the counters)
+        "category_counts": select(ChatLog.category, func.count(ChatLog.id)).group_by(ChatLog.category),
+        # SqlService.fetch_recent_context
+        "last_assistant_message": (
+            select(ChatMessage.message)
+            .where(ChatMessage.session_id == "s1", ChatMessage.sender == "assistant")
+            .order_by(ChatMessage.timestamp.desc())
+            .limit(1)
+        ),
+        # SqlService.get_session_conversation
+        "session_transcript": (
+            select(ChatMessage.id, ChatMessage.message, ChatMessage.sender, ChatMessage.timestamp)
+            .where(ChatMessage.session_id == "s1")
+            .order_by(ChatMessage.timestamp.asc())
+        ),
+    }
+
+
+def is_full_scan(detail: str) -> bool:
+    # "SCAN t" is a full scan; "SCAN t USING [COVERING] INDEX ..." walks an index
+    return detail.startswith("SCAN") and "INDEX" not in detail
+
+
+def main(database_url: str) -> int:
+    engine = create_engine(database_url)
+    if engine.dialect.name != "sqlite":
+        print(f"EXPLAIN QUERY PLAN is SQLite specific; got dialect '{engine.dialect.name}'")
+        return 2
+
+    full_scans = 0
+    with engine.begin() as conn:
+        run_migrations(conn)
+        for name, stmt in hot_queries().items():
+            compiled = stmt.compile(dialect=engine.dialect)
+            params = tuple(compiled.params[key] for key in compiled.positiontup)
+            plan = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+
+            print(f"\n== {name}")
+            for row in plan:
+                detail = row[-1]
+                flag = "  <-- full table scan" if is_full_scan(detail) else ""
+                full_scans += bool(flag)
+                print(f"   {detail}{flag}")
+
+    print(f"\n{full_scans} full table scan(s) found")
+    return 1 if full_scans else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", help="Path to a SQLite file (defaults to DATABASE_URL)")
+    args = parser.parse_args()
+    url = f"sqlite:///{args.database}" if args.database else settings.DATABASE_URL.replace("+aiosqlite", "")
+    sys.exit(main(url))
@@ -0,0 +1,38 @@
+"""
+Ingest files or directories into a knowledge base collection.
+
+    python -m scripts.ingest ./docs ./faq.md [--collection Document]
+
+Re-running on the same paths is incremental: unchanged chunks are skipped
+(matched by content hash), changed ones are re-embedded and chunks that
+disappeared from a file are deleted.
+"""
+import argparse
+import asyncio
+import sys
+
+from app.services.ingestion import IngestionPipeline
+from app.services.openai_client import close_client
+
+
+async def main(paths, collection: str) -> int:
+    try:
+        report = await IngestionPipeline(collection_name=collection).ingest(paths)
+    finally:
+        await close_client()
+    print(
+        f"{report.files} file(s), {report.chunks} chunk(s): {report.embedded} embedded, "
+        f"{report.unchanged} unchanged, {report.deleted} deleted, {report.failed_chunks} failed "
+        f"in {report.seconds:.1f}s"
+    )
+    for path in report.failed_files:
+        print(f"   failed: {path}")
+    return 1 if report.failed_files or report.failed_chunks else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+", help="Files or directories")
+    parser.add_argument("--collection", default="Document")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.paths, args.collection)))
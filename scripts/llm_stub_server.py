@@ -0,0 +1,85 @@
+"""
+Minimal OpenAI-compatible stub for offline load testing.
+
+Serves /v1/chat/completions and /v1/embeddings with a fixed artificial delay,
+so the app can be pointed at it via OPENAI_BASE_URL=http://127.0.0.1:9000/v1.
+
+    STUB_LATENCY=0.5 uvicorn scripts.llm_stub_server:app --port 9000
+"""
+import asyncio
+import os
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+import orjson
+
+LATENCY = float(os.getenv("STUB_LATENCY", "0.5"))
+EMBEDDING_DIM = int(os.getenv("STUB_EMBEDDING_DIM", "1536"))
+STREAM_TOKENS = int(os.getenv("STUB_STREAM_TOKENS", "20"))
+
+app = FastAPI(title="LLM stub")
+
+
+def _completion_chunk(completion_id: str, model: str, content: str | None, finish_reason: str | None = None) -> bytes:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": {"content": content} if content else {}, "finish_reason": finish_reason}],
+    }
+    return b"data: " + orjson.dumps(chunk) + b"\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "stub")
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+    if body.get("stream"):
+        async def events():
+            per_token = LATENCY / max(STREAM_TOKENS, 1)
+            for i in range(STREAM_TOKENS):
+                await asyncio.sleep(per_token)
+                yield _completion_chunk(completion_id, model, f"tok{i} ")
+            yield _completion_chunk(completion_id, model, None, "stop")
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    await asyncio.sleep(LATENCY)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": "stub reply"},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 2, "total_tokens": 3},
+    }
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body.get("input", "")
+    if isinstance(inputs, str):
+        inputs = [inputs]
+
+    await asyncio.sleep(LATENCY / 5)
+    data = []
+    for i, text in enumerate(inputs):
+        seed = float(len(text) % 97) / 97.0
+        data.append({"object": "embedding", "index": i, "embedding": [seed] * EMBEDDING_DIM})
+    return {
+        "object": "list",
+        "data": data,
+        "model": body.get("model", "stub"),
+        "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+    }
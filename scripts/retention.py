@@ -0,0 +1,109 @@
+"""
+Purge old knowledge base documents, once, from the command line.
+
+    python -m scripts.retention run [--rules web:168,file:720] [--batch-size 5000]
+    CHROMA_DB_PATH=/tmp/chroma_bench python -m scripts.retention bench [--docs 50000] [--expired 0.8]
+
+`run` applies RETENTION_RULES (or --rules) like the scheduled task does and
+prints the per-rule counts, rates and the space reclaimed by compaction.
+
+`bench` fills a scratch collection with `web` documents, a share of them
+past the cutoff, and times the old get-then-delete loop (ids and metadata
+fetched per batch) against ChromaDBService.delete_where, batched and as a
+single filtered delete. The collection is refilled before each variant.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from app.core.config import settings
+from app.services.chroma_service import ChromaDBService
+from app.services.retention import RetentionEngine, parse_rules
+
+BENCH_COLLECTION = "bench_retention"
+
+
+async def run(rules: str, batch_size: int) -> int:
+    engine = RetentionEngine(rules=parse_rules(rules), batch_size=batch_size)
+    if not engine.rules:
+        print("No retention rules (set RETENTION_RULES or pass --rules)")
+        return 1
+    result = await engine.run_once()
+    for purge in result.purges:
+        status = purge.error or f"{purge.deleted} deleted in {purge.seconds:.2f}s ({purge.rate:.0f}/s)"
+        print(f"{purge.source:<6} {status}")
+    print(f"compaction reclaimed {result.compacted_bytes / 2 ** 20:.1f} MB")
+    return 1 if any(p.error for p in result.purges) else 0
+
+
+def _fill(service: ChromaDBService, docs: int, expired: float, dim: int = 64, batch: int = 5000):
+    with service.get_client() as client:
+        try:
+            client.delete_collection(BENCH_COLLECTION)
+        except Exception:
+            pass
+        service.invalidate_collection(BENCH_COLLECTION)
+        collection = service._collection(client, BENCH_COLLECTION, create=True)
+    rng = random.Random(0)
+    now = time.time()
+    for start in range(0, docs, batch):
+        n = min(batch, docs - start)
+        collection.add(
+            ids=[f"doc-{start + i}" for i in range(n)],
+            embeddings=[[rng.random() for _ in range(dim)] for _ in range(n)],
+            documents=[f"document {start + i} " * 20 for i in range(n)],
+            metadatas=[
+                {"source": "web", "updated_at": now - (48 if rng.random() < expired else 1) * 3600}
+                for _ in range(n)
+            ],
+        )
+    return collection
+
+
+def _old_loop(collection, where: dict) -> int:
+    # What delete_document did before: fetch ids + metadata, then delete by id
+    deleted = 0
+    while True:
+        doc_ids = collection.get(where=where, include=["metadatas"], limit=5000).get("ids", [])
+        if not doc_ids:
+            return deleted
+        collection.delete(ids=doc_ids)
+        deleted += len(doc_ids)
+
+
+def bench(docs: int, expired: float, batch_size: int) -> int:
+    service = ChromaDBService()
+    where = service.retention_filter("web", 24)
+    variants = [
+        ("get + delete by id (old)", lambda c: _old_loop(c, where)),
+        (f"delete_where batch={batch_size}", lambda c: service.delete_where(where, BENCH_COLLECTION, batch_size)),
+        ("delete_where single call", lambda c: service.delete_where(where, BENCH_COLLECTION, 0)),
+    ]
+    for label, purge in variants:
+        collection = _fill(service, docs, expired)
+        started = time.perf_counter()
+        deleted = purge(collection)
+        elapsed = time.perf_counter() - started
+        print(f"{label:<28} {deleted:>7} deleted in {elapsed:6.2f}s  ({deleted / elapsed:8.0f}/s)")
+    started = time.perf_counter()
+    reclaimed = service.compact()
+    print(f"compaction reclaimed {reclaimed / 2 ** 20:.1f} MB in {time.perf_counter() - started:.2f}s")
+    with service.get_client() as client:
+        client.delete_collection(BENCH_COLLECTION)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["run", "bench"])
+    parser.add_argument("--rules", default=settings.RETENTION_RULES, help='e.g. "web:168,file:720" (run)')
+    parser.add_argument("--batch-size", type=int, default=settings.RETENTION_BATCH_SIZE,
+                        help="Rows per delete call, 0 for a single filtered delete")
+    parser.add_argument("--docs", type=int, default=50_000, help="Documents in the scratch collection (bench)")
+    parser.add_argument("--expired", type=float, default=0.8, help="Share of documents past the cutoff (bench)")
+    args = parser.parse_args()
+    if args.command == "run":
+        sys.exit(asyncio.run(run(args.rules, args.batch_size)))
+    sys.exit(bench(args.docs, args.expired, args.batch_size))
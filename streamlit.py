@@ -5,13 +5,15 @@ import pandas as pd
 import html
 import time
 from datetime import datetime, timezone
-import io
+import json
 import matplotlib.pyplot as plt
 
 # ---------- Configuration ----------
 API_BASE = "http://127.0.0.1:8000"
 CHAT_ENDPOINT = f"{API_BASE}/chat"
+CHAT_STREAM_ENDPOINT = f"{API_BASE}/chat/stream"
 LOGS_ENDPOINT = f"{API_BASE}/logs"
+LOGS_EXPORT_ENDPOINT = f"{API_BASE}/logs/export"
 ANALYSIS_ENDPOINT = f"{API_BASE}/analysis"
 CONTEXT_ENDPOINT = f"{API_BASE}/chat/context"
 
@@ -30,7 +32,35 @@ def send_message_to_api(
     return resp.json()  # { reply, category, log_id, conversation_id, context_offered }
 
 
+def stream_message_to_api(
+    message: str, result: dict, user_id: str | None = None, conversation_id: str | None = None
+):
+    """Yield reply tokens from the SSE endpoint; the final `done` payload is stored in `result`."""
+    payload = {"message": message}
+    if user_id:
+        payload["user_id"] = user_id
+    if conversation_id:
+        payload["conversation_id"] = conversation_id
+    with requests.post(CHAT_STREAM_ENDPOINT, json=payload, stream=True, timeout=60) as resp:
+        resp.raise_for_status()
+        event = None
+        for line in resp.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "token":
+                    yield data["text"]
+                elif event == "done":
+                    result.update(data)
+                elif event == "error":
+                    raise RuntimeError(data.get("detail", "stream failed"))
+
+
+@st.cache_data(ttl=10, show_spinner=False)
 def fetch_logs(limit: int = 200):
+    # Cached briefly so reruns triggered by widgets don't refetch the same page;
+    # cleared after sending a message and on "Refresh logs"
     resp = requests.get(f"{LOGS_ENDPOINT}?limit={limit}", timeout=30)
     resp.raise_for_status()
     return resp.json()
@@ -376,8 +406,9 @@ with col1:
             message_time = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S UTC")
             
             # Determine category for user message (for display purposes)
-            from app.services.classifier import classify_message, is_likely_continuation_response
-            user_category = classify_message(user_input.strip())
+            from app.services.classifier import predict_category
+            from app.services.text_screen import is_likely_continuation_response
+            user_category = predict_category(user_input.strip())
             if is_likely_continuation_response(user_input.strip()):
                 user_category = "continuation_response"
             
@@ -394,60 +425,66 @@ with col1:
             conv_id = st.session_state.get("conversation_id")
             current_user_id = st.session_state.get("user_id", "")
 
-            # Show enhanced spinner with context info
-            spinner_text = "🧠 Analyzing context and generating response..." if current_user_id else "🤖 Generating response..."
+            # Render tokens as they arrive instead of blocking on a spinner
+            stream_placeholder = st.empty()
             
-            with st.spinner(spinner_text):
-                try:
-                    resp = send_message_to_api(
-                        message=user_input.strip(),
-                        user_id=current_user_id if current_user_id else None,
-                        conversation_id=conv_id if persist_conversation else None,
-                    )
-
-                    bot_reply = resp.get("reply", "No response from API")
-                    category = resp.get("category", "other")
-                    log_id = resp.get("log_id")
-                    returned_conv_id = resp.get("conversation_id")
-                    context_offered = resp.get("context_offered", False)
-
-                    # Update conversation_id if we got one back
-                    if returned_conv_id and persist_conversation:
-                        st.session_state["conversation_id"] = returned_conv_id
-
-                    # Add bot response to history
-                    reply_time = datetime.now(timezone.utc).strftime(
-                        "%Y-%m-%d %H:%M:%S UTC"
-                    )
-                    st.session_state["history"].append(
-                        {
-                            "role": "bot",
-                            "text": bot_reply,
-                            "time": reply_time,
-                            "category": category,
-                            "log_id": log_id,
-                        }
-                    )
+            try:
+                resp = {}
+                streamed_text = ""
+                for token in stream_message_to_api(
+                    message=user_input.strip(),
+                    result=resp,
+                    user_id=current_user_id if current_user_id else None,
+                    conversation_id=conv_id if persist_conversation else None,
+                ):
+                    streamed_text += token
+                    stream_placeholder.markdown(f"🤖 {streamed_text}▌")
+
+                bot_reply = resp.get("reply", "No response from API")
+                category = resp.get("category", "other")
+                log_id = resp.get("log_id")
+                returned_conv_id = resp.get("conversation_id")
+                context_offered = resp.get("context_offered", False)
+
+                # Update conversation_id if we got one back
+                if returned_conv_id and persist_conversation:
+                    st.session_state["conversation_id"] = returned_conv_id
+
+                # Add bot response to history
+                reply_time = datetime.now(timezone.utc).strftime(
+                    "%Y-%m-%d %H:%M:%S UTC"
+                )
+                st.session_state["history"].append(
+                    {
+                        "role": "bot",
+                        "text": bot_reply,
+                        "time": reply_time,
+                        "category": category,
+                        "log_id": log_id,
+                    }
+                )
 
-                    # If this was a continuation offer, update UI state
-                    if category == "continuation_offer":
-                        st.info("💡 The bot has offered to continue your previous conversation!")
+                # If this was a continuation offer, update UI state
+                if category == "continuation_offer":
+                    st.info("💡 The bot has offered to continue your previous conversation!")
 
-                    # Force rerun to show the new messages
-                    st.rerun()
+                # Drop the cached logs page so the rerun shows this turn
+                fetch_logs.clear()
+                # Force rerun to show the new messages
+                st.rerun()
 
-                except requests.HTTPError as e:
-                    error_msg = f"❌ API error: {e}"
-                    if hasattr(e, "response") and e.response is not None:
-                        try:
-                            error_detail = e.response.json()
-                            error_msg += f" - {error_detail}"
-                        except:
-                            error_msg += f" - {e.response.text}"
-                    st.error(error_msg)
+            except requests.HTTPError as e:
+                error_msg = f"❌ API error: {e}"
+                if hasattr(e, "response") and e.response is not None:
+                    try:
+                        error_detail = e.response.json()
+                        error_msg += f" - {error_detail}"
+                    except:
+                        error_msg += f" - {e.response.text}"
+                st.error(error_msg)
 
-                except Exception as e:
-                    st.error(f"❌ Failed to call API: {e}")
+            except Exception as e:
+                st.error(f"❌ Failed to call API: {e}")
 
 # Right column: enhanced logs and tools
 with col2:
@@ -501,15 +538,15 @@ with col2:
             else:
                 st.dataframe(show_df, width="stretch", height=300)
 
-            # Enhanced CSV download
-            csv_buf = io.StringIO()
-            show_df.to_csv(csv_buf, index=False)
-            st.download_button(
-                "📥 Download Enhanced Logs",
-                data=csv_buf.getvalue(),
-                file_name=f"enhanced_chat_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv",
-            )
+            # Full-table exports are streamed by the API, not built in the UI
+            export_cols = st.columns(3)
+            for export_col, export_format in zip(export_cols, ("csv", "ndjson", "parquet")):
+                with export_col:
+                    st.link_button(
+                        f"📥 Export {export_format.upper()}",
+                        f"{LOGS_EXPORT_ENDPOINT}?format={export_format}",
+                        use_container_width=True,
+                    )
         else:
             st.info("No conversation logs yet. Start chatting to see activity!")
 
@@ -524,6 +561,7 @@ with col2:
 
     with button1:
         if st.button("🔄 Refresh logs", key="refresh_logs"):
+            fetch_logs.clear()
             st.rerun()
 
     with button2: